@@ -16,10 +16,12 @@ config = context.config
 
 # Interpret the config file for Python logging
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    # Keep the application's loggers alive when migrations run at startup
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # Get database URL from settings
-config.set_main_option("sqlalchemy.url", settings.database_url)
+# (migrations run synchronously, so swap the asyncpg driver for psycopg2)
+config.set_main_option("sqlalchemy.url", settings.database_url.replace("+asyncpg", ""))
 
 # Add your model's MetaData object here for 'autogenerate' support
 target_metadata = Base.metadata
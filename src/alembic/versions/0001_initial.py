@@ -0,0 +1,63 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have these tables
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("challenges"):
+        return
+
+    op.create_table(
+        "challenges",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("slack_channel_id", sa.String(), nullable=False, unique=True),
+        sa.Column(
+            "activity_type",
+            sa.Enum("WALKING", "RUNNING", "CYCLING", "SWIMMING", "CALORIES", name="activitytype"),
+            nullable=False,
+        ),
+        sa.Column("start_date", sa.DateTime(), nullable=False),
+        sa.Column("end_date", sa.DateTime(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+    )
+    op.create_table(
+        "results",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("unit", sa.String(), nullable=False),
+        sa.Column("screenshot_url", sa.String(), nullable=True),
+        sa.Column("is_validated", sa.Boolean(), nullable=True),
+        sa.Column("validation_error", sa.String(), nullable=True),
+        sa.Column("validated_by", sa.String(), nullable=True),
+        sa.Column("validated_at", sa.DateTime(), nullable=True),
+        sa.Column("challenge_id", sa.Integer(), sa.ForeignKey("challenges.id"), nullable=False),
+    )
+    op.create_index("ix_results_user_id", "results", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_results_user_id", table_name="results")
+    op.drop_table("results")
+    op.drop_table("challenges")
+    sa.Enum(name="activitytype").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,26 @@
+"""record the source Slack message on results
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("results", sa.Column("slack_ts", sa.String(), nullable=True))
+    op.create_index("ix_results_challenge_slack_ts", "results", ["challenge_id", "slack_ts"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_results_challenge_slack_ts", table_name="results")
+    op.drop_column("results", "slack_ts")
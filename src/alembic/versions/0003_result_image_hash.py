@@ -0,0 +1,24 @@
+"""store a perceptual hash of each result's screenshot
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("results", sa.Column("image_hash", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("results", "image_hash")
@@ -0,0 +1,94 @@
+"""partition results by challenge and allow several challenges per channel
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, created_at, updated_at, user_id, date, value, unit, screenshot_url, is_validated, "
+    "validation_error, validated_by, validated_at, slack_ts, image_hash, challenge_id"
+)
+
+
+def upgrade() -> None:
+    # Challenges: one *active* challenge per channel instead of one ever
+    op.drop_constraint("challenges_slack_channel_id_key", "challenges", type_="unique")
+    op.create_index(
+        "uq_challenges_active_channel", "challenges", ["slack_channel_id"],
+        unique=True, postgresql_where=sa.text("is_active")
+    )
+
+    # Results: swap the plain table for one range-partitioned on challenge_id
+    op.execute("ALTER TABLE results RENAME TO results_old")
+    op.execute("ALTER INDEX results_pkey RENAME TO results_old_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_results_user_id")
+    op.execute("DROP INDEX IF EXISTS ix_results_challenge_slack_ts")
+    op.execute("""
+        CREATE TABLE results (
+            id INTEGER NOT NULL DEFAULT nextval('results_id_seq'),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            user_id VARCHAR NOT NULL,
+            date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            value DOUBLE PRECISION NOT NULL,
+            unit VARCHAR NOT NULL,
+            screenshot_url VARCHAR,
+            is_validated BOOLEAN,
+            validation_error VARCHAR,
+            validated_by VARCHAR,
+            validated_at TIMESTAMP WITHOUT TIME ZONE,
+            slack_ts VARCHAR,
+            image_hash BIGINT,
+            challenge_id INTEGER NOT NULL REFERENCES challenges (id),
+            PRIMARY KEY (id, challenge_id)
+        ) PARTITION BY RANGE (challenge_id)
+    """)
+    op.execute("CREATE TABLE results_default PARTITION OF results DEFAULT")
+    op.execute("""
+        DO $$
+        DECLARE c RECORD;
+        BEGIN
+            FOR c IN SELECT id FROM challenges LOOP
+                EXECUTE format(
+                    'CREATE TABLE results_c%s PARTITION OF results FOR VALUES FROM (%s) TO (%s)',
+                    c.id, c.id, c.id + 1
+                );
+            END LOOP;
+        END $$
+    """)
+    op.execute(f"INSERT INTO results ({COLUMNS}) SELECT {COLUMNS} FROM results_old")
+    op.execute("ALTER SEQUENCE results_id_seq OWNED BY results.id")
+    op.execute("DROP TABLE results_old")
+    op.create_index("ix_results_user_id", "results", ["user_id"])
+    op.create_index("ix_results_challenge_slack_ts", "results", ["challenge_id", "slack_ts"])
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE results RENAME TO results_partitioned")
+    op.execute("ALTER INDEX results_pkey RENAME TO results_partitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_results_user_id")
+    op.execute("DROP INDEX IF EXISTS ix_results_challenge_slack_ts")
+    op.execute(f"""
+        CREATE TABLE results AS SELECT {COLUMNS} FROM results_partitioned
+    """)
+    op.execute("ALTER TABLE results ADD PRIMARY KEY (id)")
+    op.execute("ALTER TABLE results ALTER COLUMN id SET DEFAULT nextval('results_id_seq')")
+    op.execute("ALTER TABLE results ADD FOREIGN KEY (challenge_id) REFERENCES challenges (id)")
+    op.execute("ALTER SEQUENCE results_id_seq OWNED BY results.id")
+    op.execute("DROP TABLE results_partitioned CASCADE")
+    op.create_index("ix_results_user_id", "results", ["user_id"])
+    op.create_index("ix_results_challenge_slack_ts", "results", ["challenge_id", "slack_ts"])
+
+    op.drop_index("uq_challenges_active_channel", table_name="challenges")
+    op.create_unique_constraint("challenges_slack_channel_id_key", "challenges", ["slack_channel_id"])
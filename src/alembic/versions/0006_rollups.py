@@ -0,0 +1,47 @@
+"""precomputed per-user daily and per-challenge totals
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_user_totals",
+        sa.Column("challenge_id", sa.Integer(), sa.ForeignKey("challenges.id"), primary_key=True),
+        sa.Column("user_id", sa.String(), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column("submissions", sa.Integer(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "challenge_user_totals",
+        sa.Column("challenge_id", sa.Integer(), sa.ForeignKey("challenges.id"), primary_key=True),
+        sa.Column("user_id", sa.String(), primary_key=True),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column("submissions", sa.Integer(), nullable=False),
+        sa.Column("last_submission", sa.DateTime(), nullable=True),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_challenge_user_totals_rank", "challenge_user_totals",
+        ["challenge_id", sa.text("total DESC")]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_challenge_user_totals_rank", table_name="challenge_user_totals")
+    op.drop_table("challenge_user_totals")
+    op.drop_table("daily_user_totals")
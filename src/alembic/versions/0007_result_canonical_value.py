@@ -0,0 +1,76 @@
+"""store each result's value in its activity's canonical unit
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the unit table in app/utils/units.py at this revision, so
+# later edits there cannot change what this migration did
+UNITS = (
+    # (dimension, factor to the dimension's base unit, aliases)
+    ("distance", 1.0, ("m", "meter", "meters", "metre", "metres", "mtr")),
+    ("distance", 1000.0, ("km", "kms", "kilometer", "kilometers", "kilometre", "kilometres")),
+    ("distance", 1609.344, ("mi", "mile", "miles")),
+    ("distance", 0.9144, ("yd", "yds", "yard", "yards")),
+    ("energy", 1.0, ("kcal", "cal", "cals", "calorie", "calories", "kcals", "kilocalorie", "kilocalories")),
+    ("energy", 1 / 4.184, ("kj", "kilojoule", "kilojoules")),
+)
+# Activity -> (dimension, factor of its canonical unit)
+CANONICAL = {
+    "WALKING": ("distance", 1000.0),
+    "RUNNING": ("distance", 1000.0),
+    "CYCLING": ("distance", 1000.0),
+    "SWIMMING": ("distance", 1.0),
+    "CALORIES": ("energy", 1.0),
+}
+
+
+def canonical_factors():
+    """``(unit alias, activity, factor)`` for every valid pair."""
+    for activity, (dimension, target) in CANONICAL.items():
+        for unit_dimension, factor, aliases in UNITS:
+            if unit_dimension == dimension:
+                for alias in aliases:
+                    yield alias, activity, factor / target
+
+
+def upgrade() -> None:
+    op.add_column("results", sa.Column("canonical_value", sa.Float(), nullable=True))
+
+    # Convert every existing row in one set-based UPDATE against the conversion table;
+    # units the table does not know stay NULL and are left out of totals
+    factors = list(canonical_factors())
+    values = ", ".join(f"(:u{i}, :a{i}, :f{i})" for i in range(len(factors)))
+    params = {}
+    for i, (unit, activity, factor) in enumerate(factors):
+        params.update({f"u{i}": unit, f"a{i}": activity, f"f{i}": factor})
+    op.get_bind().execute(sa.text(f"""
+        UPDATE results r
+        SET canonical_value = r.value * f.factor
+        FROM challenges c, (VALUES {values}) AS f(unit, activity, factor)
+        WHERE c.id = r.challenge_id
+          AND c.activity_type::text = f.activity
+          -- Same as normalize_unit: collapse and trim whitespace, lowercase, drop trailing dots
+          AND rtrim(lower(btrim(regexp_replace(r.unit, '\\s+', ' ', 'g'))), '.') = f.unit
+    """), params)
+
+    op.create_index(
+        "ix_results_challenge_user_total", "results", ["challenge_id", "user_id"],
+        postgresql_include=["canonical_value"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_results_challenge_user_total", table_name="results")
+    op.drop_column("results", "canonical_value")
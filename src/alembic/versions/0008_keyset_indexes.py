@@ -0,0 +1,38 @@
+"""composite indexes matching the keyset order of the leaderboard and recent views
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_challenge_user_totals_rank", table_name="challenge_user_totals")
+    op.create_index(
+        "ix_challenge_user_totals_rank", "challenge_user_totals",
+        ["challenge_id", sa.text("total DESC"), sa.text("user_id DESC")]
+    )
+    # Created on the partitioned parent, so every challenge partition gets one
+    op.create_index(
+        "ix_results_challenge_user_date", "results",
+        ["challenge_id", "user_id", sa.text("date DESC"), sa.text("id DESC")]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_results_challenge_user_date", table_name="results")
+    op.drop_index("ix_challenge_user_totals_rank", table_name="challenge_user_totals")
+    op.create_index(
+        "ix_challenge_user_totals_rank", "challenge_user_totals",
+        ["challenge_id", sa.text("total DESC")]
+    )
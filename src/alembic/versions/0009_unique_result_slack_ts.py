@@ -0,0 +1,34 @@
+"""make (challenge_id, slack_ts) unique so result saves can upsert
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the first row of any message recorded twice by racing retries
+    op.execute("""
+        DELETE FROM results r
+        USING results d
+        WHERE r.challenge_id = d.challenge_id
+          AND r.slack_ts = d.slack_ts
+          AND r.id > d.id
+    """)
+    op.drop_index("ix_results_challenge_slack_ts", table_name="results")
+    # Includes the partition key, so Postgres can enforce it on the partitioned parent
+    op.create_index("uq_results_challenge_slack_ts", "results", ["challenge_id", "slack_ts"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uq_results_challenge_slack_ts", table_name="results")
+    op.create_index("ix_results_challenge_slack_ts", "results", ["challenge_id", "slack_ts"])
@@ -0,0 +1,33 @@
+"""limit the per-user totals index to validated results
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_results_challenge_user_total", table_name="results")
+    # Leaderboards only sum validated results; the predicate keeps the live sum index-only
+    op.create_index(
+        "ix_results_challenge_user_total", "results", ["challenge_id", "user_id"],
+        postgresql_include=["canonical_value"], postgresql_where=sa.text("is_validated")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_results_challenge_user_total", table_name="results")
+    op.create_index(
+        "ix_results_challenge_user_total", "results", ["challenge_id", "user_id"],
+        postgresql_include=["canonical_value"]
+    )
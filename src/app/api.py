@@ -0,0 +1,247 @@
+# src/app/api.py
+"""
+Read-only HTTP API for dashboards.
+
+    GET /api/challenges                          ?active=true
+    GET /api/challenges/{id}                     metadata and counts
+    GET /api/challenges/{id}/leaderboard         ?limit=10
+    GET /api/challenges/{id}/results             ?user=U123  (NDJSON stream)
+    GET /api/challenges/{id}/live                Server-Sent Events (see live.py)
+
+Responses carry a weak ETag built from the data versions in
+``data_versions.py``. A request whose ``If-None-Match`` still matches is
+answered 304 after one Redis lookup, before any database work. Results are
+streamed as newline-delimited JSON from a server-side cursor (or, for
+archived challenges, from the Parquet file batch by batch), so memory use
+does not grow with the challenge.
+
+Set ``API_TOKEN`` to require ``Authorization: Bearer <token>``. Browsers'
+``EventSource`` cannot send headers, so the live stream also takes the token
+as ``?token=<token>``.
+"""
+
+import asyncio
+import hmac
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Optional
+
+import pyarrow.compute as pc
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response # type: ignore
+from fastapi.responses import JSONResponse, StreamingResponse # type: ignore
+from sqlalchemy import select
+
+from .archive import archive_reader
+from .config import settings
+from .data_versions import challenge_version, challenges_version
+from .live import live_hub
+from .metrics import api_responses_total
+from .models.challenge import Challenge, Result
+from .models.database import async_session
+from .rollups import challenge_stats, leaderboard
+from .users import user_directory
+from .utils.logging import setup_logger
+from .utils.units import CANONICAL_UNITS
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+# Part of every ETag; bump when a representation changes shape
+API_REVISION = 1
+
+RESULT_COLUMNS = ("id", "user_id", "date", "value", "unit", "canonical_value", "is_validated", "slack_ts")
+
+
+async def require_token(authorization: Optional[str] = Header(None)):
+    if not settings.api_token:
+        return
+    if not authorization or not hmac.compare_digest(authorization, f"Bearer {settings.api_token}"):
+        raise HTTPException(status_code=401, detail="Invalid or missing API token")
+
+
+async def require_stream_token(authorization: Optional[str] = Header(None), token: Optional[str] = Query(None)):
+    if settings.api_token and token is not None:
+        if not hmac.compare_digest(token, settings.api_token):
+            raise HTTPException(status_code=401, detail="Invalid or missing API token")
+        return
+    await require_token(authorization)
+
+
+router = APIRouter(prefix="/api", dependencies=[Depends(require_token)])
+# Server-Sent Events, opened by EventSource (no custom headers)
+stream_router = APIRouter(prefix="/api", dependencies=[Depends(require_stream_token)])
+
+
+def etag(*parts) -> str:
+    return 'W/"' + "-".join(str(p) for p in (API_REVISION,) + parts) + '"'
+
+
+def cache_headers(tag: str) -> dict:
+    # Clients may keep the body but must revalidate before every use
+    return {"ETag": tag, "Cache-Control": "no-cache"}
+
+
+def not_modified(request: Request, tag: str, endpoint: str) -> Optional[Response]:
+    """A 304 when ``If-None-Match`` matches ``tag`` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = {t.strip().removeprefix("W/") for t in header.split(",")}
+    if "*" in candidates or tag.removeprefix("W/") in candidates:
+        api_responses_total.labels(endpoint=endpoint, status="304").inc()
+        return Response(status_code=304, headers=cache_headers(tag))
+    return None
+
+
+def ok(body, tag: str, endpoint: str) -> JSONResponse:
+    api_responses_total.labels(endpoint=endpoint, status="200").inc()
+    return JSONResponse(jsonable(body), headers=cache_headers(tag))
+
+
+def jsonable(value):
+    if isinstance(value, dict):
+        return {k: jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def challenge_body(ch: Challenge) -> dict:
+    return {
+        "id": ch.id,
+        "channel": ch.slack_channel_id,
+        "activity": ch.activity_type.value,
+        "unit": CANONICAL_UNITS[ch.activity_type],
+        "start_date": ch.start_date,
+        "end_date": ch.end_date,
+        "is_active": bool(ch.is_active),
+        "archived": ch.archived_at is not None,
+    }
+
+
+async def get_challenge(db, challenge_id: int) -> Challenge:
+    ch = await db.get(Challenge, challenge_id)
+    if ch is None:
+        raise HTTPException(status_code=404, detail=f"Challenge {challenge_id} not found")
+    return ch
+
+
+@router.get("/challenges")
+async def list_challenges(request: Request, active: Optional[bool] = None):
+    tag = etag("challenges", await challenges_version(), active)
+    if (cached := not_modified(request, tag, "challenges")) is not None:
+        return cached
+    stmt = select(Challenge).order_by(Challenge.start_date.desc())
+    if active is not None:
+        stmt = stmt.where(Challenge.is_active == active)
+    async with async_session() as db:
+        challenges = (await db.execute(stmt)).scalars().all()
+    return ok([challenge_body(ch) for ch in challenges], tag, "challenges")
+
+
+@router.get("/challenges/{challenge_id}")
+async def get_challenge_detail(challenge_id: int, request: Request):
+    tag = etag("challenge", challenge_id, await challenge_version(challenge_id))
+    if (cached := not_modified(request, tag, "challenge")) is not None:
+        return cached
+    async with async_session() as db:
+        ch = await get_challenge(db, challenge_id)
+        stats = archive_reader.stats(ch.id) if ch.archived_at else await challenge_stats(db, ch.id)
+    return ok(dict(challenge_body(ch), **stats), tag, "challenge")
+
+
+@router.get("/challenges/{challenge_id}/leaderboard")
+async def get_leaderboard(challenge_id: int, request: Request, limit: int = Query(10, ge=1, le=1000)):
+    tag = etag("leaderboard", challenge_id, await challenge_version(challenge_id), limit)
+    if (cached := not_modified(request, tag, "leaderboard")) is not None:
+        return cached
+    async with async_session() as db:
+        ch = await get_challenge(db, challenge_id)
+        if ch.archived_at:
+            rows, refreshed_at = archive_reader.leaderboard(ch.id, limit), ch.archived_at
+        else:
+            rows, refreshed_at = await leaderboard(db, ch.id, limit)
+    names = await user_directory.names(uid for uid, _ in rows)
+    return ok({
+        "challenge_id": ch.id,
+        "unit": CANONICAL_UNITS[ch.activity_type],
+        "refreshed_at": refreshed_at,
+        "rows": [
+            {"rank": rank, "user_id": uid, "name": names.get(uid), "total": total}
+            for rank, (uid, total) in enumerate(rows, 1)
+        ],
+    }, tag, "leaderboard")
+
+
+async def stream_results(ch: Challenge, user: Optional[str]) -> AsyncIterator[str]:
+    """NDJSON lines of a challenge's results, newest first for a single user."""
+    batch = settings.api_stream_batch
+    if ch.archived_at:
+        table = archive_reader.table(ch.id)
+        if table is None:
+            return
+        if user:
+            table = table.filter(pc.equal(table["user_id"], user))
+        # Files written before canonical values existed lack that column
+        columns = [c for c in RESULT_COLUMNS if c in table.column_names]
+        for record_batch in table.select(columns).to_batches(max_chunksize=batch):
+            yield "".join(json.dumps(jsonable(row)) + "\n" for row in record_batch.to_pylist())
+        return
+
+    stmt = select(*(getattr(Result, c) for c in RESULT_COLUMNS)).where(Result.challenge_id == ch.id)
+    if user:
+        # ix_results_challenge_user_date
+        stmt = stmt.where(Result.user_id == user).order_by(Result.date.desc(), Result.id.desc())
+    else:
+        stmt = stmt.order_by(Result.id)
+    async with async_session() as db:
+        # yield_per makes asyncpg fetch from a server-side cursor in batches
+        stream = await db.stream(stmt.execution_options(yield_per=batch))
+        async for rows in stream.partitions():
+            yield "".join(json.dumps(jsonable(row._asdict())) + "\n" for row in rows)
+
+
+@router.get("/challenges/{challenge_id}/results")
+async def get_results(challenge_id: int, request: Request, user: Optional[str] = None):
+    tag = etag("results", challenge_id, await challenge_version(challenge_id), user or "")
+    if (cached := not_modified(request, tag, "results")) is not None:
+        return cached
+    async with async_session() as db:
+        ch = await get_challenge(db, challenge_id)
+    api_responses_total.labels(endpoint="results", status="200").inc()
+    return StreamingResponse(stream_results(ch, user), media_type="application/x-ndjson", headers=cache_headers(tag))
+
+
+@stream_router.get("/challenges/{challenge_id}/live")
+async def live_leaderboard(challenge_id: int, request: Request):
+    async with async_session() as db:
+        ch = await get_challenge(db, challenge_id)
+    if ch.archived_at:
+        raise HTTPException(status_code=410, detail=f"Challenge {challenge_id} is archived")
+    queue = await live_hub.subscribe(ch.id)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            yield f"retry: {settings.live_retry_ms}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), settings.live_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield ": ping\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            await live_hub.unsubscribe(ch.id, queue)
+
+    api_responses_total.labels(endpoint="live", status="200").inc()
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Stop nginx-style proxies from buffering the stream
+        "X-Accel-Buffering": "no",
+    })
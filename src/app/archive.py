@@ -0,0 +1,212 @@
+# src/app/archive.py
+"""
+Cold storage for ended challenges.
+
+Results of challenges that have been stopped (or replaced by a new start)
+are written to one zstd-compressed Parquet file per challenge and removed
+from Postgres by dropping the challenge's results partition. Historical
+exports and stats read the files back through memory-mapped access.
+
+    python -m app.archive            # archive everything eligible
+    python -m app.archive --challenge 12
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import delete, select, text, update
+
+from .config import settings
+from .data_versions import challenge_changed
+from .models.challenge import Challenge, Result
+from .models.database import async_session
+from .models.partitions import results_partition_name
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+SCHEMA = pa.schema([
+    ("id", pa.int32()),
+    ("user_id", pa.string()),
+    ("date", pa.timestamp("us")),
+    ("value", pa.float64()),
+    ("unit", pa.string()),
+    ("canonical_value", pa.float64()),
+    ("screenshot_url", pa.string()),
+    ("is_validated", pa.bool_()),
+    ("validation_error", pa.string()),
+    ("validated_by", pa.string()),
+    ("validated_at", pa.timestamp("us")),
+    ("slack_ts", pa.string()),
+    ("image_hash", pa.int64()),
+    ("created_at", pa.timestamp("us")),
+])
+
+
+def archive_path(challenge_id: int) -> str:
+    return os.path.join(settings.archive_dir, f"challenge_{int(challenge_id)}.parquet")
+
+
+def _fsync(path: str):
+    """Flush a file (or a directory's entries) to disk."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_archive(challenge_id: int, results: List[Result]) -> str:
+    """Write results to the challenge's Parquet file, atomically and durably."""
+    os.makedirs(settings.archive_dir, exist_ok=True)
+    columns = {field.name: [getattr(r, field.name) for r in results] for field in SCHEMA}
+    table = pa.table(columns, schema=SCHEMA)
+
+    path = archive_path(challenge_id)
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    if pq.read_metadata(tmp).num_rows != len(results):
+        os.remove(tmp)
+        raise IOError(f"Archive for challenge {challenge_id} is incomplete")
+    # The rows are dropped right after this returns, so the file and its name must survive a crash
+    _fsync(tmp)
+    os.replace(tmp, path)
+    _fsync(settings.archive_dir)
+    return path
+
+
+async def archive_challenge(challenge_id: int) -> int:
+    """Move one ended challenge's results to cold storage; returns the row count."""
+    async with async_session() as db:
+        # Writers hold the challenge row FOR SHARE, so no result can land between the SELECT and the DROP
+        challenge = (await db.execute(
+            select(Challenge).where(Challenge.id == challenge_id).with_for_update()
+        )).scalars().first()
+        if challenge is None:
+            raise ValueError(f"Challenge {challenge_id} does not exist")
+        if challenge.is_active:
+            raise ValueError(f"Challenge {challenge_id} is still active")
+        if challenge.archived_at is not None:
+            return 0
+
+        results = (await db.execute(
+            select(Result)
+            .where(Result.challenge_id == challenge_id)
+            .order_by(Result.id)
+        )).scalars().all()
+        path = write_archive(challenge_id, results)
+
+        # The file is durable; now drop the rows in the same transaction that marks the challenge
+        partition = results_partition_name(challenge_id)
+        exists = (await db.execute(text("SELECT to_regclass(:name)"), {"name": partition})).scalar()
+        if exists:
+            await db.execute(text(f"ALTER TABLE results DETACH PARTITION {partition}"))
+            await db.execute(text(f"DROP TABLE {partition}"))
+        else:
+            await db.execute(delete(Result).where(Result.challenge_id == challenge_id))
+        await db.execute(
+            update(Challenge)
+            .where(Challenge.id == challenge_id)
+            .values(archived_at=datetime.utcnow())
+        )
+        await db.commit()
+    await challenge_changed(challenge_id, listing=True)
+
+    logger.info(f"Archived {len(results)} results of challenge {challenge_id} to {path}")
+    return len(results)
+
+
+async def archive_ended_challenges() -> List[int]:
+    """Archive every inactive challenge that ended more than the grace period ago."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.archive_grace_days)
+    async with async_session() as db:
+        ids = (await db.execute(
+            select(Challenge.id).where(
+                Challenge.is_active == False,
+                Challenge.archived_at.is_(None),
+                Challenge.updated_at < cutoff
+            )
+        )).scalars().all()
+
+    archived = []
+    for challenge_id in ids:
+        try:
+            await archive_challenge(challenge_id)
+            archived.append(challenge_id)
+        except Exception as e:
+            logger.error(f"Failed to archive challenge {challenge_id}: {e}")
+    return archived
+
+
+class ArchiveReader:
+    """Read-only access to archived challenges."""
+
+    def table(self, challenge_id: int) -> Optional[pa.Table]:
+        path = archive_path(challenge_id)
+        if not os.path.exists(path):
+            return None
+        # memory_map avoids copying the file into the heap before decoding pages
+        return pq.read_table(path, memory_map=True)
+
+    def validated(self, challenge_id: int) -> Optional[pa.Table]:
+        """Only the rows that count towards totals, like the live rollups."""
+        table = self.table(challenge_id)
+        if table is None:
+            return None
+        return table.filter(pc.equal(table["is_validated"], True))
+
+    def results(self, challenge_id: int) -> List[dict]:
+        """All archived rows, newest first."""
+        table = self.table(challenge_id)
+        if table is None:
+            return []
+        table = table.sort_by([("date", "descending")])
+        return table.to_pylist()
+
+    def leaderboard(self, challenge_id: int, limit: int = 10) -> List[tuple]:
+        """``(user_id, total)`` pairs, highest total first."""
+        table = self.validated(challenge_id)
+        if table is None:
+            return []
+        # Files written before canonical values existed only have the raw value
+        column = "canonical_value" if "canonical_value" in table.column_names else "value"
+        totals = table.group_by("user_id").aggregate([(column, "sum")])
+        totals = totals.sort_by([(f"{column}_sum", "descending")]).slice(0, limit)
+        return list(zip(totals["user_id"].to_pylist(), totals[f"{column}_sum"].to_pylist()))
+
+    def stats(self, challenge_id: int) -> dict:
+        table = self.validated(challenge_id)
+        if table is None:
+            return {"participants": 0, "submissions": 0}
+        return {
+            "participants": pc.count_distinct(table["user_id"]).as_py(),
+            "submissions": table.num_rows,
+        }
+
+
+archive_reader = ArchiveReader()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Archive ended challenges to Parquet")
+    parser.add_argument("--challenge", type=int, help="Archive a single challenge")
+    args = parser.parse_args(argv)
+
+    import asyncio
+    if args.challenge:
+        count = asyncio.run(archive_challenge(args.challenge))
+        print(f"Archived {count} results of challenge {args.challenge}")
+    else:
+        archived = asyncio.run(archive_ended_challenges())
+        print(f"Archived challenges: {archived or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
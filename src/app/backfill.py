@@ -0,0 +1,203 @@
+# src/app/backfill.py
+"""
+Replay workflow-bot submissions from a challenge channel's history.
+
+Pages through ``conversations_history`` and runs every workflow message
+through the same extraction and save path as ``process_submission``.
+
+    python -m app.backfill C08SM8NESGJ --oldest 2025-05-01 --dry-run
+    python -m app.backfill C08SM8NESGJ --reprocess --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from slack_sdk import WebClient
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+
+from .config import settings
+from .models.database import async_session
+from .tasks import extract_submission, find_challenge, find_result, save_result, screenshot_hash
+from .utils.aio import run_sync
+from .utils.logging import setup_logger
+from .utils.resilience import Deadline
+from .utils.units import UnitError
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+
+def checkpoint_key(channel: str, oldest: Optional[str], latest: Optional[str], reprocess: bool) -> str:
+    """Identify a run so a checkpoint only resumes the same channel, range and mode."""
+    return f"{channel}:{oldest or ''}:{latest or ''}{':reprocess' if reprocess else ''}"
+
+
+def _read_checkpoints(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoints(path: str, data: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str, key: str) -> Optional[str]:
+    """Return the ts below which this run has already been processed."""
+    return _read_checkpoints(path).get(key)
+
+
+def save_checkpoint(path: str, key: str, latest: str):
+    """Record progress atomically so an interrupted run can resume."""
+    data = _read_checkpoints(path)
+    data[key] = latest
+    _write_checkpoints(path, data)
+
+
+def clear_checkpoint(path: str, key: str):
+    """Forget a finished (or restarted) run so the next one starts from the top."""
+    data = _read_checkpoints(path)
+    if data.pop(key, None) is not None:
+        _write_checkpoints(path, data)
+
+
+def iter_history(client: WebClient, channel: str, oldest: Optional[str], latest: Optional[str]):
+    """Yield pages of messages, newest first, following the response cursor."""
+    cursor = None
+    while True:
+        kwargs = {"channel": channel, "limit": 200, "inclusive": False}
+        if oldest:
+            kwargs["oldest"] = oldest
+        if latest:
+            kwargs["latest"] = latest
+        if cursor:
+            kwargs["cursor"] = cursor
+        response = client.conversations_history(**kwargs)
+        yield response["messages"]
+        cursor = (response.get("response_metadata") or {}).get("next_cursor")
+        if not response.get("has_more") or not cursor:
+            return
+
+
+def to_event(message: dict, channel: str) -> dict:
+    """Build the same event dict the Bolt handlers enqueue."""
+    return {
+        "user": message.get("user"),
+        "text": message.get("text", ""),
+        "files": message.get("files", []),
+        "channel": channel,
+        "ts": message["ts"],
+    }
+
+
+def process_message(event: dict, dry_run: bool, reprocess: bool) -> str:
+    """Extract one submission and either save it or diff it against the stored row."""
+    posted_at = datetime.utcfromtimestamp(float(event["ts"]))
+
+    async def _existing():
+        async with async_session() as db:
+            challenge = await find_challenge(db, event["channel"], at=posted_at)
+            if not challenge:
+                return None, None
+            return challenge, await find_result(db, challenge.id, event["ts"])
+
+    challenge, existing = run_sync(_existing())
+    if challenge is None:
+        return f"! {event['ts']} no challenge covers {posted_at:%Y-%m-%d}"
+    if existing is not None and not (dry_run or reprocess):
+        return f"= {event['ts']} already recorded (result {existing.id})"
+
+    try:
+        deadline, images = Deadline.after(), {}
+        submission = extract_submission(event, deadline, images)
+        # Stored with the row so reprocessed screenshots join the duplicate index
+        submission["image_hash"] = screenshot_hash(event, deadline, images)
+    except Exception as e:
+        return f"! {event['ts']} extraction failed: {e}"
+
+    new = f"{submission['value']} {submission['unit']} on {submission['date']:%Y-%m-%d}"
+    if existing is None:
+        line = f"+ {event['ts']} <@{event['user']}> {new}"
+    else:
+        old = f"{existing.value} {existing.unit} on {existing.date:%Y-%m-%d}"
+        line = f"= {event['ts']} unchanged" if old == new else f"~ {event['ts']} <@{event['user']}> {old} -> {new}"
+
+    if not dry_run:
+        try:
+            run_sync(save_result(submission, event, at=posted_at, replace=reprocess))
+        except UnitError as e:
+            return f"! {event['ts']} unit error: {e}"
+        except Exception as e:
+            return f"! {event['ts']} save failed: {e}"
+    return line
+
+
+def parse_ts(value: Optional[str]) -> Optional[str]:
+    """Accept either a Slack ts or an ISO date."""
+    if not value:
+        return None
+    try:
+        float(value)
+        return value
+    except ValueError:
+        return str(datetime.fromisoformat(value).timestamp())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill or reprocess challenge submissions from channel history")
+    parser.add_argument("channel", help="Slack channel ID")
+    parser.add_argument("--oldest", help="Only messages after this ts or ISO date")
+    parser.add_argument("--latest", help="Only messages before this ts or ISO date")
+    parser.add_argument("--dry-run", action="store_true", help="Print a diff against stored results without writing")
+    parser.add_argument("--reprocess", action="store_true", help="Overwrite results already recorded for a message")
+    parser.add_argument("--concurrency", type=int, default=4, help="Submissions extracted in parallel")
+    parser.add_argument("--checkpoint", default=".backfill-checkpoint.json", help="Resume file (ignored in dry-run)")
+    parser.add_argument("--restart", action="store_true", help="Discard a saved checkpoint and start from the newest message")
+    args = parser.parse_args(argv)
+
+    client = WebClient(token=settings.slack_bot_token)
+    # Sleep through Slack's Retry-After on 429s instead of failing the run
+    client.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=10))
+
+    oldest, latest = parse_ts(args.oldest), parse_ts(args.latest)
+    key = checkpoint_key(args.channel, oldest, latest, args.reprocess)
+    if args.restart and not args.dry_run:
+        clear_checkpoint(args.checkpoint, key)
+    elif not args.dry_run and latest is None:
+        # An explicit --latest always wins; only open-ended runs resume
+        latest = load_checkpoint(args.checkpoint, key)
+        if latest:
+            logger.info(f"Resuming {args.channel} below ts {latest}")
+
+    counts = {"+": 0, "~": 0, "=": 0, "!": 0}
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for page in iter_history(client, args.channel, oldest, latest):
+            events = [
+                to_event(m, args.channel) for m in page
+                if m.get("bot_id") == settings.workflow_bot_id and m.get("user")
+            ]
+            for line in pool.map(lambda e: process_message(e, args.dry_run, args.reprocess), events):
+                counts[line[0]] += 1
+                print(line)
+
+            if page and not args.dry_run:
+                save_checkpoint(args.checkpoint, key, min(m["ts"] for m in page))
+
+    if not args.dry_run:
+        # History exhausted: the next run of this range starts over
+        clear_checkpoint(args.checkpoint, key)
+
+    print(f"new={counts['+']} changed={counts['~']} unchanged={counts['=']} failed={counts['!']}")
+    return 1 if counts["!"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
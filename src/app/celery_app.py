@@ -1,18 +1,106 @@
+# src/app/celery_app.py
+"""
+The Celery application: broker, queues, routing and the beat schedule.
+
+Submissions run on two lanes: ``submissions.fast`` for text-only messages
+(an LLM call) and ``submissions.heavy`` for screenshots (download, OCR and
+LLM). The app feeds each lane from a per-channel/per-user fair queue (see
+``fair_queue.py``); periodic jobs go to ``maintenance``.
+"""
+
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_init
+
+from .clients.ollama import register_model_warmer
 from .config import settings
+from .envelope import SERIALIZER, register_serializer
+from .metrics import register_celery_metrics
+from .profiling import register_task_profiling
+from .tracing import setup_tracing
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+FAST_LANE = "submissions.fast"
+HEAVY_LANE = "submissions.heavy"
+LANES = (FAST_LANE, HEAVY_LANE)
+MAINTENANCE_QUEUE = "maintenance"
+BROKER_QUEUES = LANES + (MAINTENANCE_QUEUE,)
+
+register_serializer()
 
 celery_app = Celery(
     "fitbot",
     broker=settings.redis_url,
     backend=settings.redis_url,
-    include=["src.app.tasks"]
+    include=["app.tasks"]
 )
 
-# Optional configuration
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    task_serializer=SERIALIZER,
+    result_serializer=SERIALIZER,
+    # JSON for messages published before the switch
+    accept_content=[SERIALIZER, "json"],
+    result_accept_content=[SERIALIZER, "json"],
+    result_expires=settings.result_expires_seconds,
     timezone="UTC",
     enable_utc=True,
-) 
\ No newline at end of file
+    # process_submission is published with an explicit lane queue
+    task_default_queue=MAINTENANCE_QUEUE,
+    # Reserve one task per slot so ordering stays with the fair queue, not in worker buffers
+    worker_prefetch_multiplier=1,
+)
+
+
+def lane_for(submission: dict) -> str:
+    return HEAVY_LANE if submission.get("files") else FAST_LANE
+
+
+def parse_crontab(expr: str) -> crontab:
+    """``"minute hour day_of_month month_of_year day_of_week"`` -> crontab; ValueError if malformed."""
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"expected 5 fields, got {len(fields)}")
+    minute, hour, day_of_month, month_of_year, day_of_week = fields
+    return crontab(minute=minute, hour=hour, day_of_month=day_of_month,
+                   month_of_year=month_of_year, day_of_week=day_of_week)
+
+
+# Run by `celery beat` (one instance); expiring keeps a backlog from piling up while workers are down
+celery_app.conf.beat_schedule = {
+    "close-expired-challenges": {
+        "task": "close_expired_challenges",
+        "schedule": settings.challenge_close_interval_seconds,
+        "options": {"expires": settings.challenge_close_interval_seconds},
+    },
+    "refresh-rollups": {
+        "task": "refresh_rollups",
+        "schedule": settings.rollup_interval_seconds,
+        "options": {"expires": settings.rollup_interval_seconds},
+    },
+    "archive-ended-challenges": {
+        "task": "archive_ended_challenges",
+        "schedule": crontab(hour=3, minute=30),
+    },
+}
+if settings.digest_schedule:
+    # Every worker, beat and the app import this module: a bad value only loses the digest
+    try:
+        celery_app.conf.beat_schedule["post-leaderboard-digests"] = {
+            "task": "post_leaderboard_digests",
+            "schedule": parse_crontab(settings.digest_schedule),
+            "options": {"expires": 3600},
+        }
+    except ValueError as e:
+        logger.error(f"Invalid DIGEST_SCHEDULE {settings.digest_schedule!r}, digests are disabled: {e}")
+
+register_task_profiling(celery_app)
+register_celery_metrics(celery_app)
+register_model_warmer(celery_app)
+
+
+@worker_init.connect(weak=False)
+def init_worker_tracing(**kwargs):
+    # Only workers trace; beat and the app import this module too
+    setup_tracing("fitbot-worker")
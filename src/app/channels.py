@@ -0,0 +1,131 @@
+# src/app/channels.py
+"""
+Channel metadata: which channels host a challenge, and for which activity.
+
+Slack events and commands carry channel IDs, while the activity is encoded
+in the channel name (``...-running-challenge``). Names are resolved once via
+``conversations_info`` and cached in process and in Redis; ``channel_rename``
+events keep both caches current.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from slack_sdk.web.async_client import AsyncWebClient # type: ignore
+
+from .clients.redis_client import get_async_redis
+from .config import settings
+from .models.challenge import ActivityType
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+# Map channel names to ActivityType
+CHANNEL_ACTIVITY = {
+    "calories-challenge": ActivityType.CALORIES,
+    "cycling-challenge":  ActivityType.CYCLING,
+    "running-challenge":  ActivityType.RUNNING,
+    "swimming-challenge": ActivityType.SWIMMING,
+    "walking-challenge":  ActivityType.WALKING,
+}
+
+CHANNEL_KEY = "fitbot:channel:{}"
+
+# Channels we could not look up are retried sooner than known ones
+NEGATIVE_TTL = 60
+
+
+def activity_for_name(name: str) -> Optional[ActivityType]:
+    for suffix, activity in CHANNEL_ACTIVITY.items():
+        if name == suffix or name.endswith(f"-{suffix}"):
+            return activity
+    return None
+
+
+@dataclass
+class ChannelInfo:
+    id: str
+    name: str
+    activity: Optional[ActivityType]
+
+    @property
+    def is_challenge_channel(self) -> bool:
+        if settings.challenge_channels and self.id not in settings.challenge_channels:
+            return False
+        return self.activity is not None
+
+
+class ChannelResolver:
+    """ID -> name -> ActivityType, cached in process and in Redis with a TTL."""
+
+    def __init__(self, client: AsyncWebClient = None, ttl: int = None):
+        self.client = client or AsyncWebClient(token=settings.slack_bot_token)
+        self.ttl = ttl or settings.channel_cache_ttl
+        self._local: Dict[str, Tuple[str, float]] = {}
+
+    async def name(self, channel_id: str) -> str:
+        """Return the channel's name ("" if Slack would not tell us)."""
+        cached = self._local.get(channel_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        r = get_async_redis()
+        try:
+            name = await r.get(CHANNEL_KEY.format(channel_id))
+        except Exception as e:
+            logger.error(f"Channel cache read failed: {e}")
+            name = None
+
+        ttl = self.ttl
+        if name is None:
+            try:
+                response = await self.client.conversations_info(channel=channel_id)
+                name = response["channel"]["name"]
+            except Exception as e:
+                logger.warning(f"conversations_info failed for {channel_id}: {e}")
+                name, ttl = "", NEGATIVE_TTL
+            await self._store(channel_id, name, ttl)
+        else:
+            # A negative entry from another replica must expire as soon here
+            self._local[channel_id] = (name, time.monotonic() + (ttl if name else NEGATIVE_TTL))
+        return name
+
+    async def resolve(self, channel_id: str) -> ChannelInfo:
+        name = await self.name(channel_id)
+        return ChannelInfo(id=channel_id, name=name, activity=activity_for_name(name))
+
+    async def rename(self, channel_id: str, name: str):
+        """Apply a ``channel_rename`` event."""
+        logger.info(f"Channel {channel_id} renamed to #{name}")
+        await self._store(channel_id, name, self.ttl)
+
+    async def forget(self, channel_id: str):
+        self._local.pop(channel_id, None)
+        try:
+            await get_async_redis().delete(CHANNEL_KEY.format(channel_id))
+        except Exception as e:
+            logger.error(f"Channel cache delete failed: {e}")
+
+    async def _store(self, channel_id: str, name: str, ttl: int):
+        self._local[channel_id] = (name, time.monotonic() + ttl)
+        try:
+            await get_async_redis().set(CHANNEL_KEY.format(channel_id), name, ex=ttl)
+        except Exception as e:
+            logger.error(f"Channel cache write failed: {e}")
+
+
+channel_resolver = ChannelResolver()
+
+
+def register_channel_listeners(app):
+    """Keep the channel cache in step with renames and deletions."""
+
+    @app.event("channel_rename")
+    async def handle_channel_rename(event):
+        channel = event["channel"]
+        await channel_resolver.rename(channel["id"], channel["name"])
+
+    @app.event("channel_deleted")
+    async def handle_channel_deleted(event):
+        await channel_resolver.forget(event["channel"])
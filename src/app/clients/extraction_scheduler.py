@@ -0,0 +1,124 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Optional, Tuple
+from ..config import settings
+from ..metrics import ollama_batch_size
+from ..utils.logging import setup_logger
+from ..utils.resilience import Deadline, DeadlineExceeded
+from .ollama import OllamaClient
+
+logger = setup_logger(__name__)
+
+
+class ExtractionScheduler:
+    """Coalesce extraction requests from all task threads of a worker.
+
+    Jobs submitted within ``window_ms`` of each other (up to ``max_batch_size``)
+    are dispatched together, either as concurrent Ollama requests bounded by
+    ``parallelism`` or as a single multi-item prompt, and each caller gets its
+    own answer back through a Future.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        window_ms: int = None,
+        max_batch_size: int = None,
+        parallelism: int = None,
+        mode: str = None,
+    ):
+        self.client = client
+        self.window = (window_ms if window_ms is not None else settings.ollama_batch_window_ms) / 1000
+        self.max_batch_size = max_batch_size or settings.ollama_max_batch_size
+        self.parallelism = parallelism or settings.ollama_parallelism
+        self.mode = mode or settings.ollama_batch_mode
+        if self.mode not in ("concurrent", "prompt"):
+            raise ValueError(f"Unknown batch mode: {self.mode}")
+
+        self._pending: List[Tuple[str, Optional[Deadline], Future]] = []
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="ollama")
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="extraction-scheduler", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str, deadline: Optional[Deadline] = None) -> Future:
+        """Queue a text for extraction and return a Future for its metrics."""
+        future: Future = Future()
+        with self._cond:
+            self._ensure_started()
+            self._pending.append((text, deadline, future))
+            self._cond.notify()
+        return future
+
+    def extract(self, text: str, deadline: Optional[Deadline] = None) -> Optional[dict]:
+        """Blocking helper used by tasks: submit and wait until the result or the deadline."""
+        future = self.submit(text, deadline)
+        try:
+            return future.result(timeout=deadline.remaining() if deadline else None)
+        except FutureTimeoutError:
+            future.cancel()
+            raise DeadlineExceeded("Time budget exhausted waiting for extraction")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+                # Hold the window open so concurrent tasks can join the batch
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._pending[:self.max_batch_size]
+                self._pending = self._pending[self.max_batch_size:]
+
+            ollama_batch_size.observe(len(batch))
+            logger.debug(f"Dispatching extraction batch of {len(batch)} ({self.mode})")
+            if self.mode == "prompt" and len(batch) > 1:
+                self._executor.submit(self._dispatch_prompt, batch)
+            else:
+                for job in batch:
+                    self._executor.submit(self._dispatch_one, job)
+
+    def _dispatch_one(self, job: Tuple[str, Optional[Deadline], Future], tier: int = 0):
+        text, deadline, future = job
+        if not future.set_running_or_notify_cancel():
+            return
+        if deadline is not None and deadline.expired:
+            future.set_exception(DeadlineExceeded("Time budget exhausted before extraction"))
+            return
+        try:
+            future.set_result(self.client.extract_metrics(text, deadline=deadline, tier=tier))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _dispatch_prompt(self, batch: List[Tuple[str, Optional[Deadline], Future]]):
+        # The shared request must finish before the tightest deadline in the batch
+        deadlines = [deadline for _, deadline, _ in batch if deadline is not None]
+        deadline = min(deadlines, key=lambda d: d.expires_at) if deadlines else None
+        try:
+            results = self.client.extract_metrics_batch([text for text, _, _ in batch], deadline=deadline)
+        except Exception as e:
+            logger.error(f"Batch extraction failed: {e}")
+            results = [None] * len(batch)
+
+        # Items the first tier got wrong in a working batch go straight to the next tier
+        tier = 1 if any(result is not None for result in results) else 0
+        for job, result in zip(batch, results):
+            future = job[2]
+            if result is None:
+                # Fall back to a dedicated request for items the batch missed, in parallel
+                # rather than one after another in this thread
+                self._executor.submit(self._dispatch_one, job, tier)
+                continue
+            if future.set_running_or_notify_cancel():
+                future.set_result(result)
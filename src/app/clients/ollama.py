@@ -1,60 +1,364 @@
+import json
+import threading
+import time
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
+from datetime import datetime
+from typing import Callable, List, Optional, TypedDict
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from ..config import settings
+from ..metrics import ollama_escalations_total, ollama_model_duration, ollama_model_requests_total, ollama_model_warm
 from ..utils.logging import setup_logger
+from ..utils.resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, stop_before_deadline
+from ..utils.units import UNITS, UnitError, lookup
 
 logger = setup_logger(__name__)
 
-class OllamaClient:
+ollama_breaker = CircuitBreaker("ollama")
+retry_wait = wait_exponential(multiplier=1, min=4, max=10)
+
+# Offered to the model so its answers stay within what to_canonical can convert
+UNIT_NAMES = ", ".join(sorted({unit.name for unit in UNITS.values()}))
+
+
+class ExtractedMetrics(TypedDict):
+    date: str
+    discipline: str
+    value: float
+    unit: str
+    confidence: float  # as reported by the model, 0..1
+
+
+class MalformedResponseError(ValueError):
+    """Raised when the model output never forms a valid object."""
+
+
+def validate_metrics(obj) -> Optional[ExtractedMetrics]:
+    """Coerce a parsed object into ExtractedMetrics, or None if it does not fit the schema."""
+    if not isinstance(obj, dict):
+        return None
+    try:
+        date = str(obj["date"]).strip()
+        datetime.strptime(date, "%Y-%m-%d")
+        value = float(obj["value"])
+        unit = str(obj["unit"]).strip()
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not unit:
+        return None
+    try:
+        confidence = min(max(float(obj.get("confidence", 1.0)), 0.0), 1.0)
+    except (TypeError, ValueError):
+        confidence = 0.0
+    return ExtractedMetrics(
+        date=date,
+        discipline=str(obj.get("discipline") or "").strip().lower(),
+        value=value,
+        unit=unit,
+        confidence=confidence,
+    )
+
+
+def weakness(result: Optional[ExtractedMetrics]) -> Optional[str]:
+    """Why an answer should go to the next model tier, or None when it is good enough."""
+    if result is None:
+        return "invalid"
+    if result["confidence"] < settings.ollama_escalate_confidence:
+        return "low_confidence"
+    try:
+        lookup(result["unit"])
+    except UnitError:
+        return "unknown_unit"
+    return None
+
+
+class JsonObjectScanner:
+    """Incrementally detect the end of the first top-level JSON object in a token stream."""
+
     def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Append a chunk; return the complete object text once its closing brace arrives."""
+        self.text += chunk
+        while self._pos < len(self.text):
+            ch = self.text[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._start is not None
+            elif ch in "{[":
+                if self._start is None:
+                    if ch != "{":
+                        continue
+                    self._start = self._pos - 1
+                self._depth += 1
+            elif ch in "}]" and self._start is not None:
+                self._depth -= 1
+                if self._depth == 0:
+                    return self.text[self._start:self._pos]
+        return None
+
+
+class OllamaClient:
+    def __init__(self, models: List[str] = None):
         self.base_url = settings.ollama_url
-        self.model = "llama2"
+        # Tiers, smallest first; self.model is the first tier
+        self.models = list(models or settings.ollama_model_tiers)
+        self.model = self.models[0]
+        self.num_predict = settings.ollama_num_predict
+        self.stream = settings.ollama_stream
 
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        stop=stop_after_attempt(3) | stop_before_deadline(retry_wait),
+        wait=retry_wait,
+        retry=retry_if_exception_type(requests.exceptions.RequestException),
         reraise=True
     )
-    def call_ollama(self, prompt: str) -> str:
-        """Call Ollama API with retry logic."""
+    def call_ollama(
+        self,
+        prompt: str,
+        validator: Callable[[object], Optional[object]] = None,
+        num_predict: int = None,
+        deadline: Optional[Deadline] = None,
+        model: str = None,
+    ):
+        """Call Ollama's generate API in JSON mode with retry logic.
+
+        In streaming mode the response is parsed as tokens arrive and the
+        connection is closed as soon as a complete object passes ``validator``,
+        so the model is never left generating trailing text. Timeouts are
+        capped by ``deadline`` and calls fail fast while the breaker is open.
+        """
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "format": "json",
+            "stream": self.stream,
+            "keep_alive": settings.ollama_keep_alive,
+            "options": {
+                "num_predict": num_predict or self.num_predict,
+                "temperature": 0,
+            },
+        }
+        validator = validator or (lambda obj: obj)
+        timeout = deadline.timeout(3, 10) if deadline else (3, 10)
         try:
-            response = requests.post(
-                f"{self.base_url}/api/run",
-                json={
-                    "model": self.model,
-                    "prompt": prompt
-                },
-                timeout=(3, 10)
-            )
-            response.raise_for_status()
-            return response.json()["completion"]
+            with ollama_breaker.guard():
+                response = requests.post(
+                    f"{self.base_url}/api/generate",
+                    json=payload,
+                    stream=self.stream,
+                    timeout=timeout
+                )
+                response.raise_for_status()
+
+                if not self.stream:
+                    result = validator(json.loads(response.json()["response"]))
+                    if result is None:
+                        raise MalformedResponseError("Model output does not match the expected schema")
+                    return result
+
+                scanner = JsonObjectScanner()
+                with response:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        candidate = scanner.feed(chunk.get("response", ""))
+                        if candidate is not None:
+                            result = validator(json.loads(candidate))
+                            if result is None:
+                                raise MalformedResponseError(f"Model output does not match the expected schema: {candidate}")
+                            logger.debug(f"Complete object received after {len(scanner.text)} chars, closing stream")
+                            return result
+                        if chunk.get("done"):
+                            break
+                raise MalformedResponseError(f"Stream ended without a complete object: {scanner.text!r}")
         except Exception as e:
             logger.error(f"Failed to call Ollama API: {e}")
             raise
 
-    def extract_metrics(self, text: str) -> dict:
-        """Extract date and discipline from text using Ollama."""
+    def extract_metrics(self, text: str, deadline: Optional[Deadline] = None, tier: int = 0) -> Optional[ExtractedMetrics]:
+        """Extract date and discipline from text, escalating through the model tiers.
+
+        Starts at ``tier`` and moves to the next model while the answer is
+        invalid, unsure or in an unknown unit and the deadline leaves room;
+        the last valid answer is returned when no tier is convincing.
+        """
         prompt = f"""Extract the following information from the text:
         - Date (in YYYY-MM-DD format)
         - Discipline (e.g., running, cycling, swimming)
         - Value (numeric)
-        - Unit (e.g., km, min, reps)
-        
+        - Unit (one of: {UNIT_NAMES})
+
         Text: {text}
-        
-        Return the result in JSON format:
+
+        Return the result in JSON format, with your confidence (0 to 1) that it is correct:
         {{
             "date": "YYYY-MM-DD",
             "discipline": "string",
             "value": number,
-            "unit": "string"
+            "unit": "string",
+            "confidence": number
         }}
         """
-        
+
+        best = None
+        tier = min(tier, len(self.models) - 1)
+        for i, model in enumerate(self.models[tier:], tier):
+            started = time.perf_counter()
+            try:
+                result = self.call_ollama(prompt, validator=validate_metrics, deadline=deadline, model=model)
+            except (DeadlineExceeded, CircuitOpenError):
+                # No other tier can help: report the budget or the breaker, not a miss
+                raise
+            except Exception as e:
+                logger.error(f"Failed to extract metrics with {model}: {e}")
+                result = None
+            ollama_model_duration.labels(model=model).observe(time.perf_counter() - started)
+
+            reason = weakness(result)
+            ollama_model_requests_total.labels(model=model, outcome=reason or "accepted").inc()
+            if reason is None:
+                logger.debug(f"{model} extracted metrics: {result}")
+                return result
+            best = result or best
+            if i == len(self.models) - 1 or (deadline and deadline.remaining() < settings.ollama_escalate_min_seconds):
+                break
+            ollama_escalations_total.labels(model=model, reason=reason).inc()
+            logger.info(f"Escalating extraction from {model} to {self.models[i + 1]}: {reason}")
+        return best
+
+    def extract_metrics_batch(
+        self, texts: List[str], deadline: Optional[Deadline] = None
+    ) -> List[Optional[ExtractedMetrics]]:
+        """Extract metrics for several submissions with a single prompt.
+
+        The model is asked for an object holding one result per numbered item;
+        items it could not answer come back as None.
+        """
+        items = "\n".join(f"{i}. {t}" for i, t in enumerate(texts, 1))
+        prompt = f"""For each numbered text below, extract the following information:
+        - Date (in YYYY-MM-DD format)
+        - Discipline (e.g., running, cycling, swimming)
+        - Value (numeric)
+        - Unit (one of: {UNIT_NAMES})
+
+        Texts:
+        {items}
+
+        Return a JSON object whose "results" array has exactly {len(texts)} objects, in the same order as the texts:
+        {{
+            "results": [
+                {{
+                    "date": "YYYY-MM-DD",
+                    "discipline": "string",
+                    "value": number,
+                    "unit": "string",
+                    "confidence": number
+                }}
+            ]
+        }}
+        """
+
+        def validate_batch(obj):
+            results = obj.get("results") if isinstance(obj, dict) else None
+            if not isinstance(results, list) or len(results) != len(texts):
+                return None
+            items = [validate_metrics(item) for item in results]
+            if len(self.models) == 1:
+                return items
+            # Weak items come back as None and are retried one by one on the next tier
+            for i, item in enumerate(items):
+                reason = weakness(item)
+                if reason is not None:
+                    ollama_escalations_total.labels(model=self.model, reason=reason).inc()
+                    items[i] = None
+            return items
+
         try:
-            result = self.call_ollama(prompt)
-            logger.debug(f"Ollama extracted metrics: {result}")
+            result = self.call_ollama(
+                prompt,
+                validator=validate_batch,
+                num_predict=self.num_predict * len(texts),
+                deadline=deadline
+            )
+            logger.debug(f"Ollama extracted batch metrics: {result}")
             return result
         except Exception as e:
-            logger.error(f"Failed to extract metrics: {e}")
-            return None 
\ No newline at end of file
+            logger.error(f"Failed to extract batch metrics: {e}")
+            return [None] * len(texts)
+
+
+class ModelWarmer:
+    """Loads every model tier when a worker starts and keeps it resident.
+
+    Ollama unloads a model ``keep_alive`` after its last call, and the next
+    call pays the full load. A request without a prompt only loads the model,
+    so pinging each tier every ``OLLAMA_WARM_INTERVAL`` seconds keeps even a
+    rarely escalated-to model warm.
+    """
+
+    def __init__(self, client: OllamaClient, interval: int = None):
+        self.client = client
+        self.interval = interval or settings.ollama_warm_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def ping(self, model: str) -> bool:
+        started = time.perf_counter()
+        try:
+            # Loading a large model from disk can take a while
+            response = requests.post(
+                f"{self.client.base_url}/api/generate",
+                json={"model": model, "keep_alive": settings.ollama_keep_alive},
+                timeout=(3, 300)
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Keep-alive ping for {model} failed: {e}")
+            ollama_model_warm.labels(model=model).set(0)
+            return False
+        ollama_model_warm.labels(model=model).set(1)
+        logger.debug(f"{model} resident ({time.perf_counter() - started:.2f}s)")
+        return True
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="ollama-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for model in self.client.models:
+                self.ping(model)
+            self._stop.wait(self.interval)
+
+
+def register_model_warmer(celery_app):
+    """Preload and keep warm every model tier while a worker runs."""
+    from celery.signals import worker_ready, worker_shutdown
+
+    warmer = ModelWarmer(OllamaClient())
+
+    @worker_ready.connect(weak=False)
+    def start_warmer(**kwargs):
+        warmer.start()
+
+    @worker_shutdown.connect(weak=False)
+    def stop_warmer(**kwargs):
+        warmer.stop()
@@ -0,0 +1,31 @@
+import redis
+import redis.asyncio as aioredis
+from ..config import settings
+
+_sync_client = None
+_async_client = None
+_async_raw_client = None
+
+
+def get_redis() -> redis.Redis:
+    """Shared synchronous client for worker-side code."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+    return _sync_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Shared asyncio client for the Bolt/FastAPI event loop."""
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(settings.redis_url, decode_responses=True)
+    return _async_client
+
+
+def get_async_raw_redis() -> aioredis.Redis:
+    """Asyncio client returning bytes, for binary payloads such as task results."""
+    global _async_raw_client
+    if _async_raw_client is None:
+        _async_raw_client = aioredis.Redis.from_url(settings.redis_url)
+    return _async_raw_client
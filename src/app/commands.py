@@ -1,25 +1,108 @@
 # src/app/commands.py
 
 from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional, Tuple
 import os
+import re
+import aiohttp
 from .config import settings
 from .models.challenge import Challenge, ActivityType, Result
 from .models.database import async_session
-from sqlalchemy import select, update, func
+from .models.partitions import ensure_results_partition
+from .archive import archive_reader
+from .channels import channel_resolver
+from .users import user_directory
+from .rollups import challenge_stats, format_leaderboard, leaderboard
+from .utils.units import CANONICAL_UNITS
+from . import importer, profiling
+from .data_versions import challenge_changed
+from .pagination import Cursor, Page, clamp_limit, page_blocks
+from sqlalchemy import select, tuple_, update
 from .utils.logging import setup_logger
 
 logger = setup_logger(__name__, level=settings.log_level)
 
-# Map channel names to ActivityType
-CHANNEL_ACTIVITY = {
-    "calories-challenge": ActivityType.CALORIES,
-    "cycling-challenge":  ActivityType.CYCLING,
-    "running-challenge":  ActivityType.RUNNING,
-    "swimming-challenge": ActivityType.SWIMMING,
-    "walking-challenge":  ActivityType.WALKING,
-}
+async def get_active_challenge(db, channel: str):
+    """Return the channel's running challenge.
+
+    Result queries filter on its id rather than joining ``challenges``, so
+    Postgres only touches that challenge's partition of ``results``.
+    """
+    stmt = select(Challenge).where(
+        Challenge.slack_channel_id == channel,
+        Challenge.is_active == True
+    )
+    return (await db.execute(stmt)).scalars().first()
+
+async def find_import_file(client, channel: str, user: str, ref: str = None):
+    """The CSV to import: the file named by ``ref`` (ID or link), else ``user``'s latest CSV in the channel."""
+    if ref:
+        match = re.search(r"\b(F[A-Z0-9]{6,})\b", ref.strip("<>"))
+        if not match:
+            return None
+        return (await client.files_info(file=match.group(1)))["file"]
+    response = await client.files_list(channel=channel, user=user, count=20)
+    return next((f for f in response["files"] if f.get("filetype") == "csv"), None)
+
+async def download_file(url: str) -> bytes:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, headers={"Authorization": f"Bearer {settings.slack_bot_token}"}) as response:
+            response.raise_for_status()
+            return await response.read()
+
+async def render_leaderboard(cursor: Cursor, activity: ActivityType) -> Tuple[str, Optional[list]]:
+    """One leaderboard page as message text and blocks (None when there is nothing to page)."""
+    async with async_session() as db:
+        rows, refreshed_at = await leaderboard(db, cursor.challenge_id, cursor.limit + 1, cursor)
+    page = Page.from_rows(rows, cursor, key=lambda r: [r[1], r[0]])
+    if not page.rows:
+        return "🏆 No submissions yet.", None
+    text = await format_leaderboard(page.rows, activity, refreshed_at=refreshed_at, start=page.offset + 1)
+    return text, page_blocks(text, page, "leaderboard")
+
+async def render_recent(cursor: Cursor) -> Tuple[str, Optional[list]]:
+    """One page of a user's submissions, newest first, as message text and blocks."""
+    user = cursor.scope["user"]
+    stmt = select(Result).where(Result.challenge_id == cursor.challenge_id, Result.user_id == user)
+    if cursor.key is not None:
+        key = tuple_(datetime.fromisoformat(cursor.key[0]), int(cursor.key[1]))
+        stmt = stmt.where(tuple_(Result.date, Result.id) > key if cursor.backward else tuple_(Result.date, Result.id) < key)
+    if cursor.backward:
+        stmt = stmt.order_by(Result.date.asc(), Result.id.asc())
+    else:
+        stmt = stmt.order_by(Result.date.desc(), Result.id.desc())
+    async with async_session() as db:
+        results = (await db.execute(stmt.limit(cursor.limit + 1))).scalars().all()
+    
+    page = Page.from_rows(results, cursor, key=lambda r: [r.date.isoformat(), r.id])
+    if not page.rows:
+        return f"❌ No recent submissions found for <@{user}>.", None
+    msg = f"📊 *Recent submissions for <@{user}>*\n"
+    for r in page.rows:
+        msg += f"• {r.date.strftime('%Y-%m-%d')}: {r.value} {r.unit}\n"
+    return msg, page_blocks(msg, page, "recent")
 
 def register_commands(app):
+    @app.action(re.compile(r"^(leaderboard|recent)_(next|previous)$"))
+    async def handle_page_button(ack, body, action, client, logger):
+        await ack()
+        try:
+            cursor = Cursor.decode(action["value"])
+        except ValueError as e:
+            return logger.warning(f"Ignoring page button: {e}")
+        channel = body["channel"]["id"]
+        async with async_session() as db:
+            ch = await db.get(Challenge, cursor.challenge_id)
+        # A cursor only pages the challenge of the channel it was posted in
+        if not ch or ch.slack_channel_id != channel:
+            return logger.warning(f"Ignoring page button for challenge {cursor.challenge_id} in {channel}")
+        if cursor.view == "leaderboard":
+            text, blocks = await render_leaderboard(cursor, ch.activity_type)
+        else:
+            text, blocks = await render_recent(cursor)
+        await client.chat_update(channel=channel, ts=body["message"]["ts"], text=text, blocks=blocks or [])
+
     @app.command("/challenge")
     async def handle_challenge_command(ack, command, say, logger):
         try:
@@ -34,11 +117,16 @@ def register_commands(app):
                          "• `/challenge start <start_date> <end_date>` - Start a new challenge\n"
                          "• `/challenge status` - Show current challenge status\n"
                          "• `/challenge stop` - Stop the current challenge\n"
-                         "• `/challenge leaderboard` - Show the leaderboard\n"
-                         "• `/challenge export` - Export results to CSV\n"
-                         "• `/challenge recent @user [limit]` - Show recent submissions")
+                         "• `/challenge leaderboard [limit]` - Show the leaderboard\n"
+                         "• `/challenge export [id]` - Export results to CSV\n"
+                         "• `/challenge history` - List past challenges\n"
+                         "• `/challenge recent @user [limit]` - Show recent submissions\n"
+                         "• `/challenge import [file link]` - Load results from an uploaded CSV (admins)")
                 return
                 
+            # Arguments as typed; the normalization below would split file links and IDs
+            raw_args = text.split()[1:]
+            
             # Split command and handle hyphenated commands
             if "-" in text:
                 parts = text.split("-", 1)
@@ -47,9 +135,32 @@ def register_commands(app):
             parts = text.split()
             subcommand = parts[0].lower()
             channel = command["channel_id"]
-            channel_name = command.get("channel_name", "")
+            channel_info = await channel_resolver.resolve(channel)
+            
+            logger.info(f"Processing command: subcommand={subcommand}, channel={channel}, channel_name={channel_info.name}")
             
-            logger.info(f"Processing command: subcommand={subcommand}, channel={channel}, channel_name={channel_name}")
+            # Admin-only, and not tied to a challenge channel
+            if subcommand == "profile":
+                if command.get("user_id") not in settings.admin_user_ids:
+                    return await say("❌ Only admins can change profiling.")
+                action = parts[1].lower() if len(parts) > 1 else "status"
+                if action == "on":
+                    try:
+                        percent = float(parts[2]) if len(parts) > 2 else 10.0
+                        minutes = int(parts[3]) if len(parts) > 3 else 60
+                    except ValueError:
+                        return await say("❌ Usage: `/challenge profile on [percent] [minutes]`")
+                    await profiling.set_rate(min(max(percent, 0.0), 100.0) / 100, minutes)
+                    return await say(f"🔬 Profiling {percent:g}% of submissions and requests for {minutes} minutes.")
+                if action == "off":
+                    await profiling.set_rate(0, 0)
+                    return await say("🔬 Profiling override cleared.")
+                usage = profiling.profiler.usage()
+                return await say(
+                    f"🔬 Sampling {await profiling.profiler.arate():.0%} "
+                    f"(default {settings.profile_sample_rate:.0%}); "
+                    f"{usage['files']} dumps, {usage['bytes'] / 1024 / 1024:.1f} MB in `{settings.profile_dir}` on this replica."
+                )
             
             # Check if this is a challenge channel
             if settings.challenge_channels and channel not in settings.challenge_channels:
@@ -61,11 +172,7 @@ def register_commands(app):
                 return
             
             # Check if this is a challenge channel
-            activity = None
-            for suffix, act in CHANNEL_ACTIVITY.items():
-                if channel_name.endswith(f"-{suffix}"):
-                    activity = act
-                    break
+            activity = channel_info.activity
             
             if activity is None:
                 await say("❌ This channel is not configured for a challenge. "
@@ -90,11 +197,12 @@ def register_commands(app):
                 try:
                     async with async_session() as db:
                         # deactivate existing
-                        await db.execute(
+                        stopped = (await db.execute(
                             update(Challenge)
-                            .where(Challenge.slack_channel_id == channel)
+                            .where(Challenge.slack_channel_id == channel, Challenge.is_active == True)
                             .values(is_active=False)
-                        )
+                            .returning(Challenge.id)
+                        )).scalars().all()
                         # create new
                         ch = Challenge(
                             slack_channel_id=channel,
@@ -104,8 +212,11 @@ def register_commands(app):
                             is_active=True
                         )
                         db.add(ch)
+                        await db.flush()
+                        await ensure_results_partition(db, ch.id)
                         await db.commit()
                         logger.info(f"Created new challenge: {ch.id}")
+                    await challenge_changed(ch.id, *stopped, listing=True)
                     await say(f"✅ {activity.value.title()} challenge started from {sd.date()} to {ed.date()}.")
                 except Exception as e:
                     logger.error(f"Failed to create challenge: {e}")
@@ -114,83 +225,70 @@ def register_commands(app):
 
             if subcommand == "stop":
                 async with async_session() as db:
-                    await db.execute(
+                    stopped = (await db.execute(
                         update(Challenge)
-                        .where(Challenge.slack_channel_id == channel)
+                        .where(Challenge.slack_channel_id == channel, Challenge.is_active == True)
                         .values(is_active=False)
-                    )
+                        .returning(Challenge.id)
+                    )).scalars().all()
                     await db.commit()
+                await challenge_changed(*stopped, listing=True)
                 await say("✅ Challenge stopped.")
                 return
 
             if subcommand == "status":
                 async with async_session() as db:
-                    ch = (await db.execute(
-                        select(Challenge)
-                        .where(
-                            Challenge.slack_channel_id == channel,
-                            Challenge.is_active == True
-                        )
-                    )).first()
+                    ch = await get_active_challenge(db, channel)
                     
                     if not ch:
                         return await say("❌ No active challenge in this channel.")
                         
-                    # Count participants
-                    participants = (await db.execute(
-                        select(func.count(func.distinct(Result.user_id)))
-                        .where(Result.challenge_id == ch.id)
-                    )).scalar()
-                    
-                    # Count total submissions
-                    submissions = (await db.execute(
-                        select(func.count())
-                        .where(Result.challenge_id == ch.id)
-                    )).scalar()
+                    # Counts come from the precomputed totals
+                    stats = await challenge_stats(db, ch.id)
                     
                     msg = (
                         f" *{ch.activity_type.value.title()} Challenge*\n"
                         f"• Period: {ch.start_date.date()} to {ch.end_date.date()}\n"
-                        f"• Participants: {participants}\n"
-                        f"• Total submissions: {submissions}"
+                        f"• Participants: {stats['participants']}\n"
+                        f"• Total submissions: {stats['submissions']}"
                     )
                     await say(msg)
                 return
 
             if subcommand == "leaderboard":
+                try:
+                    limit = clamp_limit(int(parts[1]) if len(parts) > 1 else None)
+                except ValueError:
+                    return await say("❌ Usage: `/challenge leaderboard [limit]`")
                 async with async_session() as db:
-                    stmt = (
-                        select(Result.user_id, func.sum(Result.value).label("total"))
-                        .join(Challenge)
-                        .where(
-                            Challenge.slack_channel_id==channel,
-                            Challenge.is_active==True
-                        )
-                        .group_by(Result.user_id)
-                        .order_by(func.sum(Result.value).desc())
-                        .limit(10)
-                    )
-                    rows = (await db.execute(stmt)).all()
-                if not rows:
-                    return await say("🏆 No submissions yet.")
-                msg = "🏆 *Leaderboard*\n"
-                for i,(uid,total) in enumerate(rows,1):
-                    msg += f"{i}. <@{uid}> — {total:.1f}\n"
-                return await say(msg)
+                    ch = await get_active_challenge(db, channel)
+                if not ch:
+                    return await say("❌ No active challenge in this channel.")
+                text, blocks = await render_leaderboard(Cursor("leaderboard", ch.id, limit), ch.activity_type)
+                return await say(text=text, blocks=blocks)
 
             if subcommand == "export":
                 async with async_session() as db:
-                    # Get all results for active challenge
-                    stmt = (
-                        select(Result)
-                        .join(Challenge)
-                        .where(
-                            Challenge.slack_channel_id == channel,
-                            Challenge.is_active == True
+                    if len(parts) > 1:
+                        # A past challenge of this channel, possibly archived
+                        ch = await db.get(Challenge, int(parts[1]))
+                        if not ch or ch.slack_channel_id != channel:
+                            return await say("❌ No such challenge in this channel. See `/challenge history`.")
+                    else:
+                        # Get all results for active challenge
+                        ch = await get_active_challenge(db, channel)
+                        if not ch:
+                            return await say("❌ No active challenge in this channel.")
+                    
+                    if ch.archived_at:
+                        results = [SimpleNamespace(**r) for r in archive_reader.results(ch.id)]
+                    else:
+                        stmt = (
+                            select(Result)
+                            .where(Result.challenge_id == ch.id)
+                            .order_by(Result.date.desc())
                         )
-                        .order_by(Result.date.desc())
-                    )
-                    results = (await db.execute(stmt)).all()
+                        results = (await db.execute(stmt)).scalars().all()
                     
                     if not results:
                         return await say("❌ No results to export.")
@@ -200,14 +298,18 @@ def register_commands(app):
                     import io
                     output = io.StringIO()
                     writer = csv.writer(output)
-                    writer.writerow(["User", "Date", "Value", "Unit", "Validated"])
+                    writer.writerow(["User ID", "User", "Date", "Value", "Unit", f"Value ({CANONICAL_UNITS[ch.activity_type]})", "Validated"])
                     
+                    # One directory lookup for the whole file, not one per row
+                    names = await user_directory.names(r.user_id for r in results)
                     for r in results:
                         writer.writerow([
-                            f"<@{r.user_id}>",
+                            r.user_id,
+                            names.get(r.user_id, r.user_id),
                             r.date.strftime("%Y-%m-%d"),
                             r.value,
                             r.unit,
+                            getattr(r, "canonical_value", None),
                             "Yes" if r.is_validated else "No"
                         ])
                         
@@ -229,33 +331,85 @@ def register_commands(app):
                 if len(parts) < 2:
                     return await say("❌ Please specify a user: `/challenge recent @user [limit]`")
                     
-                user = parts[1].strip("<@>")
-                limit = int(parts[2]) if len(parts) > 2 else 5
+                user = parts[1].strip("<@>").split("|")[0]
+                try:
+                    limit = clamp_limit(int(parts[2]) if len(parts) > 2 else None)
+                except ValueError:
+                    return await say("❌ Usage: `/challenge recent @user [limit]`")
                 
                 async with async_session() as db:
-                    stmt = (
-                        select(Result)
-                        .join(Challenge)
+                    ch = await get_active_challenge(db, channel)
+                if not ch:
+                    return await say("❌ No active challenge in this channel.")
+                text, blocks = await render_recent(Cursor("recent", ch.id, limit, scope={"user": user}))
+                return await say(text=text, blocks=blocks)
+
+            if subcommand == "import":
+                if command.get("user_id") not in settings.admin_user_ids:
+                    return await say("❌ Only admins can import results.")
+                async with async_session() as db:
+                    ch = await get_active_challenge(db, channel)
+                if not ch:
+                    return await say("❌ No active challenge in this channel.")
+                
+                from slack_sdk.web.async_client import AsyncWebClient
+                client = AsyncWebClient(token=settings.slack_bot_token)
+                file = await find_import_file(client, channel, command["user_id"], raw_args[0] if raw_args else None)
+                if file is None:
+                    return await say("❌ Upload a CSV to this channel first, then run `/challenge import [file link]`.")
+                if file.get("size", 0) > settings.import_max_mb * 1024 * 1024:
+                    return await say(f"❌ `{file['name']}` is larger than {settings.import_max_mb} MB.")
+                
+                data = await download_file(file["url_private"])
+                try:
+                    report, header = await importer.import_csv(ch.id, data)
+                except importer.ImportFileError as e:
+                    return await say(f"❌ Could not import `{file['name']}`: {e}")
+                
+                if report.rejected:
+                    import io
+                    out = io.StringIO()
+                    report.write_rejects(out, header)
+                    await client.files_upload_v2(
+                        channel=channel,
+                        file=out.getvalue().encode(),
+                        filename=f"{os.path.splitext(file['name'])[0]}.rejects.csv",
+                        title="Rejected import rows"
+                    )
+                await say(f"📥 `{file['name']}`: {report.summary()}.")
+                return
+
+            if subcommand == "history":
+                async with async_session() as db:
+                    past = (await db.execute(
+                        select(Challenge)
                         .where(
                             Challenge.slack_channel_id == channel,
-                            Challenge.is_active == True,
-                            Result.user_id == user
+                            Challenge.is_active == False
                         )
-                        .order_by(Result.date.desc())
-                        .limit(limit)
-                    )
-                    results = (await db.execute(stmt)).all()
+                        .order_by(Challenge.start_date.desc())
+                        .limit(10)
+                    )).scalars().all()
                     
-                    if not results:
-                        return await say(f"❌ No recent submissions found for <@{user}>.")
+                    if not past:
+                        return await say("📚 No past challenges in this channel.")
                         
-                    msg = f"📊 *Recent submissions for <@{user}>*\n"
-                    for r in results:
-                        msg += f"• {r.date.strftime('%Y-%m-%d')}: {r.value} {r.unit}\n"
+                    msg = "📚 *Past challenges*\n"
+                    for ch in past:
+                        if ch.archived_at:
+                            stats = archive_reader.stats(ch.id)
+                        else:
+                            stats = await challenge_stats(db, ch.id)
+                        msg += (
+                            f"• #{ch.id} {ch.activity_type.value.title()} "
+                            f"{ch.start_date.date()} to {ch.end_date.date()}: "
+                            f"{stats['participants']} participants, {stats['submissions']} submissions\n"
+                        )
+                    msg += "Use `/challenge export <id>` to download one."
                     await say(msg)
                 return
 
-            await say("❌ Unknown subcommand. Use `start | stop | status | leaderboard | export | recent`.")
+            await say("❌ Unknown subcommand. Use `start | stop | status | leaderboard | export | recent | history | import`.")
         except Exception as e:
             logger.error(f"Error handling challenge command: {e}")
             await say("❌ An error occurred while processing your command. Please try again.")
\ No newline at end of file
@@ -0,0 +1,71 @@
+# src/app/data_versions.py
+"""
+Data versions for conditional GETs of the read API.
+
+Every change to a challenge's results (a recorded submission, an import, an
+invalidation, a rollup refresh) bumps that challenge's version in Redis, and
+changes to the set of challenges bump a global one. The API builds ETags from
+these counters alone, so a dashboard revalidating an unchanged view costs one
+Redis round trip and no query. Each bump of a challenge is also published on
+``CHANGES_CHANNEL`` for the live leaderboards in ``live.py``.
+
+A missing counter is seeded with the current time in nanoseconds rather than
+0, so a Redis flush can never hand out a version an old ETag already used.
+"""
+
+import time
+from typing import Optional
+
+from .clients.redis_client import get_async_redis
+from .config import settings
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+CHALLENGES_KEY = "fitbot:version:challenges"
+CHANGES_CHANNEL = "fitbot:changes"
+
+
+def challenge_key(challenge_id: int) -> str:
+    return f"fitbot:version:challenge:{int(challenge_id)}"
+
+
+async def get_version(key: str) -> int:
+    async with get_async_redis().pipeline(transaction=False) as pipe:
+        pipe.set(key, time.time_ns(), nx=True)
+        pipe.get(key)
+        _, version = await pipe.execute()
+    return int(version)
+
+
+async def bump_version(key: str, notify: Optional[int] = None) -> int:
+    """Increment ``key``; with ``notify``, publish that challenge id on ``CHANGES_CHANNEL``."""
+    async with get_async_redis().pipeline(transaction=False) as pipe:
+        pipe.set(key, time.time_ns(), nx=True)
+        pipe.incr(key)
+        if notify is not None:
+            pipe.publish(CHANGES_CHANNEL, int(notify))
+        version = (await pipe.execute())[1]
+    return int(version)
+
+
+async def challenge_version(challenge_id: int) -> int:
+    return await get_version(challenge_key(challenge_id))
+
+
+async def challenges_version() -> int:
+    return await get_version(CHALLENGES_KEY)
+
+
+async def challenge_changed(*challenge_ids: int, listing: bool = False):
+    """Record that these challenges' data changed, and with ``listing`` that the challenge list did.
+
+    Failures are logged rather than raised: the data is already committed and
+    a missed bump only delays dashboards until the next change.
+    """
+    keys = [(challenge_key(cid), cid) for cid in challenge_ids] + ([(CHALLENGES_KEY, None)] if listing else [])
+    for key, notify in keys:
+        try:
+            await bump_version(key, notify)
+        except Exception as e:
+            logger.error(f"Failed to bump data version {key}: {e}")
@@ -0,0 +1,97 @@
+# src/app/envelope.py
+"""
+Compact, versioned submission envelopes and the binary Celery serializer.
+
+Slack events carry far more than the pipeline reads: every file comes with
+thumbnails, permalinks, previews and sharing metadata. ``pack`` keeps only
+the fields that are used, at the moment a submission is accepted, so the
+replica inboxes, fair queues and broker all hold the slim form.
+``task_args`` drops the routing fields (task ID, trace context) that travel
+in Celery headers anyway, and the worker checks the version with
+``unpack``.
+
+Task messages and results are encoded with msgpack under the ``fitbot``
+serializer. Payloads of ``ENVELOPE_COMPRESS_MIN_BYTES`` or more are
+zlib-compressed; a one-byte prefix says which. JSON is still accepted, so
+messages queued before a deploy drain normally.
+"""
+
+import zlib
+from datetime import date, datetime
+
+import msgpack # type: ignore
+from kombu.serialization import register # type: ignore
+
+from .config import settings
+
+VERSION = 1
+
+SERIALIZER = "fitbot"
+CONTENT_TYPE = "application/x-fitbot-msgpack"
+
+# Keys of a submission the pipeline reads, and the file fields it needs
+FIELDS = ("user", "text", "channel", "ts", "received_at", "deadline", "trace", "task_id")
+FILE_FIELDS = ("id", "url_private")
+# Only needed until the task is published; Celery headers carry them from there
+ROUTING_FIELDS = ("trace", "task_id")
+
+PLAIN = b"\x00"
+ZLIB = b"\x01"
+
+
+class EnvelopeError(ValueError):
+    """The envelope is from a newer version than this worker understands."""
+
+
+def pack(submission: dict) -> dict:
+    """The slim form of a submission; packing an envelope again changes nothing."""
+    envelope = {key: submission[key] for key in FIELDS if submission.get(key) is not None}
+    envelope["v"] = VERSION
+    envelope["files"] = [
+        {key: f[key] for key in FILE_FIELDS if f.get(key) is not None}
+        for f in submission.get("files") or []
+    ]
+    return envelope
+
+
+def task_args(envelope: dict) -> dict:
+    return {key: value for key, value in envelope.items() if key not in ROUTING_FIELDS}
+
+
+def unpack(envelope: dict) -> dict:
+    """The submission a task received; full events from before envelopes pass through."""
+    version = envelope.get("v")
+    if version is not None and version > VERSION:
+        # ValueError: the task retries, likely on an upgraded worker
+        raise EnvelopeError(f"Envelope version {version} is newer than {VERSION}")
+    return envelope
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+def dumps(obj) -> bytes:
+    raw = msgpack.packb(obj, use_bin_type=True, default=_default)
+    if len(raw) >= settings.envelope_compress_min_bytes:
+        return ZLIB + zlib.compress(raw, 6)
+    return PLAIN + raw
+
+
+def loads(data) -> object:
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    elif isinstance(data, str):
+        data = data.encode("latin-1")
+    prefix, body = data[:1], data[1:]
+    if prefix == ZLIB:
+        body = zlib.decompress(body)
+    elif prefix != PLAIN:
+        raise ValueError(f"Unknown {SERIALIZER} payload prefix {prefix!r}")
+    return msgpack.unpackb(body, raw=False, strict_map_key=False)
+
+
+def register_serializer():
+    register(SERIALIZER, dumps, loads, content_type=CONTENT_TYPE, content_encoding="binary")
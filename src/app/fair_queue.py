@@ -0,0 +1,221 @@
+# src/app/fair_queue.py
+"""
+Per-channel, per-user fair scheduling in front of the Celery lanes.
+
+Each lane has a two-level round-robin in Redis: a ring of channels with work,
+per channel a ring of users with work, and per (channel, user) a FIFO list of
+submissions. Popping takes the next channel, then that channel's next user,
+then that user's oldest submission, and rotates both to the back. A channel
+that floods the bot therefore gets one turn per round like every other
+channel, and within it each user gets one turn.
+
+Feeders running in every app replica keep each lane's broker queue only
+``FAIR_LANE_DEPTH`` messages deep, so the order workers see is decided here
+rather than by arrival. Task IDs are assigned before a submission is queued,
+so whoever accepted it can wait for its result no matter who publishes it.
+
+Popping moves a submission into the lane's in-flight set rather than
+dropping it, and the feeder acknowledges it once the broker has the task. If
+a replica dies in between, any feeder puts claims older than
+``FAIR_INFLIGHT_TIMEOUT`` back at the head of their flow. A submission is
+therefore published at least once; a duplicate task is harmless because
+results are upserted per Slack message.
+"""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .celery_app import LANES
+from .clients.redis_client import get_async_redis
+from .config import settings
+from .envelope import task_args
+from .metrics import fair_queue_depth
+from .tracing import attached
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+PREFIX = "fitbot:fair:{}"
+
+# KEYS: channel ring, user ring of the channel, flow list, size counter
+# ARGV: channel, user, payload
+PUSH = """
+local n = redis.call('RPUSH', KEYS[3], ARGV[3])
+redis.call('INCR', KEYS[4])
+if n == 1 then
+    if redis.call('RPUSH', KEYS[2], ARGV[2]) == 1 then
+        redis.call('RPUSH', KEYS[1], ARGV[1])
+    end
+end
+return n
+"""
+
+# KEYS: channel ring, size counter, in-flight set
+# ARGV: key prefix of the lane, claim time
+# Flow keys are derived inside the script, so this assumes a single Redis (no cluster).
+# Drained users and channels are dropped from their rings on the way, so an empty
+# flow never ends the round while another one has work.
+POP = """
+for _ = 1, redis.call('LLEN', KEYS[1]) do
+    local channel = redis.call('LPOP', KEYS[1])
+    local users = ARGV[1] .. ':c:' .. channel .. ':users'
+    for _ = 1, redis.call('LLEN', users) do
+        local user = redis.call('LPOP', users)
+        local flow = ARGV[1] .. ':c:' .. channel .. ':u:' .. user
+        local item = redis.call('LPOP', flow)
+        if item then
+            redis.call('DECR', KEYS[2])
+            redis.call('ZADD', KEYS[3], ARGV[2], item)
+            if redis.call('LLEN', flow) > 0 then redis.call('RPUSH', users, user) end
+            if redis.call('LLEN', users) > 0 then redis.call('RPUSH', KEYS[1], channel) end
+            return item
+        end
+    end
+end
+return false
+"""
+
+# KEYS: channel ring, size counter, in-flight set
+# ARGV: key prefix of the lane, claimed items to put back, oldest claim first
+# Only items still in the in-flight set are requeued, so racing feeders cannot double them
+REQUEUE = """
+local n = 0
+for i = #ARGV, 2, -1 do
+    local item = ARGV[i]
+    if redis.call('ZREM', KEYS[3], item) == 1 then
+        local submission = cjson.decode(item)
+        local channel = submission['channel']
+        local user = submission['user']
+        if type(user) ~= 'string' or user == '' then user = '-' end
+        local users = ARGV[1] .. ':c:' .. channel .. ':users'
+        -- Back at the head of its flow, so it keeps its place before later submissions
+        if redis.call('LPUSH', ARGV[1] .. ':c:' .. channel .. ':u:' .. user, item) == 1 then
+            if redis.call('RPUSH', users, user) == 1 then
+                redis.call('RPUSH', KEYS[1], channel)
+            end
+        end
+        redis.call('INCR', KEYS[2])
+        n = n + 1
+    end
+end
+return n
+"""
+
+
+class FairQueue:
+    def __init__(self, lane: str):
+        self.lane = lane
+        self.prefix = PREFIX.format(lane)
+        self.channels_key = f"{self.prefix}:channels"
+        self.size_key = f"{self.prefix}:size"
+        self.inflight_key = f"{self.prefix}:inflight"
+
+    async def push(self, submission: dict):
+        channel, user = submission["channel"], submission.get("user") or "-"
+        await get_async_redis().eval(
+            PUSH, 4,
+            self.channels_key,
+            f"{self.prefix}:c:{channel}:users",
+            f"{self.prefix}:c:{channel}:u:{user}",
+            self.size_key,
+            channel, user, json.dumps(submission)
+        )
+
+    async def pop(self) -> Optional[Tuple[str, dict]]:
+        """Claim the next submission as ``(item, submission)``; ``ack`` or ``requeue`` the item."""
+        item = await get_async_redis().eval(
+            POP, 3, self.channels_key, self.size_key, self.inflight_key, self.prefix, time.time()
+        )
+        return (item, json.loads(item)) if item else None
+
+    async def ack(self, item: str):
+        await get_async_redis().zrem(self.inflight_key, item)
+
+    async def requeue(self, *items: str) -> int:
+        if not items:
+            return 0
+        return await get_async_redis().eval(
+            REQUEUE, 3, self.channels_key, self.size_key, self.inflight_key, self.prefix, *items
+        )
+
+    async def requeue_stale(self, timeout: float) -> int:
+        """Put back claims older than ``timeout`` seconds, left by a feeder that died mid-publish."""
+        stale = await get_async_redis().zrangebyscore(self.inflight_key, "-inf", time.time() - timeout)
+        return await self.requeue(*stale)
+
+    async def size(self) -> int:
+        return int(await get_async_redis().get(self.size_key) or 0)
+
+
+class FairFeeder:
+    """Moves submissions from a lane's fair queue to its broker queue as room appears."""
+
+    def __init__(self, lane: str, depth: int = None):
+        self.lane = lane
+        self.queue = FairQueue(lane)
+        self.depth = depth or settings.fair_lane_depth
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"feed-{lane}")
+        self._task: Optional[asyncio.Task] = None
+        self._next_sweep = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        r = get_async_redis()
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if time.monotonic() >= self._next_sweep:
+                    self._next_sweep = time.monotonic() + settings.fair_inflight_timeout / 2
+                    if requeued := await self.queue.requeue_stale(settings.fair_inflight_timeout):
+                        logger.warning(f"Requeued {requeued} unacknowledged submissions on {self.lane}")
+                fair_queue_depth.labels(lane=self.lane).set(await self.queue.size())
+                # Kombu keeps a queue's messages in a Redis list named after it
+                if await r.llen(self.lane) >= self.depth:
+                    await asyncio.sleep(settings.fair_poll_interval)
+                    continue
+                claimed = await self.queue.pop()
+                if claimed is None:
+                    await asyncio.sleep(settings.fair_poll_interval)
+                    continue
+                item, submission = claimed
+                try:
+                    await loop.run_in_executor(self._executor, self._publish, submission)
+                except Exception as e:
+                    logger.error(f"Failed to publish {submission['ts']} to {self.lane}, requeueing: {e}")
+                    await self.queue.requeue(item)
+                    await asyncio.sleep(1)
+                    continue
+                await self.queue.ack(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Fair feeder for {self.lane} failed: {e}")
+                await asyncio.sleep(1)
+
+    def _publish(self, submission: dict):
+        from .tasks import process_submission
+
+        # The Celery instrumentation puts the attached trace context into the task headers
+        with attached(submission.get("trace")):
+            process_submission.apply_async(
+                args=[task_args(submission)],
+                task_id=submission["task_id"],
+                queue=self.lane,
+                expires=max(0.0, submission["deadline"] - time.time())
+            )
+        logger.debug(f"Published {submission['channel']}/{submission['ts']} to {self.lane}")
+
+
+fair_queues: Dict[str, FairQueue] = {lane: FairQueue(lane) for lane in LANES}
+feeders: List[FairFeeder] = [FairFeeder(lane) for lane in LANES]
@@ -0,0 +1,97 @@
+# src/app/health.py
+"""
+Liveness, readiness and Prometheus endpoints of the app.
+
+``/health/live`` only says the event loop is serving requests. ``/health/ready``
+probes Postgres, Redis and Ollama with a timeout each and records their
+latency; the pod reports not-ready (503) when Postgres or Redis fail. Ollama
+is only called by workers, so its failure is reported as ``degraded`` without
+taking the app out of rotation.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict
+
+import aiohttp
+from fastapi import APIRouter, Response # type: ignore
+from fastapi.responses import JSONResponse # type: ignore
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import text
+
+from .clients.redis_client import get_async_redis
+from .config import settings
+from .metrics import dependency_latency, dependency_up
+from .models.database import engine
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+router = APIRouter()
+
+
+async def probe_postgres():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def probe_redis():
+    await get_async_redis().ping()
+
+
+async def probe_ollama():
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{settings.ollama_url}/api/tags") as response:
+            response.raise_for_status()
+
+
+PROBES: Dict[str, Callable[[], Awaitable[None]]] = {
+    "postgres": probe_postgres,
+    "redis": probe_redis,
+    "ollama": probe_ollama,
+}
+
+# Dependencies without which this pod cannot serve Slack
+CRITICAL = {"postgres", "redis"}
+
+
+async def check(name: str) -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(PROBES[name](), settings.health_probe_timeout)
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, str(e) or type(e).__name__
+    latency = time.perf_counter() - started
+    dependency_latency.labels(dependency=name).observe(latency)
+    dependency_up.labels(dependency=name).set(int(ok))
+    if not ok:
+        logger.warning(f"Health probe {name} failed after {latency:.2f}s: {error}")
+    return {"ok": ok, "latency_ms": round(latency * 1000, 1), "error": error}
+
+
+@router.get("/health")
+@router.get("/health/live")
+async def liveness():
+    """The process is up and its event loop is answering."""
+    return {"status": "healthy"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    names = list(PROBES)
+    results = dict(zip(names, await asyncio.gather(*(check(name) for name in names))))
+    ready = all(results[name]["ok"] for name in CRITICAL)
+    status = "ready" if ready else "unavailable"
+    if ready and not all(r["ok"] for r in results.values()):
+        status = "degraded"
+    return JSONResponse(
+        {"status": status, "replica": settings.replica_id, "dependencies": results},
+        status_code=200 if ready else 503
+    )
+
+
+@router.get("/metrics")
+async def metrics():
+    # Queue gauges query Redis synchronously while collecting
+    return Response(await asyncio.to_thread(generate_latest), media_type=CONTENT_TYPE_LATEST)
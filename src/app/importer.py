@@ -0,0 +1,252 @@
+# src/app/importer.py
+"""
+Bulk import of results captured outside Slack (a gym partner's spreadsheet etc.).
+
+The CSV needs a header with ``user``, ``date``, ``value`` and ``unit``
+columns (the export's ``User ID``/``Date``/``Value``/``Unit`` headings work
+too). Rows are parsed and validated as they stream past: the user must be a
+Slack user ID, the date must fall inside the challenge and the unit must
+convert to the activity's unit. Valid rows go straight into Postgres with
+COPY, all in one transaction; rejected rows are written to a reject CSV with
+their line number and the reason.
+
+Imported rows are tagged ``validated_by="import:<sha256 of the file>"`` so the
+same file cannot be loaded twice into a challenge.
+
+    python -m app.importer C08SM8NESGJ partner.csv --dry-run
+    python -m app.importer C08SM8NESGJ partner.csv --rejects partner.rejects.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import math
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator, List, TextIO, Tuple
+
+from sqlalchemy import select
+
+from .config import settings
+from .data_versions import challenge_changed
+from .metrics import import_rows_total
+from .models.challenge import Challenge, Result
+from .models.database import async_session, engine
+from .models.partitions import ensure_results_partition
+from .utils.logging import setup_logger
+from .utils.units import to_canonical
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+# Accepted header spellings, normalized with normalize_header
+HEADERS = {
+    "user": "user", "user_id": "user", "user id": "user", "slack user": "user",
+    "date": "date",
+    "value": "value",
+    "unit": "unit",
+}
+REQUIRED = ("user", "date", "value", "unit")
+
+USER_ID = re.compile(r"^<?@?([UW][A-Z0-9]{2,})(?:\|[^>]*)?>?$")
+
+# Result columns written by COPY, in record order
+COLUMNS = (
+    "user_id", "date", "value", "unit", "canonical_value", "is_validated",
+    "validated_by", "validated_at", "challenge_id", "created_at", "updated_at",
+)
+
+
+class ImportFileError(ValueError):
+    """The file as a whole cannot be imported (bad header, already imported...)."""
+
+
+@dataclass
+class ImportReport:
+    loaded: int = 0
+    rejected: List[Tuple[int, List[str], str]] = field(default_factory=list)
+    dry_run: bool = False
+
+    def summary(self) -> str:
+        verb = "would load" if self.dry_run else "loaded"
+        return f"{verb} {self.loaded} rows, rejected {len(self.rejected)}"
+
+    def write_rejects(self, out: TextIO, header: List[str]):
+        writer = csv.writer(out)
+        writer.writerow(["line"] + header + ["error"])
+        for line, row, error in self.rejected:
+            writer.writerow([line] + row + [error])
+
+
+def normalize_header(name: str) -> str:
+    return re.sub(r"\s+", " ", name.strip().lower())
+
+
+def file_tag(data: bytes) -> str:
+    return f"import:{hashlib.sha256(data).hexdigest()}"
+
+
+def parse_row(row: List[str], index: dict, challenge: Challenge) -> tuple:
+    """One CSV row -> ``(user_id, date, value, unit, canonical_value)``; raises ValueError."""
+    user, date, value, unit = (row[index[name]].strip() if index[name] < len(row) else "" for name in REQUIRED)
+
+    match = USER_ID.match(user)
+    if not match:
+        raise ValueError(f"not a Slack user ID: {user!r}")
+    try:
+        date = datetime.fromisoformat(date)
+    except ValueError:
+        raise ValueError(f"date is not ISO formatted: {date!r}")
+    if date.tzinfo is not None:
+        raise ValueError(f"date must not carry a timezone: {date.isoformat()}")
+    if not challenge.start_date <= date <= challenge.end_date:
+        raise ValueError(f"{date:%Y-%m-%d} is outside the challenge ({challenge.start_date:%Y-%m-%d} to {challenge.end_date:%Y-%m-%d})")
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"value is not a number: {value!r}")
+    if not math.isfinite(value) or value <= 0:
+        raise ValueError(f"value must be positive: {value}")
+    # Raises UnitError (a ValueError) naming the unit
+    canonical = to_canonical(value, unit, challenge.activity_type)
+    return match.group(1), date, value, unit, canonical
+
+
+def decode_lines(data: bytes) -> Iterator[str]:
+    """Lines of a UTF-8 file; other encodings raise ImportFileError naming the line and byte."""
+    offset = 0
+    lines = data.splitlines(keepends=True)
+    for number, line in enumerate(lines, 1):
+        try:
+            yield line.decode("utf-8-sig" if number == 1 else "utf-8")
+        except UnicodeDecodeError as e:
+            raise ImportFileError(
+                f"Line {number} is not valid UTF-8 (byte {offset + e.start}: {line[e.start:e.start + 1].hex()}); "
+                "save the file as CSV UTF-8 and try again"
+            )
+        offset += len(line)
+
+
+def read_header(reader) -> Tuple[List[str], dict]:
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ImportFileError("The file is empty")
+    index = {}
+    for i, name in enumerate(header):
+        key = HEADERS.get(normalize_header(name))
+        if key and key not in index:
+            index[key] = i
+    missing = [name for name in REQUIRED if name not in index]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)} (found: {', '.join(header)})")
+    return header, index
+
+
+def records(reader, index: dict, challenge: Challenge, tag: str, report: ImportReport) -> Iterator[tuple]:
+    """Validate rows as COPY consumes them, diverting bad ones to ``report``."""
+    now = datetime.utcnow()
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            user_id, date, value, unit, canonical = parse_row(row, index, challenge)
+        except ValueError as e:
+            report.rejected.append((reader.line_num, row, str(e)))
+            continue
+        report.loaded += 1
+        yield (user_id, date, value, unit, canonical, True, tag, now, challenge.id, now, now)
+
+
+async def import_csv(challenge_id: int, data: bytes, dry_run: bool = False) -> Tuple[ImportReport, List[str]]:
+    """Validate and COPY a CSV into a challenge's results; returns the report and the header.
+
+    Nothing is written when ``dry_run`` is set or when COPY fails; rejected
+    rows never abort the load.
+    """
+    reader = csv.reader(decode_lines(data))
+    header, index = read_header(reader)
+    tag = file_tag(data)
+    report = ImportReport(dry_run=dry_run)
+
+    async with engine.begin() as conn:
+        async with async_session(bind=conn) as db:
+            # Held until COPY commits so archive_challenge cannot drop the partition underneath it
+            challenge = await db.get(Challenge, challenge_id, with_for_update={"read": True})
+            if challenge is None:
+                raise ImportFileError(f"Challenge {challenge_id} does not exist")
+            if challenge.archived_at is not None:
+                raise ImportFileError(f"Challenge {challenge_id} is archived")
+            already = (await db.execute(
+                select(Result.id)
+                .where(Result.challenge_id == challenge_id, Result.validated_by == tag)
+                .limit(1)
+            )).scalar()
+            if already is not None:
+                raise ImportFileError("This file was already imported into the challenge")
+            if not dry_run:
+                await ensure_results_partition(db, challenge_id)
+
+        rows = records(reader, index, challenge, tag, report)
+        if dry_run:
+            for _ in rows:
+                pass
+        else:
+            raw = await conn.get_raw_connection()
+            # asyncpg streams the generator in binary COPY format inside this transaction
+            await raw.driver_connection.copy_records_to_table("results", records=rows, columns=COLUMNS)
+
+    import_rows_total.labels(status="rejected").inc(len(report.rejected))
+    if not dry_run:
+        import_rows_total.labels(status="loaded").inc(report.loaded)
+        if report.loaded:
+            await challenge_changed(challenge_id)
+            # Leaderboards read the precomputed totals
+            from .rollups import refresh_rollups
+            await refresh_rollups([challenge_id])
+    logger.info(f"Import into challenge {challenge_id}: {report.summary()}")
+    return report, header
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import challenge results from a CSV file")
+    parser.add_argument("channel", help="Slack channel ID of the active challenge (ignored with --challenge)")
+    parser.add_argument("path", help="CSV with user, date, value and unit columns")
+    parser.add_argument("--challenge", type=int, help="Import into this challenge instead of the channel's active one")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing")
+    parser.add_argument("--rejects", help="Where to write rejected rows (default: <path>.rejects.csv)")
+    args = parser.parse_args(argv)
+
+    import asyncio
+
+    async def _run():
+        challenge_id = args.challenge
+        if challenge_id is None:
+            from .tasks import find_challenge
+            async with async_session() as db:
+                challenge = await find_challenge(db, args.channel)
+            if challenge is None:
+                raise ImportFileError(f"No active challenge in {args.channel}")
+            challenge_id = challenge.id
+        with open(args.path, "rb") as f:
+            data = f.read()
+        return await import_csv(challenge_id, data, dry_run=args.dry_run)
+
+    try:
+        report, header = asyncio.run(_run())
+    except ImportFileError as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 2
+
+    if report.rejected:
+        path = args.rejects or f"{args.path}.rejects.csv"
+        with open(path, "w", newline="") as f:
+            report.write_rejects(f, header)
+        print(f"Rejected rows written to {path}")
+    print(report.summary())
+    return 1 if report.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
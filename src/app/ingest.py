@@ -0,0 +1,181 @@
+# src/app/ingest.py
+"""
+Single entry point for submissions coming out of the Bolt handlers.
+
+Handlers call ``submit``; the submission is claimed once cluster-wide,
+routed to the replica that owns its channel, acknowledged in a thread and
+put on a bounded in-process queue. A publisher drains that queue into its
+lane's fair queue in Redis (``fair_queue.py``), from where feeders hand it to
+Celery; when the in-process queue is full the user is told the bot is busy
+and the submission waits its turn. The final reply is posted when the task
+finishes.
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Optional
+
+from celery import states # type: ignore
+from celery.exceptions import TimeoutError # type: ignore
+from slack_sdk.web.async_client import AsyncWebClient # type: ignore
+
+from .config import settings
+from .metrics import task_total, ingest_queue_depth, ingest_enqueue_latency, ingest_backpressure_total
+from .celery_app import celery_app, lane_for
+from .clients.redis_client import get_async_raw_redis
+from .envelope import pack
+from .fair_queue import fair_queues
+from .replicas import ReplicaCoordinator, claim
+from .tracing import attached, inject, tracer
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+SUBMISSION_KEY = "fitbot:submission:{}:{}"
+
+client = AsyncWebClient(token=settings.slack_bot_token)
+
+
+async def submit(submission: dict) -> bool:
+    """Accept a submission from any handler on any replica; False if it was already taken."""
+    if not await claim(SUBMISSION_KEY.format(submission["channel"], submission["ts"])):
+        logger.debug(f"Submission {submission['channel']}/{submission['ts']} already claimed")
+        return False
+    with tracer.start_as_current_span("submission.accept", attributes={"slack.channel": submission["channel"], "slack.ts": submission["ts"]}):
+        # Only what the pipeline reads is carried from here on
+        submission = pack(submission)
+        # The time budget starts when the message reaches us, not when it is enqueued
+        submission.setdefault("received_at", time.time())
+        submission.setdefault("deadline", submission["received_at"] + settings.submission_budget_seconds)
+        # Travels with the submission through forwarding, the publish queue and the task
+        submission.setdefault("trace", inject())
+        await coordinator.route(submission)
+    return True
+
+
+class SubmissionPublisher:
+    """Bounded queue between the Bolt handlers and the fair queues in Redis.
+
+    A single publisher coroutine moves submissions on in FIFO order.
+    """
+
+    def __init__(self, maxsize: int = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize or settings.ingest_queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        """Flush what is queued (bounded by ``timeout``), then stop."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self.queue.qsize()} unpublished submissions on shutdown")
+        self._task.cancel()
+        self._task = None
+
+    async def put(self, submission: dict) -> bool:
+        """Queue a submission; returns False if it had to wait for room (backpressure)."""
+        submission.setdefault("received_at", time.time())
+        try:
+            self.queue.put_nowait(submission)
+            waited = False
+        except asyncio.QueueFull:
+            ingest_backpressure_total.inc()
+            await client.chat_postMessage(
+                channel=submission["channel"],
+                thread_ts=submission["ts"],
+                text="⏳ I'm busy right now. Your submission is queued and will be processed shortly."
+            )
+            await self.queue.put(submission)
+            waited = True
+        ingest_queue_depth.set(self.queue.qsize())
+        return not waited
+
+    async def _run(self):
+        while True:
+            submission = await self.queue.get()
+            ingest_queue_depth.set(self.queue.qsize())
+            try:
+                # Fixed up front so this replica can wait on the result whoever publishes the task
+                submission.setdefault("task_id", str(uuid.uuid4()))
+                lane = lane_for(submission)
+                await fair_queues[lane].push(submission)
+                ingest_enqueue_latency.observe(time.time() - submission["received_at"])
+                logger.info(f"Queued task {submission['task_id']} for {submission['channel']}/{submission['ts']} on {lane}")
+                asyncio.create_task(reply_when_done(celery_app.AsyncResult(submission["task_id"]), submission))
+            except Exception as e:
+                logger.error(f"Failed to publish submission {submission['ts']}: {e}")
+                await client.chat_postMessage(
+                    channel=submission["channel"],
+                    thread_ts=submission["ts"],
+                    text=f"❌ Error processing submission: {str(e)}"
+                )
+            finally:
+                self.queue.task_done()
+
+
+async def handle_submission(submission: dict):
+    """Acknowledge and queue a submission on the replica that owns its channel."""
+    channel, ts = submission["channel"], submission["ts"]
+    if publisher.queue.full():
+        # put() tells the user they are queued instead
+        await publisher.put(submission)
+        return
+    await client.chat_postMessage(channel=channel, thread_ts=ts, text="⏳ Processing your submission...")
+    await publisher.put(submission)
+
+
+async def wait_for_result(task_id: str, timeout: float, interval: float = 0.2, max_interval: float = 2.0):
+    """Poll the task's result key with the async Redis client until it is ready.
+
+    Unlike ``AsyncResult.get`` this holds no thread per waiting submission and
+    never calls the result backend from several threads at once.
+    """
+    backend = celery_app.backend
+    key = backend.get_key_for_task(task_id)
+    deadline = time.monotonic() + timeout
+    while True:
+        raw = await get_async_raw_redis().get(key)
+        if raw is not None:
+            meta = backend.decode_result(raw)
+            if meta["status"] == states.SUCCESS:
+                return meta["result"]
+            if meta["status"] in states.READY_STATES:
+                raise backend.exception_to_python(meta["result"])
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Task {task_id} not ready after {timeout:.0f} seconds")
+        await asyncio.sleep(min(interval, remaining))
+        interval = min(interval * 1.5, max_interval)
+
+
+async def reply_when_done(task, submission: dict):
+    """Post the worker's result in the submission thread."""
+    try:
+        # The submission's budget covers its wait in the fair queue as well
+        timeout = max(0.0, submission["deadline"] - time.time()) + 5
+        res = await wait_for_result(task.id, timeout)
+        text = res["message"]
+    except TimeoutError:
+        logger.error(f"Task {task.id} timed out after {timeout:.0f} seconds")
+        text = "⚠️ Processing is taking longer than expected. We'll notify you when it's done."
+        task_total.labels(task_name='workflow_message', status='timeout').inc()
+    except Exception as e:
+        logger.error(f"Error processing task {task.id}: {e}")
+        text = f"❌ Error processing submission: {str(e)}"
+        task_total.labels(task_name='workflow_message', status='error').inc()
+    try:
+        with attached(submission.get("trace")), tracer.start_as_current_span("submission.reply"):
+            await client.chat_postMessage(channel=submission["channel"], thread_ts=submission["ts"], text=text)
+    except Exception as e:
+        logger.error(f"Failed to post result for task {task.id}: {e}")
+
+
+publisher = SubmissionPublisher()
+coordinator = ReplicaCoordinator(handle_submission)
@@ -0,0 +1,208 @@
+# src/app/live.py
+"""
+Live leaderboards pushed over Server-Sent Events.
+
+Workers (and commands, imports, invalidations) publish a challenge's id on
+``fitbot:changes`` whenever its results change (see ``data_versions.py``).
+Each app process holds one subscription to that channel and one
+``LiveBoard`` per challenge that has viewers. On a notification the board
+recomputes the top ``LIVE_LEADERBOARD_SIZE`` rows once, at most every
+``LIVE_MIN_INTERVAL`` seconds however many results arrive, and fans the
+difference out to every viewer. A thousand viewers therefore cost one query
+per change, not one per viewer per poll.
+
+Viewers get a ``snapshot`` event on connect and ``delta`` events after:
+rows whose rank or total changed and users that dropped off. A viewer that
+cannot keep up is disconnected; its EventSource reconnects and starts over
+from a fresh snapshot.
+"""
+
+import asyncio
+import json
+from typing import Dict, List, Optional, Set
+
+from .clients.redis_client import get_async_redis
+from .config import settings
+from .data_versions import CHANGES_CHANNEL
+from .metrics import live_recomputes_total, live_viewers
+from .models.database import async_session
+from .rollups import leaderboard
+from .users import user_directory
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+
+def sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class LiveBoard:
+    """The standings of one challenge and the queues of everyone watching it."""
+
+    def __init__(self, challenge_id: int):
+        self.challenge_id = challenge_id
+        self.viewers: Set[asyncio.Queue] = set()
+        self.rows: List[dict] = []
+        self.seq = 0
+        # Set once the first computation finished; ``error`` holds its failure
+        self.ready = asyncio.Event()
+        self.error: Optional[BaseException] = None
+        self._dirty = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def compute(self) -> List[dict]:
+        async with async_session() as db:
+            rows, _ = await leaderboard(db, self.challenge_id, settings.live_leaderboard_size, live=True)
+        live_recomputes_total.inc()
+        names = await user_directory.names(uid for uid, _ in rows)
+        return [
+            {"rank": rank, "user_id": uid, "name": names.get(uid), "total": round(total, 3)}
+            for rank, (uid, total) in enumerate(rows, 1)
+        ]
+
+    def snapshot(self) -> str:
+        return sse("snapshot", {"challenge_id": self.challenge_id, "rows": self.rows}, self.seq)
+
+    def diff(self, rows: List[dict]) -> Optional[dict]:
+        before = {r["user_id"]: r for r in self.rows}
+        changed = [r for r in rows if before.get(r["user_id"]) != r]
+        current = {r["user_id"] for r in rows}
+        removed = [uid for uid in before if uid not in current]
+        if not changed and not removed:
+            return None
+        return {"challenge_id": self.challenge_id, "changed": changed, "removed": removed}
+
+    def broadcast(self, message: str):
+        for queue in list(self.viewers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too slow to keep up: drop it and let it reconnect for a snapshot
+                self.viewers.discard(queue)
+                live_viewers.dec()
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def mark_dirty(self):
+        self._dirty.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            try:
+                rows = await self.compute()
+            except Exception as e:
+                logger.error(f"Failed to recompute live leaderboard of challenge {self.challenge_id}: {e}")
+                await asyncio.sleep(settings.live_min_interval)
+                self._dirty.set()
+                continue
+            delta = self.diff(rows)
+            self.rows = rows
+            if delta is not None:
+                self.seq += 1
+                self.broadcast(sse("delta", delta, self.seq))
+            # Coalesce bursts: everything arriving meanwhile is one more recompute
+            await asyncio.sleep(settings.live_min_interval)
+
+
+class LiveHub:
+    """One Redis subscription per process, fanned out to the boards being watched."""
+
+    def __init__(self):
+        self.boards: Dict[int, LiveBoard] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self, challenge_id: int) -> asyncio.Queue:
+        """A queue receiving the board's SSE messages, starting with a snapshot (None = disconnect)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+        async with self._lock:
+            board = self.boards.get(challenge_id)
+            first = board is None
+            if first:
+                # Registered before the first query so no change can slip past it
+                board = LiveBoard(challenge_id)
+                self.boards[challenge_id] = board
+
+        if first:
+            # Computed outside the hub lock; other viewers of this board wait on ``ready``
+            try:
+                board.rows = await board.compute()
+            except BaseException as e:
+                async with self._lock:
+                    if self.boards.get(challenge_id) is board:
+                        del self.boards[challenge_id]
+                board.error = e if isinstance(e, Exception) else RuntimeError("Live leaderboard setup was cancelled")
+                board.ready.set()
+                raise
+            board.start()
+            board.ready.set()
+        else:
+            await board.ready.wait()
+            if board.error is not None:
+                raise board.error
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.live_client_buffer)
+        queue.put_nowait(board.snapshot())
+        board.viewers.add(queue)
+        live_viewers.inc()
+        return queue
+
+    async def unsubscribe(self, challenge_id: int, queue: asyncio.Queue):
+        async with self._lock:
+            board = self.boards.get(challenge_id)
+            if board is None:
+                return
+            if queue in board.viewers:
+                board.viewers.discard(queue)
+                live_viewers.dec()
+            if not board.viewers:
+                await board.stop()
+                del self.boards[challenge_id]
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for board in list(self.boards.values()):
+            await board.stop()
+        self.boards.clear()
+
+    async def _listen(self):
+        while True:
+            pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANGES_CHANNEL)
+                # Changes may have been missed while (re)connecting
+                for board in self.boards.values():
+                    board.mark_dirty()
+                async for message in pubsub.listen():
+                    board = self.boards.get(int(message["data"]))
+                    if board is not None:
+                        board.mark_dirty()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live leaderboard subscription failed, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+
+live_hub = LiveHub()
@@ -14,12 +14,22 @@ from sqlalchemy.ext.asyncio import create_async_engine
 from .config import settings
 from .utils.logging import setup_logger
 from .slack_app import bolt_app
-from .metrics import start_metrics_server
+from .metrics import start_metrics_server, register_queue_metrics
+from .health import router as health_router
+from .api import router as api_router, stream_router as api_stream_router
+from .ingest import coordinator, publisher
+from .celery_app import BROKER_QUEUES
+from .fair_queue import feeders
+from .tracing import setup_tracing
+from .live import live_hub
 
 logger = setup_logger(__name__, level=settings.log_level)
 
 # FastAPI app
 app = FastAPI()
+app.include_router(health_router)
+app.include_router(api_router)
+app.include_router(api_stream_router)
 
 # Global socket handler
 socket_handler: Optional[AsyncSocketModeHandler] = None
@@ -27,11 +37,6 @@ socket_handler: Optional[AsyncSocketModeHandler] = None
 # Initialize Socket Mode handler
 handler = AsyncSocketModeHandler(bolt_app, os.environ["SLACK_APP_TOKEN"])
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
-
 async def wait_for_db(max_retries: int = 5, retry_interval: int = 5):
     """Wait for database to be ready."""
     from .models.database import engine
@@ -80,18 +85,23 @@ def init_db():
 async def startup_event():
     """Initialize services on startup."""
     try:
+        setup_tracing("fitbot-app")
+        
         # 1) Wait for database
         await wait_for_db()
         
-        # 2) Initialize database
-        from .models.database import async_session, Base, engine
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        # 2) Apply migrations
+        await asyncio.to_thread(init_db)
             
-        # 3) Start metrics server
+        # 3) Start metrics server (broker queue gauges are exported from the app)
+        register_queue_metrics(BROKER_QUEUES)
         start_metrics_server()
         
-        # 4) Start Socket Mode handler
+        # 4) Join the replica set, then start Socket Mode handler
+        publisher.start()
+        for feeder in feeders:
+            feeder.start()
+        await coordinator.start()
         asyncio.create_task(handler.start_async())
         
         logger.info("Application startup completed successfully")
@@ -105,6 +115,11 @@ async def shutdown_event():
     if handler:
         await handler.close()
         logger.info("Socket Mode handler closed")
+    await coordinator.stop()
+    await publisher.stop()
+    for feeder in feeders:
+        await feeder.stop()
+    await live_hub.stop()
     logger.info("Application shutdown complete")
 
 if __name__ == "__main__":
@@ -1,5 +1,8 @@
-from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+import json
 import os
+import time
 from .config import settings
 from .utils.logging import setup_logger
 
@@ -57,6 +60,244 @@ ollama_duration = Histogram(
     'Ollama API request duration in seconds'
 )
 
+ollama_batch_size = Histogram(
+    'ollama_batch_size',
+    'Number of extraction jobs dispatched together',
+    buckets=(1, 2, 4, 8, 16, 32)
+)
+
+duplicate_submissions_total = Counter(
+    'duplicate_submissions_total',
+    'Screenshots matching an earlier submission in the same challenge',
+    ['same_user', 'action']
+)
+
+# Ingestion metrics
+ingest_queue_depth = Gauge(
+    'ingest_queue_depth',
+    'Submissions waiting in the in-process queue for the broker'
+)
+
+ingest_enqueue_latency = Histogram(
+    'ingest_enqueue_latency_seconds',
+    'Time from receiving a submission to publishing it to the broker',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+ingest_backpressure_total = Counter(
+    'ingest_backpressure_total',
+    'Submissions that found the ingestion queue full and had to wait'
+)
+
+# Replica metrics
+duplicate_events_total = Counter(
+    'slack_duplicate_events_total',
+    'Slack events dropped because another delivery was already claimed'
+)
+
+forwarded_submissions_total = Counter(
+    'forwarded_submissions_total',
+    'Submissions forwarded to the replica owning their channel'
+)
+
+# Tiered Ollama models
+ollama_model_duration = Histogram(
+    'ollama_model_duration_seconds',
+    'Latency of extraction calls per model',
+    ['model'],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 12, 20, 30)
+)
+
+ollama_model_requests_total = Counter(
+    'ollama_model_requests_total',
+    'Extraction calls per model by outcome (accepted, or why the answer was not good enough)',
+    ['model', 'outcome']
+)
+
+ollama_escalations_total = Counter(
+    'ollama_escalations_total',
+    'Extractions handed from a model to the next tier',
+    ['model', 'reason']
+)
+
+ollama_model_warm = Gauge(
+    'ollama_model_warm',
+    'Whether the last keep-alive ping loaded the model (1) or failed (0)',
+    ['model']
+)
+
+# Circuit breaker metrics
+circuit_breaker_state = Gauge(
+    'circuit_breaker_state',
+    'Circuit breaker state (0=closed, 1=open, 2=half-open)',
+    ['name']
+)
+
+circuit_breaker_rejections_total = Counter(
+    'circuit_breaker_rejections_total',
+    'Calls rejected because the circuit breaker was open',
+    ['name']
+)
+
+ocr_fallback_total = Counter(
+    'ocr_fallback_total',
+    'OCR calls the resident engine failed and pytesseract handled',
+    ['engine']
+)
+
+deadline_exceeded_total = Counter(
+    'submission_deadline_exceeded_total',
+    'Submissions abandoned because their time budget ran out',
+    ['stage']
+)
+
+# Submission lanes
+lane_wait = Histogram(
+    'submission_lane_wait_seconds',
+    'Time from receiving a submission to a worker starting it',
+    ['lane'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+)
+
+lane_latency = Histogram(
+    'submission_lane_latency_seconds',
+    'Time from receiving a submission to its result',
+    ['lane'],
+    buckets=(0.5, 1, 2.5, 5, 10, 15, 20, 30, 45, 60, 120)
+)
+
+lane_slo_breaches_total = Counter(
+    'submission_lane_slo_breaches_total',
+    'Submissions that finished later than their lane\'s latency objective',
+    ['lane']
+)
+
+fair_queue_depth = Gauge(
+    'fair_queue_depth',
+    'Submissions waiting in the fair queue of a lane',
+    ['lane']
+)
+
+# Read API
+api_responses_total = Counter(
+    'api_responses_total',
+    'Read API responses, 304 meaning the client\'s copy was still current',
+    ['endpoint', 'status']
+)
+
+# Live leaderboards
+live_viewers = Gauge(
+    'live_leaderboard_viewers',
+    'Open Server-Sent Events streams of live leaderboards'
+)
+
+live_recomputes_total = Counter(
+    'live_leaderboard_recomputes_total',
+    'Live leaderboard queries, shared by every viewer of a board'
+)
+
+# Bulk imports
+import_rows_total = Counter(
+    'import_rows_total',
+    'CSV rows seen by bulk imports',
+    ['status']
+)
+
+# Dependency health (readiness probes)
+dependency_latency = Histogram(
+    'dependency_probe_latency_seconds',
+    'Latency of readiness probes against dependencies',
+    ['dependency'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+dependency_up = Gauge(
+    'dependency_up',
+    'Whether the last readiness probe of a dependency succeeded',
+    ['dependency']
+)
+
+# Worker capacity
+worker_slots = Gauge(
+    'celery_worker_slots',
+    'Task slots (pool concurrency) of this worker process'
+)
+
+worker_active_slots = Gauge(
+    'celery_worker_active_slots',
+    'Task slots of this worker currently running a task'
+)
+
+class QueueCollector:
+    """Broker queue length and age of the oldest message, read from Redis at scrape time.
+
+    Kombu's Redis transport LPUSHes messages and workers BRPOP them, so the
+    oldest message is the list's tail; its age comes from the ``enqueued_at``
+    header set in ``register_celery_metrics``.
+    """
+
+    def __init__(self, queues):
+        self.queues = list(queues)
+
+    def collect(self):
+        from .clients.redis_client import get_redis
+
+        length = GaugeMetricFamily('celery_queue_length', 'Messages waiting in a broker queue', labels=['queue'])
+        age = GaugeMetricFamily('celery_queue_oldest_age_seconds', 'Age of the oldest message in a broker queue', labels=['queue'])
+        r = get_redis()
+        now = time.time()
+        for queue in self.queues:
+            try:
+                pipe = r.pipeline()
+                pipe.llen(queue)
+                pipe.lindex(queue, -1)
+                size, oldest = pipe.execute()
+            except Exception as e:
+                logger.error(f"Failed to read queue {queue}: {e}")
+                continue
+            length.add_metric([queue], size)
+            enqueued_at = None
+            if oldest:
+                try:
+                    enqueued_at = json.loads(oldest).get('headers', {}).get('enqueued_at')
+                except ValueError:
+                    pass
+            age.add_metric([queue], max(0.0, now - enqueued_at) if enqueued_at else 0.0)
+        yield length
+        yield age
+
+_queue_collector = None
+
+def register_queue_metrics(queues):
+    """Export broker queue gauges from this process (once per process)."""
+    global _queue_collector
+    if _queue_collector is None:
+        _queue_collector = QueueCollector(queues)
+        REGISTRY.register(_queue_collector)
+
+def register_celery_metrics(celery_app):
+    """Stamp published tasks with their enqueue time and track busy worker slots."""
+    from celery.signals import before_task_publish, task_prerun, task_postrun, worker_ready
+
+    @before_task_publish.connect(weak=False)
+    def stamp_enqueued_at(headers=None, **kwargs):
+        if headers is not None:
+            headers.setdefault('enqueued_at', time.time())
+
+    @worker_ready.connect(weak=False)
+    def start_worker_metrics(sender=None, **kwargs):
+        # sender is the worker's consumer; its controller knows the pool size
+        worker_slots.set(getattr(getattr(sender, 'controller', None), 'concurrency', 0) or 0)
+        start_metrics_server()
+
+    @task_prerun.connect(weak=False)
+    def slot_taken(**kwargs):
+        worker_active_slots.inc()
+
+    @task_postrun.connect(weak=False)
+    def slot_released(**kwargs):
+        worker_active_slots.dec()
+
 def start_metrics_server():
     """Start Prometheus metrics server on a separate port."""
     try:
@@ -1,7 +1,7 @@
 # src/app/models/challenge.py
 
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Float, ForeignKey, Enum, Boolean, Integer
+from sqlalchemy import Column, String, DateTime, Float, ForeignKey, Enum, Boolean, Integer, Index, BigInteger, text
 from sqlalchemy.orm import relationship
 import enum
 
@@ -17,26 +17,58 @@ class ActivityType(enum.Enum):
 class Challenge(Base, TimestampedModel):
     __tablename__ = "challenges"
 
-    slack_channel_id = Column(String, nullable=False, unique=True)
+    slack_channel_id = Column(String, nullable=False)
     activity_type     = Column(Enum(ActivityType), nullable=False)
     start_date        = Column(DateTime, nullable=False)
     end_date          = Column(DateTime, nullable=False)
     is_active         = Column(Boolean, default=True)
+    archived_at       = Column(DateTime, nullable=True)  # results moved to cold storage
     results           = relationship("Result", back_populates="challenge")
 
+    __table_args__ = (
+        # A channel keeps its old challenges but only one can be running
+        Index(
+            "uq_challenges_active_channel", "slack_channel_id",
+            unique=True, postgresql_where=text("is_active")
+        ),
+    )
+
 
 class Result(Base, TimestampedModel):
+    """A recorded submission.
+
+    The table is range-partitioned on ``challenge_id`` with one partition per
+    challenge (see ``models/partitions.py``), so ``challenge_id`` is part of
+    the primary key and queries should always filter on it.
+    """
     __tablename__ = "results"
 
+    id               = Column(Integer, primary_key=True, autoincrement=True)
     user_id          = Column(String, nullable=False, index=True)
     date             = Column(DateTime, nullable=False)
     value            = Column(Float, nullable=False)
-    unit             = Column(String, nullable=False)
+    unit             = Column(String, nullable=False)  # as reported
+    canonical_value  = Column(Float, nullable=True)  # value in the activity's unit (utils/units.py); NULL if unconvertible
     screenshot_url   = Column(String, nullable=True)
     is_validated     = Column(Boolean, default=False)
     validation_error = Column(String, nullable=True)
     validated_by     = Column(String, nullable=True)
     validated_at     = Column(DateTime, nullable=True)
+    slack_ts         = Column(String, nullable=True)  # ts of the workflow message it came from
+    image_hash       = Column(BigInteger, nullable=True)  # dHash of the screenshot, stored signed
+
+    challenge_id     = Column(Integer, ForeignKey("challenges.id"), primary_key=True)
+    challenge        = relationship("Challenge", back_populates="results")
 
-    challenge_id     = Column(Integer, ForeignKey("challenges.id"), nullable=False)
-    challenge        = relationship("Challenge", back_populates="results")
\ No newline at end of file
+    __table_args__ = (
+        # One result per Slack message; save_result upserts against it
+        Index("uq_results_challenge_slack_ts", "challenge_id", "slack_ts", unique=True),
+        # Lets per-user totals of validated results be summed from the index alone
+        Index(
+            "ix_results_challenge_user_total", "challenge_id", "user_id",
+            postgresql_include=["canonical_value"], postgresql_where=text("is_validated")
+        ),
+        # Keyset order of a user's recent submissions
+        Index("ix_results_challenge_user_date", "challenge_id", "user_id", date.desc(), id.desc()),
+        {"postgresql_partition_by": "RANGE (challenge_id)"},
+    )
\ No newline at end of file
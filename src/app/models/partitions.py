@@ -0,0 +1,22 @@
+# src/app/models/partitions.py
+
+from sqlalchemy import text
+
+
+def results_partition_name(challenge_id: int) -> str:
+    return f"results_c{int(challenge_id)}"
+
+
+async def ensure_results_partition(db, challenge_id: int):
+    """Create the results partition for a challenge if it does not exist yet.
+
+    Call inside the transaction that creates the challenge, before any result
+    for it can be inserted (otherwise its rows land in the default partition
+    and Postgres refuses to create the dedicated one).
+    """
+    challenge_id = int(challenge_id)
+    await db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {results_partition_name(challenge_id)} "
+        f"PARTITION OF results FOR VALUES FROM ({challenge_id}) TO ({challenge_id + 1})"
+    ))
+
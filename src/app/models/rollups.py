@@ -0,0 +1,35 @@
+# src/app/models/rollups.py
+
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Date, Float, ForeignKey, Integer, Index
+
+from .base import Base
+
+
+class DailyUserTotal(Base):
+    """Per-user, per-day totals of a challenge, rebuilt by the ``refresh_rollups`` task."""
+    __tablename__ = "daily_user_totals"
+
+    challenge_id = Column(Integer, ForeignKey("challenges.id"), primary_key=True)
+    user_id      = Column(String, primary_key=True)
+    day          = Column(Date, primary_key=True)
+    total        = Column(Float, nullable=False)
+    submissions  = Column(Integer, nullable=False)
+    refreshed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ChallengeUserTotal(Base):
+    """Per-user totals of a challenge; what the leaderboard and digests read."""
+    __tablename__ = "challenge_user_totals"
+
+    challenge_id    = Column(Integer, ForeignKey("challenges.id"), primary_key=True)
+    user_id         = Column(String, primary_key=True)
+    total           = Column(Float, nullable=False)
+    submissions     = Column(Integer, nullable=False)
+    last_submission = Column(DateTime, nullable=True)
+    refreshed_at    = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Matches the leaderboard's (total, user_id) keyset order
+        Index("ix_challenge_user_totals_rank", "challenge_id", total.desc(), user_id.desc()),
+    )
@@ -0,0 +1,97 @@
+# src/app/pagination.py
+"""
+Keyset pagination for the leaderboard and recent-submission views.
+
+Pages seek past the sort key of the last row shown (or before the first one)
+instead of using OFFSET, so with the matching composite indexes every page
+is one index range scan however deep it is. Block Kit "Previous"/"Next"
+buttons carry the position as an opaque cursor: base64 of a small JSON
+document with the view, its scope, the boundary key, the direction and the
+page size. Cursors are checked against the channel they are used in, and
+page sizes are clamped to ``MAX_PAGE_SIZE``.
+"""
+
+import base64
+import json
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Callable, List, Optional
+
+from .config import settings
+
+
+@dataclass(frozen=True)
+class Cursor:
+    view: str                      # "leaderboard" | "recent"
+    challenge_id: int
+    limit: int
+    key: Optional[list] = None     # sort key of the row to seek past; None = first page
+    backward: bool = False         # rows before ``key`` rather than after it
+    offset: int = 0                # position of the page's first row, for numbering
+    scope: dict = field(default_factory=dict)  # view-specific filters, e.g. {"user": "U123"}
+
+    def encode(self) -> str:
+        raw = json.dumps(asdict(self), separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, value: str) -> "Cursor":
+        try:
+            data = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+            cursor = cls(**data)
+        except Exception:
+            raise ValueError("Invalid page cursor")
+        return replace(cursor, limit=clamp_limit(cursor.limit))
+
+
+@dataclass
+class Page:
+    rows: List[Any]
+    offset: int
+    next: Optional[Cursor]
+    previous: Optional[Cursor]
+
+    @classmethod
+    def from_rows(cls, rows: List[Any], cursor: Cursor, key: Callable[[Any], list]) -> "Page":
+        """Build a page from ``cursor.limit + 1`` rows fetched in seek order."""
+        more = len(rows) > cursor.limit
+        rows = list(rows[:cursor.limit])
+        if cursor.backward:
+            rows.reverse()
+        offset = max(cursor.offset, 0)
+        if not rows:
+            return cls(rows, offset, None, None)
+
+        # Coming back from a later page there is always a next one, and vice versa
+        has_next = more if not cursor.backward else True
+        has_previous = more if cursor.backward else cursor.key is not None
+        return cls(
+            rows,
+            offset,
+            replace(cursor, key=key(rows[-1]), backward=False, offset=offset + len(rows)) if has_next else None,
+            replace(cursor, key=key(rows[0]), backward=True, offset=max(offset - cursor.limit, 0)) if has_previous else None,
+        )
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit:
+        return settings.page_size
+    return min(max(int(limit), 1), settings.max_page_size)
+
+
+def page_blocks(text: str, page: Page, action_id: str) -> List[dict]:
+    """The page's text plus Previous/Next buttons for whichever way there is more."""
+    blocks = [{"type": "section", "text": {"type": "mrkdwn", "text": text}}]
+    buttons = []
+    if page.previous:
+        buttons.append({
+            "type": "button", "action_id": f"{action_id}_previous",
+            "text": {"type": "plain_text", "text": "◀ Previous"}, "value": page.previous.encode()
+        })
+    if page.next:
+        buttons.append({
+            "type": "button", "action_id": f"{action_id}_next",
+            "text": {"type": "plain_text", "text": "Next ▶"}, "value": page.next.encode()
+        })
+    if buttons:
+        blocks.append({"type": "actions", "elements": buttons})
+    return blocks
@@ -0,0 +1,206 @@
+# src/app/profiling.py
+"""
+Opt-in sampling profiler for workers and the Bolt app.
+
+A sampled ``process_submission`` run or Bolt request is profiled with
+cProfile and dumped as a ``.prof`` file (open with ``snakeviz``, or turn it
+into a flame graph with ``flameprof``); with ``PROFILE_TRACEMALLOC`` a
+tracemalloc snapshot is written next to it. Dumps go to ``PROFILE_DIR``,
+which is trimmed to ``PROFILE_MAX_FILES`` / ``PROFILE_MAX_MB`` after every
+write.
+
+The sample rate comes from ``PROFILE_SAMPLE_RATE`` unless an admin overrode
+it with ``/challenge profile``, which stores a rate with a TTL in Redis so
+profiling switches itself off again.
+"""
+
+import asyncio
+import cProfile
+import os
+import random
+import threading
+import time
+import tracemalloc
+from typing import Dict, Optional
+
+from .clients.redis_client import get_async_redis, get_redis
+from .config import settings
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+RATE_KEY = "fitbot:profiling:rate"
+
+# How often the Redis override is re-read
+RATE_REFRESH_SECONDS = 10
+
+
+class ProfileSession:
+    """One profiled call: ``finish()`` on the thread that started it, then ``save()``."""
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.started = time.time()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def finish(self):
+        self.profile.disable()
+
+    def save(self):
+        try:
+            self.profiler._write(self)
+        finally:
+            self.profiler._active.release()
+
+    def stop(self):
+        self.finish()
+        self.save()
+
+
+class Profiler:
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.profile_dir
+        self._override: Optional[float] = None
+        self._checked = 0.0
+        # One profile at a time per process: bounds overhead, and cProfile
+        # on 3.12+ refuses a second concurrent profiler anyway
+        self._active = threading.Lock()
+
+    def rate(self) -> float:
+        """Current sample rate (0..1), for synchronous callers."""
+        if time.monotonic() - self._checked > RATE_REFRESH_SECONDS:
+            try:
+                self._set_override(get_redis().get(RATE_KEY))
+            except Exception as e:
+                logger.error(f"Failed to read profiling rate: {e}")
+                self._checked = time.monotonic()
+        return self._effective()
+
+    async def arate(self) -> float:
+        """Current sample rate (0..1), for the event loop."""
+        if time.monotonic() - self._checked > RATE_REFRESH_SECONDS:
+            try:
+                self._set_override(await get_async_redis().get(RATE_KEY))
+            except Exception as e:
+                logger.error(f"Failed to read profiling rate: {e}")
+                self._checked = time.monotonic()
+        return self._effective()
+
+    def _set_override(self, value: Optional[str]):
+        self._override = float(value) if value is not None else None
+        self._checked = time.monotonic()
+
+    def _effective(self) -> float:
+        rate = self._override if self._override is not None else settings.profile_sample_rate
+        # tracemalloc slows every allocation, so it only runs while profiling is on
+        if rate > 0 and settings.profile_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.profile_tracemalloc_frames)
+        elif rate <= 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return rate
+
+    def start(self, name: str, rate: float) -> Optional[ProfileSession]:
+        """Start profiling with probability ``rate``; None if not sampled."""
+        if rate <= 0 or random.random() >= rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        try:
+            return ProfileSession(self, name)
+        except Exception as e:
+            self._active.release()
+            logger.error(f"Failed to start profiler: {e}")
+            return None
+
+    def _write(self, session: ProfileSession):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stem = os.path.join(
+                self.directory,
+                f"{session.name}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime(session.started))}-{os.getpid()}-{threading.get_ident()}"
+            )
+            session.profile.dump_stats(f"{stem}.prof")
+            if tracemalloc.is_tracing():
+                tracemalloc.take_snapshot().dump(f"{stem}.tracemalloc")
+            logger.debug(f"Profiled {session.name} in {time.time() - session.started:.2f}s: {stem}.prof")
+            self.rotate()
+        except Exception as e:
+            logger.error(f"Failed to write profile for {session.name}: {e}")
+
+    def usage(self) -> Dict[str, int]:
+        files = self._files()
+        return {"files": len(files), "bytes": sum(size for _, size, _ in files)}
+
+    def _files(self):
+        files = []
+        for entry in os.scandir(self.directory) if os.path.isdir(self.directory) else ():
+            if entry.is_file() and entry.name.endswith((".prof", ".tracemalloc")):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(files)
+
+    def rotate(self):
+        """Delete the oldest dumps until the directory is under both caps."""
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        max_bytes = settings.profile_max_mb * 1024 * 1024
+        while files and (len(files) > settings.profile_max_files or total > max_bytes):
+            _, size, path = files.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+profiler = Profiler()
+
+
+async def set_rate(rate: float, minutes: int):
+    """Override the sample rate on every replica and worker for ``minutes``."""
+    r = get_async_redis()
+    if rate <= 0:
+        await r.delete(RATE_KEY)
+    else:
+        await r.set(RATE_KEY, rate, ex=minutes * 60)
+    profiler._checked = 0.0
+
+
+def register_profiling_middleware(app):
+    """Profile a sample of Bolt requests (events, commands, actions)."""
+
+    @app.middleware
+    async def profile_requests(body, next):
+        # The session covers the event loop thread while the handler runs, so
+        # whatever else the loop does meanwhile shows up in the dump too
+        kind = body.get("command") or (body.get("event") or {}).get("type") or body.get("type") or "request"
+        session = profiler.start(f"bolt-{kind.strip('/')}", await profiler.arate())
+        try:
+            return await next()
+        finally:
+            if session:
+                session.finish()
+                # Dumps can be large; keep the file I/O off the event loop
+                await asyncio.to_thread(session.save)
+
+
+def register_task_profiling(celery_app, task_names=("process_submission",)):
+    """Profile a sample of runs of ``task_names`` via Celery's task signals."""
+    from celery.signals import task_prerun, task_postrun
+
+    sessions: Dict[str, ProfileSession] = {}
+
+    @task_prerun.connect(weak=False)
+    def start_task_profile(task_id=None, task=None, **kwargs):
+        if task is not None and task.name in task_names:
+            session = profiler.start(task.name, profiler.rate())
+            if session:
+                sessions[task_id] = session
+
+    @task_postrun.connect(weak=False)
+    def stop_task_profile(task_id=None, **kwargs):
+        session = sessions.pop(task_id, None)
+        if session:
+            session.stop()
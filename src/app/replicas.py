@@ -0,0 +1,182 @@
+# src/app/replicas.py
+"""
+Coordination between app replicas running Socket Mode side by side.
+
+Slack spreads events over every open Socket Mode connection and redelivers
+them when an ack is late, so with several pods the same event can arrive
+more than once and consecutive messages of a channel can land on different
+pods. This module:
+
+- drops events whose ``event_id`` another replica already claimed;
+- keeps a heartbeat registry of live replicas in Redis;
+- gives every channel one owner via rendezvous hashing over the live set,
+  forwarding submissions to the owner's Redis inbox so a single replica
+  enqueues each channel's work, in arrival order;
+- on every heartbeat, adopts the inbox of any replica that is no longer
+  registered, including items forwarded to it after it left.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from slack_bolt.response import BoltResponse # type: ignore
+
+from .clients.redis_client import get_async_redis
+from .config import settings
+from .metrics import duplicate_events_total, forwarded_submissions_total
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+REPLICAS_KEY = "fitbot:replicas"
+INBOX_KEY = "fitbot:inbox:{}"
+EVENT_KEY = "fitbot:event:{}"
+
+
+def owner_for(channel: str, replicas: List[str]) -> str:
+    """Rendezvous hashing: only 1/N of channels move when a replica joins or leaves."""
+    return max(replicas, key=lambda r: hashlib.sha1(f"{r}:{channel}".encode()).digest())
+
+
+async def claim(key: str, ttl: int = None) -> bool:
+    """Atomically claim a key; False if another replica (or an earlier delivery) has it."""
+    try:
+        return bool(await get_async_redis().set(key, settings.replica_id, nx=True, ex=ttl or settings.dedup_ttl_seconds))
+    except Exception as e:
+        # Prefer a possible duplicate over dropping work when Redis is unavailable
+        logger.error(f"Dedup claim failed for {key}: {e}")
+        return True
+
+
+def register_dedup_middleware(app):
+    """Acknowledge and drop events that were already delivered to some replica."""
+
+    @app.middleware
+    async def dedup_events(body, next, logger):
+        event_id = body.get("event_id")
+        if event_id and not await claim(EVENT_KEY.format(event_id)):
+            duplicate_events_total.inc()
+            logger.debug(f"Dropping duplicate event {event_id}")
+            return BoltResponse(status=200, body="")
+        return await next()
+
+
+class ReplicaCoordinator:
+    """Heartbeat, channel ownership and inbox forwarding for one replica."""
+
+    def __init__(self, handler: Callable[[dict], Awaitable[None]], replica_id: str = None, max_inflight: int = None):
+        self.handler = handler
+        self.replica_id = replica_id or settings.replica_id
+        self.interval = settings.replica_heartbeat_seconds
+        self._live: List[str] = [self.replica_id]
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: List[asyncio.Task] = []
+        # Forwarded submissions being handed to the handler; beyond this they wait in Redis
+        self._inflight = asyncio.Semaphore(max_inflight or settings.ingest_queue_size)
+
+    async def start(self):
+        await self._heartbeat()
+        self._tasks = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._consume_inbox()),
+        ]
+        logger.info(f"Replica {self.replica_id} joined ({len(self._live)} live)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        try:
+            await get_async_redis().zrem(REPLICAS_KEY, self.replica_id)
+        except Exception as e:
+            logger.error(f"Failed to deregister replica: {e}")
+
+    async def _heartbeat(self):
+        r = get_async_redis()
+        now = time.time()
+        await r.zadd(REPLICAS_KEY, {self.replica_id: now})
+        cutoff = now - 3 * self.interval
+        dead = await r.zrangebyscore(REPLICAS_KEY, "-inf", cutoff)
+        for replica in dead:
+            if await r.zrem(REPLICAS_KEY, replica):
+                logger.warning(f"Replica {replica} expired")
+        self._live = sorted(await r.zrangebyscore(REPLICAS_KEY, cutoff, "+inf")) or [self.replica_id]
+        await self._adopt_orphaned_inboxes()
+
+    async def _adopt_orphaned_inboxes(self):
+        """Move items from the inbox of every unregistered replica into ours.
+
+        Runs on each heartbeat rather than once at removal, so submissions a
+        peer forwarded with a stale live set after the owner left are still
+        picked up. LMOVE is atomic, so concurrent adopters never duplicate an item.
+        """
+        r = get_async_redis()
+        prefix = INBOX_KEY.format("")
+        async for key in r.scan_iter(match=INBOX_KEY.format("*")):
+            replica = key[len(prefix):]
+            if replica == self.replica_id or await r.zscore(REPLICAS_KEY, replica) is not None:
+                continue
+            moved = 0
+            while await r.lmove(key, INBOX_KEY.format(self.replica_id), "LEFT", "RIGHT"):
+                moved += 1
+            if moved:
+                logger.warning(f"Adopted {moved} queued submissions from departed replica {replica}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._heartbeat()
+            except Exception as e:
+                logger.error(f"Replica heartbeat failed: {e}")
+
+    async def _consume_inbox(self):
+        r = get_async_redis()
+        key = INBOX_KEY.format(self.replica_id)
+        while True:
+            await self._inflight.acquire()
+            try:
+                item = await r.blpop(key, timeout=self.interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._inflight.release()
+                logger.error(f"Failed to read forwarded submission: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not item:
+                self._inflight.release()
+                continue
+            # Handed off so a full publisher queue does not stall the inbox; tasks
+            # take their channel lock in creation order, which keeps channels in order
+            asyncio.create_task(self._handle_forwarded(item[1]))
+
+    async def _handle_forwarded(self, raw):
+        try:
+            await self._handle_local(json.loads(raw))
+        except Exception as e:
+            logger.error(f"Failed to handle forwarded submission: {e}")
+        finally:
+            self._inflight.release()
+
+    async def _handle_local(self, submission: dict):
+        # asyncio.Lock wakes waiters in FIFO order, so a channel's submissions keep their order
+        lock = self._locks.setdefault(submission["channel"], asyncio.Lock())
+        async with lock:
+            await self.handler(submission)
+
+    async def route(self, submission: dict):
+        """Handle a submission here if this replica owns its channel, else forward it."""
+        owner = owner_for(submission["channel"], self._live)
+        if owner == self.replica_id:
+            await self._handle_local(submission)
+            return
+        try:
+            await get_async_redis().rpush(INBOX_KEY.format(owner), json.dumps(submission))
+            forwarded_submissions_total.inc()
+            logger.debug(f"Forwarded submission {submission['ts']} to {owner}")
+        except Exception as e:
+            logger.error(f"Failed to forward to {owner}, handling locally: {e}")
+            await self._handle_local(submission)
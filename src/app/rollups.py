@@ -0,0 +1,192 @@
+# src/app/rollups.py
+"""
+Precomputed challenge summaries, maintained by Celery beat.
+
+Slash commands used to aggregate ``results`` on every call. The periodic
+tasks in ``tasks.py`` now close challenges past their ``end_date``, rebuild
+per-user daily and per-challenge totals for running challenges, and post
+digest leaderboards; commands read the totals and only fall back to a live
+aggregate for a challenge that has not been rolled up yet. Only validated
+results count; an admin invalidating one refreshes its challenge at once.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from slack_sdk.web.async_client import AsyncWebClient # type: ignore
+from sqlalchemy import delete, func, insert, literal, select, tuple_, update # type: ignore
+
+from .config import settings
+from .models.challenge import ActivityType, Challenge, Result
+from .models.database import async_session
+from .data_versions import challenge_changed
+from .models.rollups import ChallengeUserTotal, DailyUserTotal
+from .pagination import Cursor
+from .users import user_directory
+from .utils.units import CANONICAL_UNITS
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+
+async def refresh_challenge(db, challenge_id: int):
+    """Rebuild one challenge's totals; readers see the old rows until commit."""
+    now = datetime.utcnow()
+    day = func.date(Result.date)
+
+    await db.execute(delete(DailyUserTotal).where(DailyUserTotal.challenge_id == challenge_id))
+    await db.execute(insert(DailyUserTotal).from_select(
+        ["challenge_id", "user_id", "day", "total", "submissions", "refreshed_at"],
+        select(Result.challenge_id, Result.user_id, day, func.coalesce(func.sum(Result.canonical_value), 0), func.count(), literal(now))
+        .where(Result.challenge_id == challenge_id, Result.is_validated == True)
+        .group_by(Result.challenge_id, Result.user_id, day)
+    ))
+
+    await db.execute(delete(ChallengeUserTotal).where(ChallengeUserTotal.challenge_id == challenge_id))
+    await db.execute(insert(ChallengeUserTotal).from_select(
+        ["challenge_id", "user_id", "total", "submissions", "last_submission", "refreshed_at"],
+        select(Result.challenge_id, Result.user_id, func.coalesce(func.sum(Result.canonical_value), 0), func.count(), func.max(Result.date), literal(now))
+        .where(Result.challenge_id == challenge_id, Result.is_validated == True)
+        .group_by(Result.challenge_id, Result.user_id)
+    ))
+
+
+async def refresh_rollups(challenge_ids: Optional[List[int]] = None) -> List[int]:
+    """Refresh the given challenges, or every running one."""
+    async with async_session() as db:
+        if challenge_ids is None:
+            challenge_ids = (await db.execute(
+                select(Challenge.id).where(Challenge.is_active == True)
+            )).scalars().all()
+        for challenge_id in challenge_ids:
+            # One transaction per challenge keeps locks short
+            await refresh_challenge(db, challenge_id)
+            await db.commit()
+            await challenge_changed(challenge_id)
+    return list(challenge_ids)
+
+
+async def leaderboard(db, challenge_id: int, limit: int = 10, cursor: Optional[Cursor] = None, live: bool = False) -> Tuple[List[tuple], Optional[datetime]]:
+    """``(user_id, total)`` pairs, highest first, and when they were computed (None if live).
+
+    Ties are ordered by user ID so ``(total, user_id)`` is a unique sort key.
+    With a ``cursor`` the rows seek past its key; going backward they come
+    lowest first (see ``Page.from_rows``). ``live`` skips the rollups and sums
+    results directly, so every recorded result shows immediately.
+    """
+    key = cursor.key if cursor else None
+    backward = bool(cursor and cursor.key and cursor.backward)
+
+    def seek(stmt, total, user, having=False):
+        if key is not None:
+            bound = tuple_(total, user) > tuple_(*key) if backward else tuple_(total, user) < tuple_(*key)
+            stmt = stmt.having(bound) if having else stmt.where(bound)
+        if backward:
+            return stmt.order_by(total.asc(), user.asc()).limit(limit)
+        return stmt.order_by(total.desc(), user.desc()).limit(limit)
+
+    if not live:
+        rows = (await db.execute(seek(
+            select(ChallengeUserTotal.user_id, ChallengeUserTotal.total, ChallengeUserTotal.refreshed_at)
+            .where(ChallengeUserTotal.challenge_id == challenge_id),
+            ChallengeUserTotal.total, ChallengeUserTotal.user_id
+        ))).all()
+        if rows:
+            return [(r.user_id, r.total) for r in rows], rows[0].refreshed_at
+
+    # Can be answered from the partial ix_results_challenge_user_total alone
+
+    total = func.coalesce(func.sum(Result.canonical_value), 0)
+    rows = (await db.execute(seek(
+        select(Result.user_id, total.label("total"))
+        .where(Result.challenge_id == challenge_id, Result.is_validated == True)
+        .group_by(Result.user_id),
+        total, Result.user_id, having=True
+    ))).all()
+    return [tuple(r) for r in rows], None
+
+
+async def challenge_stats(db, challenge_id: int) -> dict:
+    """Participant and submission counts of a challenge that is still in Postgres."""
+    stats = (await db.execute(
+        select(
+            func.count().label("participants"),
+            func.coalesce(func.sum(ChallengeUserTotal.submissions), 0).label("submissions")
+        )
+        .where(ChallengeUserTotal.challenge_id == challenge_id)
+    )).one()._asdict()
+    if stats["participants"]:
+        return stats
+    return (await db.execute(
+        select(
+            func.count(func.distinct(Result.user_id)).label("participants"),
+            func.count().label("submissions")
+        )
+        .where(Result.challenge_id == challenge_id, Result.is_validated == True)
+    )).one()._asdict()
+
+
+async def format_leaderboard(rows: List[tuple], activity: ActivityType, title: str = "🏆 *Leaderboard*", refreshed_at: Optional[datetime] = None, start: int = 1) -> str:
+    names = await user_directory.names(uid for uid, _ in rows)
+    unit = CANONICAL_UNITS[activity]
+    msg = f"{title}\n"
+    for i, (uid, total) in enumerate(rows, start):
+        msg += f"{i}. {user_directory.label(uid, names)} — {total:.1f} {unit}\n"
+    if refreshed_at:
+        msg += f"_Updated {refreshed_at.strftime('%H:%M')} UTC_"
+    return msg
+
+
+async def close_expired_challenges() -> List[int]:
+    """Deactivate challenges past their ``end_date`` and announce the final standings."""
+    async with async_session() as db:
+        closed = (await db.execute(
+            update(Challenge)
+            .where(Challenge.is_active == True, Challenge.end_date < datetime.utcnow())
+            .values(is_active=False)
+            .returning(Challenge.id, Challenge.slack_channel_id, Challenge.activity_type)
+        )).all()
+        await db.commit()
+    if not closed:
+        return []
+    await challenge_changed(*(c.id for c in closed), listing=True)
+
+    await refresh_rollups([c.id for c in closed])
+    client = AsyncWebClient(token=settings.slack_bot_token)
+    for challenge in closed:
+        logger.info(f"Challenge {challenge.id} reached its end date; closed")
+        try:
+            async with async_session() as db:
+                rows, _ = await leaderboard(db, challenge.id)
+            title = f"🏁 *The {challenge.activity_type.value} challenge has ended!* Final standings:"
+            text = await format_leaderboard(rows, challenge.activity_type, title) if rows else f"{title}\nNo submissions were recorded."
+            await client.chat_postMessage(channel=challenge.slack_channel_id, text=text)
+        except Exception as e:
+            logger.error(f"Failed to announce the end of challenge {challenge.id}: {e}")
+    return [c.id for c in closed]
+
+
+async def post_digests() -> int:
+    """Post the current leaderboard to every running challenge's channel."""
+    async with async_session() as db:
+        challenges = (await db.execute(
+            select(Challenge).where(Challenge.is_active == True)
+        )).scalars().all()
+
+    client = AsyncWebClient(token=settings.slack_bot_token)
+    posted = 0
+    for challenge in challenges:
+        try:
+            async with async_session() as db:
+                rows, refreshed_at = await leaderboard(db, challenge.id)
+            if not rows:
+                continue
+            title = f"📣 *{challenge.activity_type.value.title()} challenge standings* (ends {challenge.end_date.date()})"
+            await client.chat_postMessage(
+                channel=challenge.slack_channel_id,
+                text=await format_leaderboard(rows, challenge.activity_type, title, refreshed_at)
+            )
+            posted += 1
+        except Exception as e:
+            logger.error(f"Failed to post digest for challenge {challenge.id}: {e}")
+    return posted
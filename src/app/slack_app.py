@@ -3,9 +3,16 @@ import os
 from .config import settings
 from .utils.logging import setup_logger
 from .workflow_handler import register_workflow_listener
-from .commands import register_commands, CHANNEL_ACTIVITY
+from .replicas import register_dedup_middleware
+from .profiling import register_profiling_middleware
+from .tracing import register_tracing_middleware
+from . import ingest
+from .commands import register_commands
+from .channels import channel_resolver, register_channel_listeners
+from .users import register_user_listeners
+from .rollups import refresh_rollups
 from .models.database import async_session
-from .models.challenge import Result
+from .models.challenge import Result, Challenge
 from datetime import datetime
 from sqlalchemy import select, update
 
@@ -33,58 +40,34 @@ async def custom_error_handler(error, body, logger):
     return {"text": "❌ An error occurred while processing your request. Please try again."}
 
 @bolt_app.event("message")
-async def handle_message_events(body, say, logger):
+async def handle_message_events(event, say, logger):
     """Handle message events from the workflow bot."""
     try:
         # Check if the message is from our workflow bot
-        if body.get("bot_id") != os.environ["WORKFLOW_BOT_ID"]:
+        if event.get("bot_id") != settings.workflow_bot_id:
             return
             
         # Get message details
-        channel = body.get("channel")
-        user = body.get("user")
-        text = body.get("text", "")
-        files = body.get("files", [])
-        ts = body.get("ts")
+        channel = event.get("channel")
+        user = event.get("user")
+        text = event.get("text", "")
+        files = event.get("files", [])
+        ts = event.get("ts")
         
         logger.info(f"Processing workflow message from {user} in {channel}")
         
-        # Check if this is a challenge channel
-        if not any(channel.endswith(f"-{k}") for k in CHANNEL_ACTIVITY.keys()):
+        # Check if this is a challenge channel (cached; no API call once warm)
+        if not (await channel_resolver.resolve(channel)).is_challenge_channel:
             logger.debug(f"Channel {channel} is not a challenge channel")
             return
             
-        # Send acknowledgment
-        await say(
-            text="⏳ Processing your submission...",
-            thread_ts=ts
-        )
-        
-        # Submit to Celery
-        from .tasks import process_submission
-        task = process_submission.delay({
+        await ingest.submit({
             "user": user,
             "text": text,
             "files": files,
             "channel": channel,
             "ts": ts
         })
-        
-        logger.info(f"Submitted task {task.id} to process submission")
-        
-        # Wait for result
-        try:
-            result = task.get(timeout=30)
-            await say(
-                text=result["message"],
-                thread_ts=ts
-            )
-        except Exception as e:
-            logger.error(f"Error processing submission: {e}")
-            await say(
-                text=f"❌ Error processing submission: {str(e)}",
-                thread_ts=ts
-            )
             
     except Exception as e:
         logger.error(f"Error handling message event: {e}")
@@ -128,22 +111,35 @@ async def handle_reaction(body, say, logger):
                 
             user_id = user_match.group(1)
             
-            # Find and invalidate the result
+            # Find and invalidate the result in this channel's running challenge
+            challenge = (await db.execute(
+                select(Challenge).where(
+                    Challenge.slack_channel_id == channel,
+                    Challenge.is_active == True
+                )
+            )).scalars().first()
+            if not challenge:
+                return
+                
             stmt = (
                 select(Result)
                 .where(
+                    Result.challenge_id == challenge.id,
                     Result.user_id == user_id,
                     Result.is_validated == True
                 )
                 .order_by(Result.created_at.desc())
                 .limit(1)
             )
-            result = (await db.execute(stmt)).first()
+            result = (await db.execute(stmt)).scalars().first()
             
             if result:
                 await db.execute(
                     update(Result)
-                    .where(Result.id == result.id)
+                    .where(
+                        Result.challenge_id == challenge.id,
+                        Result.id == result.id
+                    )
                     .values(
                         is_validated=False,
                         validated_by=body["user"],
@@ -152,6 +148,8 @@ async def handle_reaction(body, say, logger):
                     )
                 )
                 await db.commit()
+                # Totals only count validated results; refreshing also bumps the challenge's version
+                await refresh_rollups([challenge.id])
                 
                 # Notify in thread
                 await say(
@@ -163,6 +161,11 @@ async def handle_reaction(body, say, logger):
         logger.error(f"Error handling reaction: {e}")
 
 # Register all handlers
+register_dedup_middleware(bolt_app)
+register_tracing_middleware(bolt_app)
+register_profiling_middleware(bolt_app)
 register_workflow_listener(bolt_app)
+register_channel_listeners(bolt_app)
+register_user_listeners(bolt_app)
 register_commands(bolt_app)
 logger.info("All handlers registered successfully") 
\ No newline at end of file
@@ -1,146 +1,390 @@
 # src/app/tasks.py
 
-from celery import Celery
+from .celery_app import FAST_LANE, celery_app, lane_for
 from .models.database import async_session
 from .models.challenge import Result, Challenge
 from .utils.ocr import VisionService, validate_result
 from .clients.ollama import OllamaClient
-from .metrics import task_total, task_duration, ocr_attempts_total, ocr_duration, ollama_requests_total, ollama_duration
+from .clients.extraction_scheduler import ExtractionScheduler
+from .metrics import task_total, task_duration, ocr_attempts_total, ocr_duration, ollama_requests_total, ollama_duration, deadline_exceeded_total, duplicate_submissions_total, lane_wait, lane_latency, lane_slo_breaches_total
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 import time
 import json
-from sqlalchemy import select # type: ignore
+from sqlalchemy import func, select # type: ignore
+from sqlalchemy.dialects.postgresql import insert as pg_insert # type: ignore
 from .config import settings
 from .utils.logging import setup_logger
+from .utils.aio import run_sync
+from .utils.resilience import CircuitOpenError, Deadline, DeadlineExceeded
+from .utils.phash_index import DuplicateIndex, to_signed
+from .utils.units import UnitError, to_canonical
+from .tracing import tracer
+from .data_versions import challenge_changed
+from .envelope import EnvelopeError, unpack
 
 logger = setup_logger(__name__, level=settings.log_level)
 
-# Initialize Celery
-celery_app = Celery(
-    'fitbot',
-    broker=settings.redis_url,
-    backend=settings.redis_url,
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
-    timezone='UTC',
-    enable_utc=True,
-)
-
 # Initialize services
 vision_service = VisionService()
 ollama_client = OllamaClient()
+extraction_scheduler = ExtractionScheduler(ollama_client)
+duplicate_index = DuplicateIndex()
+
+def download_image(url: str, deadline: Deadline, images: Dict[str, bytes]) -> bytes:
+    """Download a Slack file once per submission, reusing ``images`` as the cache."""
+    if url not in images:
+        deadline.check("image download")
+        with tracer.start_as_current_span("download_image"):
+            images[url] = vision_service.download_image(url, settings.slack_bot_token, deadline=deadline)
+    return images[url]
+
+def screenshot_hash(event: dict, deadline: Deadline, images: Dict[str, bytes]) -> Optional[int]:
+    """Perceptual hash of the submission's first screenshot, or None without one."""
+    url = next((f.get('url_private') for f in event.get('files', []) if f.get('url_private')), None)
+    if not url:
+        return None
+    try:
+        return vision_service.perceptual_hash(download_image(url, deadline, images))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to hash screenshot: {e}")
+        return None
+
+def check_duplicate(event: dict, deadline: Deadline, images: Dict[str, bytes]) -> Tuple[Optional[int], List[dict]]:
+    """Hash the submission's first screenshot and look for near-duplicates in its challenge.
+
+    Returns ``(image_hash, matches)`` where ``matches`` describes the valid
+    earlier results within ``duplicate_hash_distance`` bits, closest first.
+    """
+    image_hash = screenshot_hash(event, deadline, images)
+    if image_hash is None:
+        return None, []
+
+    async def _lookup():
+        async with async_session() as db:
+            challenge = await find_challenge(db, event['channel'])
+            if not challenge:
+                return []
+            matches = await duplicate_index.find(db, challenge.id, image_hash, settings.duplicate_hash_distance)
+            return [dict(item, distance=distance) for distance, item in matches if item['slack_ts'] != event['ts']]
+
+    return image_hash, run_sync(_lookup())
+
+def is_resubmission(match: dict, submission: dict) -> bool:
+    """A similar screenshot reporting the same value on the same day is the same result."""
+    return (
+        match['date'].date() == submission['date'].date()
+        and abs(match['value'] - submission['value']) < 1e-6
+    )
+
+def flag_duplicate(event: dict, match: dict, result_id: Optional[int] = None):
+    """Record and report a screenshot that matches an earlier submission.
+
+    ``result_id`` is the row the submission was stored as; without one the
+    submission was rejected as a resubmission.
+    """
+    same_user = match['user_id'] == event['user']
+    action = 'rejected' if result_id is None else 'flagged'
+    duplicate_submissions_total.labels(same_user=str(same_user).lower(), action=action).inc()
+    if result_id is None:
+        outcome = "rejected as a resubmission of"
+    else:
+        outcome = f"recorded as result #{result_id} (react ❌ on its confirmation to invalidate); resembles"
+    note = (
+        f"⚠️ Possible duplicate screenshot from <@{event['user']}> in <#{event['channel']}>: "
+        f"{outcome} result #{match['id']} by <@{match['user_id']}> (distance {match['distance']})"
+    )
+    logger.warning(note)
+    if not settings.admin_channel:
+        return
+    try:
+        from slack_sdk import WebClient
+        WebClient(token=settings.slack_bot_token).chat_postMessage(channel=settings.admin_channel, text=note)
+    except Exception as e:
+        logger.error(f"Failed to notify admins about duplicate: {e}")
+
+def extract_submission(event: dict, deadline: Deadline, images: Optional[Dict[str, bytes]] = None) -> dict:
+    """Run text/OCR/LLM extraction for a submission event.
+
+    Returns a dict with ``date`` (datetime), ``value`` (float) and ``unit``.
+    Shared by the Celery task and the backfill CLI.
+    """
+    text = event.get('text', '')
+    files = event.get('files', [])
+    images = {} if images is None else images
+
+    # Try to extract metrics from text first
+    metrics = None
+    if text:
+        try:
+            ollama_start = time.time()
+            with tracer.start_as_current_span("extract.text"):
+                metrics = extraction_scheduler.extract(text, deadline=deadline)
+            ollama_duration.observe(time.time() - ollama_start)
+            ollama_requests_total.labels(status='success').inc()
+            logger.debug(f"Extracted metrics from text: {metrics}")
+        except DeadlineExceeded:
+            deadline_exceeded_total.labels(stage='llm').inc()
+            raise
+        except CircuitOpenError:
+            ollama_requests_total.labels(status='error').inc()
+            raise
+        except Exception as e:
+            logger.error(f"Failed to extract metrics from text: {e}")
+            ollama_requests_total.labels(status='error').inc()
+    
+    # If no metrics from text, try OCR on images
+    if not metrics and files:
+        for file in files:
+            try:
+                ocr_start = time.time()
+                image_url = file.get('url_private')
+                if not image_url:
+                    continue
+                # Download and analyze image
+                image_bytes = download_image(image_url, deadline, images)
+                deadline.check("OCR")
+                with tracer.start_as_current_span("ocr"):
+                    ocr_text = vision_service.extract_text(image_bytes, deadline)
+                
+                if ocr_text:
+                    # Try to extract metrics from OCR text
+                    with tracer.start_as_current_span("extract.ocr_text"):
+                        metrics = extraction_scheduler.extract(ocr_text, deadline=deadline)
+                    if metrics:
+                        break
+                        
+                ocr_duration.observe(time.time() - ocr_start)
+                ocr_attempts_total.labels(status='success').inc()
+                
+            except DeadlineExceeded:
+                deadline_exceeded_total.labels(stage='ocr').inc()
+                raise
+            except CircuitOpenError:
+                ocr_attempts_total.labels(status='error').inc()
+                raise
+            except Exception as e:
+                logger.error(f"Failed to process image: {e}")
+                ocr_attempts_total.labels(status='error').inc()
+    
+    if not metrics:
+        raise ValueError("Could not extract metrics from submission")
+        
+    # Validate metrics
+    if not all(k in metrics for k in ['date', 'value', 'unit']):
+        raise ValueError("Missing required metrics: date, value, or unit")
+        
+    try:
+        date = datetime.fromisoformat(metrics['date'])
+        value = float(metrics['value'])
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid date or value format: {e}")
+
+    return {'date': date, 'value': value, 'unit': metrics['unit']}
+
+async def find_challenge(db, channel: str, at: Optional[datetime] = None, lock: bool = False) -> Optional[Challenge]:
+    """Return the active challenge for a channel, or the one running at ``at`` when given.
+
+    ``lock`` holds the row FOR SHARE until the transaction ends, which keeps
+    ``archive_challenge`` from dropping the results partition meanwhile.
+    """
+    if at is None:
+        stmt = select(Challenge).where(
+            Challenge.slack_channel_id == channel,
+            Challenge.is_active == True
+        )
+    else:
+        stmt = (
+            select(Challenge)
+            .where(
+                Challenge.slack_channel_id == channel,
+                Challenge.start_date <= at,
+                Challenge.end_date >= at
+            )
+            .order_by(Challenge.start_date.desc())
+            .limit(1)
+        )
+    if lock:
+        stmt = stmt.with_for_update(read=True)
+    return (await db.execute(stmt)).scalars().first()
+
+async def find_result(db, challenge_id: int, slack_ts: str) -> Optional[Result]:
+    """Return the result recorded for a Slack message, if any."""
+    stmt = select(Result).where(
+        Result.challenge_id == challenge_id,
+        Result.slack_ts == slack_ts
+    )
+    return (await db.execute(stmt)).scalars().first()
+
+async def save_result(submission: dict, event: dict, at: Optional[datetime] = None, replace: bool = False) -> Optional[int]:
+    """Store an extracted submission, keyed by the Slack message ts.
+
+    A message that was already recorded is left alone unless ``replace`` is
+    set, in which case its value, unit and date are overwritten. The write is
+    a single upsert on ``uq_results_challenge_slack_ts``, so a redelivered or
+    concurrently retried message can never add a second row. Returns the id
+    of the row written, or None when an existing one was kept.
+    """
+    files = event.get('files', [])
+    async with async_session() as db:
+        challenge = await find_challenge(db, event['channel'], at=at, lock=True)
+        if not challenge:
+            raise ValueError("No active challenge in this channel")
+        if challenge.archived_at is not None:
+            raise ValueError(f"Challenge {challenge.id} is archived")
+
+        values = {
+            'date': submission['date'],
+            'value': submission['value'],
+            'unit': submission['unit'],
+            # Raises UnitError (nothing is stored) when the unit does not fit the activity
+            'canonical_value': to_canonical(submission['value'], submission['unit'], challenge.activity_type),
+        }
+        stmt = pg_insert(Result).values(
+            user_id=event['user'],
+            slack_ts=event['ts'],
+            image_hash=to_signed(submission['image_hash']) if submission.get('image_hash') is not None else None,
+            screenshot_url=files[0].get('url_private') if files else None,
+            is_validated=True,
+            challenge_id=challenge.id,
+            **values
+        )
+        if replace:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Result.challenge_id, Result.slack_ts],
+                # Keep the stored hash when this pass could not compute one
+                set_=dict(
+                    values,
+                    image_hash=func.coalesce(stmt.excluded.image_hash, Result.image_hash),
+                    updated_at=datetime.utcnow()
+                )
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Result.challenge_id, Result.slack_ts])
+        result_id = (await db.execute(stmt.returning(Result.id))).scalar()
+        await db.commit()
+
+        if result_id is None:
+            logger.info(f"Message {event['ts']} already recorded in challenge {challenge.id}")
+            return None
+        logger.info(f"Saved result for user {event['user']} in challenge {challenge.id}")
+        await challenge_changed(challenge.id)
+        return result_id
+
+@celery_app.task(name="close_expired_challenges", ignore_result=True)
+def close_expired_challenges():
+    """Deactivate challenges past their end date and post the final standings."""
+    from .rollups import close_expired_challenges as _close
+    return run_sync(_close())
+
+@celery_app.task(name="refresh_rollups", ignore_result=True)
+def refresh_rollups():
+    """Rebuild the precomputed totals of every running challenge."""
+    from .rollups import refresh_rollups as _refresh
+    return run_sync(_refresh())
+
+@celery_app.task(name="post_leaderboard_digests", ignore_result=True)
+def post_leaderboard_digests():
+    """Post the scheduled leaderboard digest to every running challenge."""
+    from .rollups import post_digests
+    posted = run_sync(post_digests())
+    logger.info(f"Posted {posted} leaderboard digests")
+    return posted
+
+@celery_app.task(name="archive_ended_challenges", ignore_result=True)
+def archive_ended_challenges():
+    """Move results of ended challenges to Parquet files."""
+    from .archive import archive_ended_challenges as _archive
+    archived = run_sync(_archive())
+    logger.info(f"Archived challenges: {archived}")
+    return archived
+
+def observe_lane(event: dict, lane: str):
+    """Record a finished submission's end-to-end latency against its lane's SLO."""
+    received_at = event.get('received_at')
+    if received_at is None:
+        return
+    elapsed = time.time() - received_at
+    lane_latency.labels(lane=lane).observe(elapsed)
+    slo = settings.fast_lane_slo_seconds if lane == FAST_LANE else settings.heavy_lane_slo_seconds
+    if elapsed > slo:
+        lane_slo_breaches_total.labels(lane=lane).inc()
 
 @celery_app.task(name="process_submission", bind=True, max_retries=3)
 def process_submission(self, event):
     """Process a fitness challenge submission."""
     start_time = time.time()
     task_total.labels(task_name='process_submission', status='started').inc()
+    # Nothing is read from the envelope before its version is checked
+    try:
+        event = unpack(event)
+    except EnvelopeError as e:
+        logger.error(f"Cannot read submission: {e}")
+        task_total.labels(task_name='process_submission', status='error').inc()
+        # Likely published by a newer app; an upgraded worker may pick up the retry
+        try:
+            self.retry(exc=e, countdown=5)
+        except self.MaxRetriesExceededError:
+            pass
+        return {
+            'status': 'error',
+            'message': f"❌ Failed to process submission: {str(e)}"
+        }
+
+    # Budget set by the Bolt handler; carried unchanged across retries
+    deadline = Deadline.from_timestamp(event.get('deadline'))
+    lane = lane_for(event)
+    if self.request.retries == 0 and event.get('received_at'):
+        lane_wait.labels(lane=lane).observe(start_time - event['received_at'])
     
     try:
         logger.info(f"Processing submission: {event}")
         
         # Extract submission details
         user_id = event.get('user')
-        text = event.get('text', '')
-        files = event.get('files', [])
         channel = event.get('channel')
         ts = event.get('ts')
         
         if not all([user_id, channel, ts]):
             raise ValueError("Missing required fields: user, channel, or ts")
             
-        # Try to extract metrics from text first
-        metrics = None
-        if text:
-            try:
-                ollama_start = time.time()
-                metrics = ollama_client.extract_metrics(text)
-                ollama_duration.observe(time.time() - ollama_start)
-                ollama_requests_total.labels(status='success').inc()
-                logger.debug(f"Extracted metrics from text: {metrics}")
-            except Exception as e:
-                logger.error(f"Failed to extract metrics from text: {e}")
-                ollama_requests_total.labels(status='error').inc()
-        
-        # If no metrics from text, try OCR on images
-        if not metrics and files:
-            for file in files:
-                try:
-                    ocr_start = time.time()
-                    image_url = file.get('url_private')
-                    if not image_url:
-                        continue
-                        
-                    # Download and analyze image
-                    image_bytes = vision_service.download_image(image_url, settings.slack_bot_token)
-                    ocr_text = vision_service.analyze(image_bytes)
-                    
-                    if ocr_text:
-                        # Try to extract metrics from OCR text
-                        metrics = ollama_client.extract_metrics(ocr_text)
-                        if metrics:
-                            break
-                            
-                    ocr_duration.observe(time.time() - ocr_start)
-                    ocr_attempts_total.labels(status='success').inc()
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process image: {e}")
-                    ocr_attempts_total.labels(status='error').inc()
-        
-        if not metrics:
-            raise ValueError("Could not extract metrics from submission")
-            
-        # Validate metrics
-        if not all(k in metrics for k in ['date', 'value', 'unit']):
-            raise ValueError("Missing required metrics: date, value, or unit")
+        images = {}
+        with tracer.start_as_current_span("check_duplicate"):
+            image_hash, matches = check_duplicate(event, deadline, images)
             
-        try:
-            date = datetime.fromisoformat(metrics['date'])
-            value = float(metrics['value'])
-        except (ValueError, TypeError) as e:
-            raise ValueError(f"Invalid date or value format: {e}")
+        submission = extract_submission(event, deadline, images)
+        submission['image_hash'] = image_hash
+        date, value, unit = submission['date'], submission['value'], submission['unit']
+
+        # Only an exact resubmission is turned away; other look-alikes are stored and left to admins
+        resubmitted = next((m for m in matches if is_resubmission(m, submission)), None)
+        if resubmitted:
+            flag_duplicate(event, resubmitted)
+            task_total.labels(task_name='process_submission', status='duplicate').inc()
+            observe_lane(event, lane)
+            return {
+                'status': 'duplicate',
+                'message': f"❌ <@{user_id}>, this screenshot matches an earlier submission. An admin will take a look."
+            }
             
         # Store submission in database
-        import asyncio
-        loop = asyncio.get_event_loop()
-        
-        async def _save():
-            async with async_session() as db:
-                # Get active challenge
-                stmt = select(Challenge).where(
-                    Challenge.slack_channel_id == channel,
-                    Challenge.is_active == True
-                )
-                challenge = (await db.execute(stmt)).first()
-                
-                if not challenge:
-                    raise ValueError("No active challenge in this channel")
-                    
-                # Create result
-                result = Result(
-                    user_id=user_id,
-                    date=date,
-                    value=value,
-                    unit=metrics['unit'],
-                    screenshot_url=files[0].get('url_private') if files else None,
-                    is_validated=True,
-                    challenge_id=challenge.id
-                )
-                
-                db.add(result)
-                await db.commit()
-                logger.info(f"Saved result for user {user_id} in challenge {challenge.id}")
-                
-        loop.run_until_complete(_save())
+        with tracer.start_as_current_span("save_result"):
+            result_id = run_sync(save_result(submission, event))
+        if matches and result_id is not None:
+            flag_duplicate(event, matches[0], result_id)
         
         task_total.labels(task_name='process_submission', status='success').inc()
         task_duration.labels(task_name='process_submission').observe(time.time() - start_time)
+        observe_lane(event, lane)
         
+        message = f"✅ <@{user_id}>, your {value}{unit} on {date.strftime('%Y-%m-%d')} has been recorded!"
+        if matches:
+            message += " The screenshot resembles an earlier one, so an admin will double-check it."
         return {
             'status': 'success',
-            'message': f"✅ <@{user_id}>, your {value}{metrics['unit']} on {date.strftime('%Y-%m-%d')} has been recorded!"
+            'message': message
         }
         
     except Exception as e:
@@ -148,13 +392,14 @@ def process_submission(self, event):
         task_total.labels(task_name='process_submission', status='error').inc()
         task_duration.labels(task_name='process_submission').observe(time.time() - start_time)
         
-        # Retry on certain errors
-        if isinstance(e, (ValueError, TypeError)):
+        # Retry on certain errors, but only while the submission's budget can cover another attempt
+        if isinstance(e, (ValueError, TypeError)) and not isinstance(e, UnitError) and deadline.remaining() > 5:
             try:
                 self.retry(exc=e, countdown=5)
             except self.MaxRetriesExceededError:
                 pass
                 
+        observe_lane(event, lane)
         return {
             'status': 'error',
             'message': f"❌ Failed to process submission: {str(e)}"
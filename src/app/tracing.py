@@ -0,0 +1,110 @@
+# src/app/tracing.py
+"""
+OpenTelemetry tracing from Slack event to database commit.
+
+Every Bolt request opens a span. Accepted submissions carry their trace
+context in the submission dict (``trace``), so it survives forwarding to the
+owning replica and the in-process publish queue, and Celery's instrumentation
+copies it into the task headers. On the worker, ``process_submission``
+continues the trace with a span per stage, and requests/aiohttp/SQLAlchemy
+instrumentation adds spans for Slack file downloads, Ollama and Postgres.
+
+``TRACING_EXPORTER`` picks where spans go: ``file`` (JSON lines in
+``TRACING_FILE``), ``otlp`` (``OTLP_ENDPOINT``), ``console``, or ``none``
+(the default; spans are then no-ops).
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Optional
+
+from opentelemetry import context, propagate, trace # type: ignore
+
+from .config import settings
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+tracer = trace.get_tracer("fitbot")
+
+_configured = False
+
+
+def setup_tracing(service_name: str):
+    """Install the tracer provider and library instrumentation (once per process)."""
+    global _configured
+    if _configured or settings.tracing_exporter == "none":
+        return
+    _configured = True
+
+    from opentelemetry.sdk.resources import Resource # type: ignore
+    from opentelemetry.sdk.trace import TracerProvider # type: ignore
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter # type: ignore
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased # type: ignore
+
+    if settings.tracing_exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter # type: ignore
+        exporter = OTLPSpanExporter(endpoint=settings.otlp_endpoint)
+    elif settings.tracing_exporter == "file":
+        os.makedirs(os.path.dirname(settings.tracing_file) or ".", exist_ok=True)
+        exporter = ConsoleSpanExporter(
+            out=open(settings.tracing_file, "a", buffering=1),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep
+        )
+    else:
+        exporter = ConsoleSpanExporter()
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name, "service.instance.id": settings.replica_id}),
+        # Sample whole traces: the worker follows the app's decision
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_rate)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    from opentelemetry.instrumentation.aiohttp_client import AioHttpClientInstrumentor # type: ignore
+    from opentelemetry.instrumentation.celery import CeleryInstrumentor # type: ignore
+    from opentelemetry.instrumentation.requests import RequestsInstrumentor # type: ignore
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor # type: ignore
+    from .models.database import engine
+
+    RequestsInstrumentor().instrument()
+    AioHttpClientInstrumentor().instrument()
+    SQLAlchemyInstrumentor().instrument(engine=engine.sync_engine)
+    CeleryInstrumentor().instrument()
+    logger.info(f"Tracing {service_name} to {settings.tracing_exporter}")
+
+
+def inject() -> dict:
+    """The current trace context as a W3C ``traceparent`` carrier."""
+    carrier: dict = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+@contextmanager
+def attached(carrier: Optional[dict]):
+    """Make ``carrier``'s trace context current, e.g. on another thread."""
+    token = context.attach(propagate.extract(carrier or {}))
+    try:
+        yield
+    finally:
+        context.detach(token)
+
+
+def register_tracing_middleware(app):
+    """Open a span for every Bolt request."""
+
+    @app.middleware
+    async def trace_requests(body, next):
+        event = body.get("event") or {}
+        kind = body.get("command") or event.get("type") or body.get("type") or "request"
+        with tracer.start_as_current_span(f"bolt {kind}", kind=trace.SpanKind.SERVER) as span:
+            # Some events (renames etc.) carry objects here rather than IDs
+            for attribute, value in (
+                ("slack.channel", event.get("channel") or body.get("channel_id")),
+                ("slack.user", event.get("user") or body.get("user_id")),
+            ):
+                if isinstance(value, str):
+                    span.set_attribute(attribute, value)
+            return await next()
@@ -0,0 +1,132 @@
+# src/app/users.py
+"""
+Directory of workspace members' display names.
+
+The whole directory is bulk-loaded with paginated ``users_list`` into a Redis
+hash shared by all replicas, then kept current from ``user_change`` and
+``team_join`` events, so leaderboards and exports can show names without a
+``users_info`` call per row. Requires the ``users:read`` scope.
+
+Events reach a single replica, so nothing is cached in process: every lookup
+is one HMGET against the shared hash, and an edit applied by any replica is
+seen by all of them at once.
+"""
+
+import asyncio
+from typing import Dict, Iterable, Optional
+
+from slack_sdk.web.async_client import AsyncWebClient # type: ignore
+
+from .clients.redis_client import get_async_redis
+from .config import settings
+from .utils.logging import setup_logger
+
+logger = setup_logger(__name__, level=settings.log_level)
+
+USERS_KEY = "fitbot:users"
+LOAD_LOCK_KEY = "fitbot:users:loading"
+
+
+def display_name(user: dict) -> str:
+    profile = user.get("profile") or {}
+    return (
+        profile.get("display_name")
+        or profile.get("real_name")
+        or user.get("real_name")
+        or user.get("name")
+        or user["id"]
+    )
+
+
+class UserDirectory:
+    """User ID -> display name, backed by a Redis hash with a TTL."""
+
+    def __init__(self, client: AsyncWebClient = None, ttl: int = None):
+        self.client = client or AsyncWebClient(token=settings.slack_bot_token)
+        self.ttl = ttl or settings.user_cache_ttl
+        self._lock = asyncio.Lock()
+
+    async def load(self) -> int:
+        """Page through ``users_list`` and atomically replace the Redis hash."""
+        r = get_async_redis()
+        # One replica loads at a time; the rest keep serving the previous copy
+        if not await r.set(LOAD_LOCK_KEY, settings.replica_id, nx=True, ex=120):
+            return 0
+
+        try:
+            names: Dict[str, str] = {}
+            cursor = None
+            while True:
+                response = await self.client.users_list(limit=200, cursor=cursor)
+                for user in response["members"]:
+                    if not user.get("deleted"):
+                        names[user["id"]] = display_name(user)
+                cursor = (response.get("response_metadata") or {}).get("next_cursor")
+                if not cursor:
+                    break
+
+            tmp = f"{USERS_KEY}:tmp"
+            async with r.pipeline(transaction=True) as pipe:
+                pipe.delete(tmp)
+                if names:
+                    pipe.hset(tmp, mapping=names)
+                    pipe.expire(tmp, self.ttl)
+                    pipe.rename(tmp, USERS_KEY)
+                await pipe.execute()
+            logger.info(f"Loaded {len(names)} users into the directory")
+            return len(names)
+        finally:
+            await r.delete(LOAD_LOCK_KEY)
+
+    async def names(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        """Display names for ``user_ids``; unknown IDs are left out."""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+
+        r = get_async_redis()
+        try:
+            async with r.pipeline(transaction=False) as pipe:
+                pipe.exists(USERS_KEY)
+                pipe.hmget(USERS_KEY, user_ids)
+                loaded, values = await pipe.execute()
+            if not loaded:
+                async with self._lock:
+                    if not await r.exists(USERS_KEY):
+                        await self.load()
+                values = await r.hmget(USERS_KEY, user_ids)
+        except Exception as e:
+            logger.error(f"User directory lookup failed: {e}")
+            return {}
+        return {uid: name for uid, name in zip(user_ids, values) if name}
+
+    @staticmethod
+    def label(user_id: str, names: Dict[str, str]) -> str:
+        """The user's name if known, else a mention Slack renders itself."""
+        return names.get(user_id, f"<@{user_id}>")
+
+    async def update(self, user: dict):
+        """Apply a ``user_change`` / ``team_join`` event."""
+        r = get_async_redis()
+        name: Optional[str] = None if user.get("deleted") else display_name(user)
+        if name is None:
+            await r.hdel(USERS_KEY, user["id"])
+            return
+        # Only patch a loaded directory; an absent hash will be bulk-loaded on next use
+        if await r.exists(USERS_KEY):
+            await r.hset(USERS_KEY, user["id"], name)
+
+
+user_directory = UserDirectory()
+
+
+def register_user_listeners(app):
+    """Keep the directory current without reloading it."""
+
+    @app.event("user_change")
+    async def handle_user_change(event):
+        await user_directory.update(event["user"])
+
+    @app.event("team_join")
+    async def handle_team_join(event):
+        await user_directory.update(event["user"])
@@ -0,0 +1,30 @@
+import asyncio
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide background event loop, starting it on first use."""
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="fitbot-aio", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Run a coroutine from synchronous code (e.g. a Celery task).
+
+    All coroutines share one event loop running in a daemon thread, so the
+    async engine's connection pool stays bound to a single loop no matter
+    which worker thread calls in.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return future.result(timeout=timeout)
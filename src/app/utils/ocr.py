@@ -4,12 +4,17 @@ import io
 import requests
 from typing import Optional, Tuple
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from ..config import settings
 from .logging import setup_logger
+from .resilience import CircuitBreaker, Deadline, stop_before_deadline
+from .ocr_engine import create_engine
 
 logger = setup_logger(__name__)
 
+slack_files_breaker = CircuitBreaker("slack_files")
+retry_wait = wait_exponential(multiplier=1, min=4, max=10)
+
 def preprocess_image(image: Image.Image) -> Image.Image:
     """Apply preprocessing to improve OCR accuracy."""
     # Convert to grayscale
@@ -68,25 +73,29 @@ def validate_result(claimed_value: float, ocr_value: float, tolerance: float = N
 
 
 class VisionService:
-    def __init__(self):
+    def __init__(self, engine=None):
         self.tolerance = settings.ocr_validation_tolerance
-        logger.info(f"Initialized VisionService with tolerance {self.tolerance * 100}%")
+        self.engine = engine or create_engine()
+        logger.info(f"Initialized VisionService with tolerance {self.tolerance * 100}%, OCR engine {self.engine.name}")
 
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        stop=stop_after_attempt(3) | stop_before_deadline(retry_wait),
+        wait=retry_wait,
+        retry=retry_if_exception_type(requests.exceptions.RequestException),
         reraise=True
     )
-    def download_image(self, url: str, token: str) -> bytes:
+    def download_image(self, url: str, token: str, deadline: Optional[Deadline] = None) -> bytes:
         """Download image from Slack with retry logic."""
+        timeout = deadline.timeout(3, 10) if deadline else (3, 10)
         try:
             logger.debug(f"Downloading image from {url}")
-            response = requests.get(
-                url,
-                headers={"Authorization": f"Bearer {token}"},
-                timeout=(3, 10)
-            )
-            response.raise_for_status()
+            with slack_files_breaker.guard():
+                response = requests.get(
+                    url,
+                    headers={"Authorization": f"Bearer {token}"},
+                    timeout=timeout
+                )
+                response.raise_for_status()
             logger.debug("Image downloaded successfully")
             return response.content
         except requests.exceptions.RequestException as e:
@@ -123,18 +132,37 @@ class VisionService:
             logger.error(f"Error in image preprocessing: {e}")
             raise
 
+    def perceptual_hash(self, image_bytes: bytes, hash_size: int = 8) -> int:
+        """Compute a 64-bit difference hash (dHash) of an image.
+
+        Each bit says whether a pixel is brighter than its right neighbour on a
+        tiny grayscale thumbnail, so crops, rescales and recompression barely
+        move the hash while different screenshots land far apart.
+        """
+        image = Image.open(io.BytesIO(image_bytes)).convert('L')
+        image = image.resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = list(image.getdata())
+        value = 0
+        for row in range(hash_size):
+            offset = row * (hash_size + 1)
+            for col in range(hash_size):
+                value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+        return value
+
+    def extract_text(self, image_bytes: bytes, deadline: Optional[Deadline] = None) -> str:
+        """Run OCR on an image and return the raw text."""
+        image = Image.open(io.BytesIO(image_bytes))
+        processed = self.preprocess_image(image)
+        text = self.engine.image_to_text(processed, deadline)
+        logger.debug(f"OCR extracted text: {text}")
+        return text
+
     def analyze(self, image_bytes: bytes, claimed_value: float = None) -> Optional[float]:
         """Analyze image and extract numeric value."""
         try:
             logger.debug("Starting OCR analysis")
             
-            # Load and preprocess image
-            image = Image.open(io.BytesIO(image_bytes))
-            processed = self.preprocess_image(image)
-            
-            # Extract text
-            text = pytesseract.image_to_string(processed)
-            logger.debug(f"OCR extracted text: {text}")
+            text = self.extract_text(image_bytes)
             
             # Parse numeric value
             import re
@@ -0,0 +1,142 @@
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+import pytesseract
+from PIL import Image
+
+from ..config import settings
+from ..metrics import ocr_fallback_total
+from .logging import setup_logger
+from .resilience import Deadline, DeadlineExceeded
+
+try:
+    import tesserocr # type: ignore
+except ImportError:  # only the worker image installs it (requirements-worker.txt)
+    tesserocr = None
+
+logger = setup_logger(__name__)
+
+
+class PytesseractEngine:
+    """Runs the ``tesseract`` binary per call: temp file, fork, reload language data."""
+    name = "pytesseract"
+
+    def image_to_text(self, image: Image.Image, deadline: Optional[Deadline] = None) -> str:
+        return pytesseract.image_to_string(image, lang=settings.ocr_lang)
+
+
+class TesserocrEngine:
+    """Pool of resident tesseract API handles, fed PIL images in memory.
+
+    A handle keeps its language data loaded between calls, so OCR costs only
+    recognition. Handles are not thread-safe, so each call borrows one;
+    ``size`` bounds how many exist (and how many calls run at once, since
+    tesserocr releases the GIL while recognising). A call that finds none
+    idle and the pool full waits for one to be returned or replaced, at most
+    until its deadline.
+    """
+    name = "tesserocr"
+
+    def __init__(self, size: int = None, lang: str = None, path: Optional[str] = None):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.size = size or settings.ocr_pool_size
+        self.lang = lang or settings.ocr_lang
+        self.path = path or settings.tessdata_path
+        self._idle: List = []  # LIFO: the most recently used handle is the warmest
+        self._created = 0
+        self._cond = threading.Condition()
+
+    def _create(self):
+        kwargs = {"lang": self.lang}
+        if self.path:
+            kwargs["path"] = self.path
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        logger.info(f"Started resident tesseract handle {self._created}/{self.size} ({self.lang})")
+        return api
+
+    def _acquire(self, deadline: Optional[Deadline] = None):
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                timeout = deadline.remaining() if deadline else None
+                if timeout is not None and timeout <= 0:
+                    raise DeadlineExceeded("Time budget exhausted waiting for an OCR handle")
+                self._cond.wait(timeout)
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._create()
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, api):
+        """Return ``api`` to the pool, or with None give up its slot; either way wake a waiter."""
+        with self._cond:
+            if api is None:
+                self._created -= 1
+            else:
+                self._idle.append(api)
+            self._cond.notify()
+
+    @contextmanager
+    def handle(self, deadline: Optional[Deadline] = None):
+        api = self._acquire(deadline)
+        try:
+            yield api
+        except Exception:
+            # A handle that failed mid-call may be in a bad state; replace it
+            try:
+                api.End()
+            finally:
+                self._release(None)
+            raise
+        else:
+            self._release(api)
+
+    def image_to_text(self, image: Image.Image, deadline: Optional[Deadline] = None) -> str:
+        with self.handle(deadline) as api:
+            api.SetImage(image)
+            try:
+                return api.GetUTF8Text()
+            finally:
+                api.Clear()
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                self._idle.pop().End()
+                self._created -= 1
+
+
+class FallbackEngine:
+    """Use ``primary``; fall back to ``fallback`` for any call it fails."""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    def image_to_text(self, image: Image.Image, deadline: Optional[Deadline] = None) -> str:
+        try:
+            return self.primary.image_to_text(image, deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"{self.primary.name} failed, using {self.fallback.name}: {e}")
+            ocr_fallback_total.labels(engine=self.primary.name).inc()
+            return self.fallback.image_to_text(image, deadline)
+
+
+def create_engine(kind: str = None):
+    """``auto`` picks the resident engine when tesserocr is installed."""
+    kind = kind or settings.ocr_engine
+    if kind != "pytesseract" and tesserocr is None:
+        if kind == "tesserocr":
+            logger.warning("OCR_ENGINE=tesserocr but tesserocr is not installed; using pytesseract")
+        kind = "pytesseract"
+    if kind == "pytesseract":
+        return PytesseractEngine()
+    return FallbackEngine(TesserocrEngine(), PytesseractEngine())
@@ -1,5 +1,6 @@
 import re
 from typing import Tuple, Optional
+from .units import convert
 
 def parse_metric(text: str) -> Tuple[float, str]:
     """Extract numeric value and unit from text."""
@@ -28,18 +29,7 @@ def parse_metric(text: str) -> Tuple[float, str]:
     raise ValueError("Could not extract metric from text")
 
 def convert_units(value: float, from_unit: str, to_unit: str) -> float:
-    """Convert between different units."""
+    """Convert between different units (the table lives in ``utils/units.py``)."""
     if from_unit == to_unit:
         return value
-        
-    conversions = {
-        ('m', 'km'): lambda x: x / 1000,
-        ('km', 'm'): lambda x: x * 1000,
-        ('calories', 'kcal'): lambda x: x / 1000,
-        ('kcal', 'calories'): lambda x: x * 1000,
-    }
-    
-    if (from_unit, to_unit) in conversions:
-        return conversions[(from_unit, to_unit)](value)
-        
-    raise ValueError(f"Cannot convert from {from_unit} to {to_unit}") 
\ No newline at end of file
+    return convert(value, from_unit, to_unit)
@@ -0,0 +1,140 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import select # type: ignore
+from ..models.challenge import Result
+from .logging import setup_logger
+
+logger = setup_logger(__name__)
+
+_SIGN_BIT = 1 << 63
+
+# Longer than any results transaction and any clock skew between workers
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def to_signed(value: int) -> int:
+    """Map an unsigned 64-bit hash onto Postgres' signed BIGINT."""
+    return value - (1 << 64) if value >= _SIGN_BIT else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes under Hamming distance.
+
+    Search only descends into children whose edge distance lies within
+    ``max_distance`` of the query's distance to the node, which prunes
+    nearly the whole tree for small thresholds.
+    """
+
+    def __init__(self):
+        self.root: Optional[Tuple[int, Any, Dict[int, tuple]]] = None
+        self.size = 0
+
+    def add(self, value: int, item: Any):
+        node = (value, item, {})
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """Return ``(distance, item)`` pairs within ``max_distance``, closest first."""
+        matches = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                matches.append((distance, item))
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(matches, key=lambda m: m[0])
+
+
+class DuplicateIndex:
+    """Per-challenge BK-trees of screenshot hashes, filled lazily from the results table.
+
+    Each tree remembers the newest ``updated_at`` it has seen and a refresh
+    re-reads rows written since, minus ``REFRESH_OVERLAP``. Ids come from a
+    sequence and are not committed in order, so a high-water id would skip a
+    row whose transaction finished after a later one; the overlap catches
+    those, and rows already in the tree are skipped by (id, hash), which
+    also picks up a hash changed by reprocessing.
+
+    A BK-tree cannot drop nodes, so ``_live`` maps each result id to the hash
+    it currently has while it counts as a valid submission. Nodes for a
+    replaced hash or an invalidated result stay in the tree but are filtered
+    out of every search.
+    """
+
+    def __init__(self):
+        self._trees: Dict[int, BKTree] = {}
+        self._seen: Dict[int, Set[Tuple[int, int]]] = {}
+        self._live: Dict[int, Dict[int, int]] = {}
+        self._watermarks: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+
+    async def refresh(self, db, challenge_id: int):
+        since = self._watermarks.get(challenge_id)
+        stmt = select(
+            Result.id, Result.image_hash, Result.user_id, Result.slack_ts, Result.value, Result.date,
+            Result.is_validated, Result.updated_at
+        ).where(
+            Result.challenge_id == challenge_id,
+            Result.image_hash.isnot(None)
+        )
+        if since is not None:
+            stmt = stmt.where(Result.updated_at >= since - REFRESH_OVERLAP)
+        rows = (await db.execute(stmt.order_by(Result.id))).all()
+        if not rows:
+            return
+        with self._lock:
+            tree = self._trees.setdefault(challenge_id, BKTree())
+            seen = self._seen.setdefault(challenge_id, set())
+            live = self._live.setdefault(challenge_id, {})
+            for row in rows:
+                if not row.is_validated:
+                    live.pop(row.id, None)
+                    continue
+                live[row.id] = row.image_hash
+                if (row.id, row.image_hash) in seen:
+                    continue
+                seen.add((row.id, row.image_hash))
+                tree.add(to_unsigned(row.image_hash), {
+                    "id": row.id, "image_hash": row.image_hash, "user_id": row.user_id,
+                    "slack_ts": row.slack_ts, "value": row.value, "date": row.date,
+                })
+            newest = max(row.updated_at for row in rows)
+            if since is None or newest > since:
+                self._watermarks[challenge_id] = newest
+        logger.debug(f"Hash index for challenge {challenge_id} now holds {tree.size} screenshots")
+
+    async def find(self, db, challenge_id: int, image_hash: int, max_distance: int) -> List[Tuple[int, dict]]:
+        """Refresh the challenge's tree and return near-duplicates of ``image_hash``."""
+        await self.refresh(db, challenge_id)
+        with self._lock:
+            tree = self._trees.get(challenge_id)
+            if not tree:
+                return []
+            live = self._live.get(challenge_id, {})
+            return [
+                (distance, item) for distance, item in tree.search(image_hash, max_distance)
+                if live.get(item["id"]) == item["image_hash"]
+            ]
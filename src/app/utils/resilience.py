@@ -0,0 +1,162 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, Tuple
+import requests
+from ..config import settings
+from ..metrics import circuit_breaker_state, circuit_breaker_rejections_total
+from .logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a submission's time budget runs out."""
+
+
+class Deadline:
+    """Absolute time budget for one submission.
+
+    Stored as a wall-clock timestamp so it survives the trip from the Bolt
+    handler through the broker to whichever worker picks the task up.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float = None) -> "Deadline":
+        if seconds is None:
+            seconds = settings.submission_budget_seconds
+        return cls(time.time() + seconds)
+
+    @classmethod
+    def from_timestamp(cls, expires_at: Optional[float]) -> "Deadline":
+        """Rebuild a deadline from an event field, starting a fresh budget if missing."""
+        if expires_at is None:
+            return cls.after()
+        return cls(float(expires_at))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str):
+        """Raise DeadlineExceeded if the budget is spent before ``stage`` starts."""
+        if self.expired:
+            raise DeadlineExceeded(f"Time budget exhausted before {stage}")
+
+    def timeout(self, connect: float, read: float) -> Tuple[float, float]:
+        """Cap a requests (connect, read) timeout to the remaining budget."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Time budget exhausted")
+        return min(connect, remaining), min(read, remaining)
+
+
+def stop_before_deadline(wait: Callable = None, min_remaining: float = 4):
+    """Tenacity stop condition: give up unless the call's ``deadline`` kwarg covers the
+    next ``wait`` plus ``min_remaining`` seconds for the attempt itself.
+
+    Tenacity checks the stop condition before computing the wait, so the wait
+    strategy is passed in and evaluated here; otherwise a retry could start
+    after sleeping past the deadline.
+    """
+    def _stop(retry_state) -> bool:
+        deadline = retry_state.kwargs.get("deadline")
+        if deadline is None:
+            return False
+        upcoming = wait(retry_state) if wait is not None else 0
+        return deadline.remaining() < upcoming + min_remaining
+    return _stop
+
+
+def is_dependency_failure(exc: Exception) -> bool:
+    """Errors that say the remote side is unhealthy, as opposed to a bad request."""
+    if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return False
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast on a dependency after repeated failures.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    rejects calls for ``reset_timeout`` seconds, then lets a single probe
+    through (half-open); the probe's outcome closes or re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = None,
+        reset_timeout: float = None,
+        is_failure: Callable[[Exception], bool] = is_dependency_failure,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.circuit_failure_threshold
+        self.reset_timeout = reset_timeout or settings.circuit_reset_timeout
+        self.is_failure = is_failure
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        circuit_breaker_state.labels(name=name).set(self.CLOSED)
+
+    def _set_state(self, state: int):
+        if state != self.state:
+            logger.warning(f"Circuit breaker {self.name}: {self.state} -> {state}")
+        self.state = state
+        circuit_breaker_state.labels(name=self.name).set(state)
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+                self._probing = False
+            if self.state == self.OPEN or (self.state == self.HALF_OPEN and self._probing):
+                circuit_breaker_rejections_total.labels(name=self.name).inc()
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+            if self.state == self.HALF_OPEN:
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    @contextmanager
+    def guard(self):
+        """Wrap one call to the dependency."""
+        self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        else:
+            self.record_success()
@@ -0,0 +1,78 @@
+"""Unit normalization for recorded results.
+
+Every unit (and its aliases) is registered with a dimension and its factor to
+that dimension's base unit. Each activity has a canonical unit, and results
+store their value converted to it in ``Result.canonical_value``, so totals
+are a plain SUM.
+
+Calories are counted as food calories (kcal), as fitness apps report them.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from ..models.challenge import ActivityType
+
+
+class UnitError(ValueError):
+    """The unit is unknown or cannot be converted to the activity's unit."""
+
+
+@dataclass(frozen=True)
+class Unit:
+    name: str
+    dimension: str
+    factor: float  # multiply by this to get the dimension's base unit
+
+
+UNITS: Dict[str, Unit] = {}
+
+
+def register_unit(name: str, dimension: str, factor: float, aliases: Tuple[str, ...] = ()):
+    unit = Unit(name, dimension, factor)
+    for alias in (name,) + tuple(aliases):
+        UNITS[alias] = unit
+
+
+# Distance (base: metre)
+register_unit("m", "distance", 1.0, ("meter", "meters", "metre", "metres", "mtr"))
+register_unit("km", "distance", 1000.0, ("kms", "kilometer", "kilometers", "kilometre", "kilometres"))
+register_unit("mi", "distance", 1609.344, ("mile", "miles"))
+register_unit("yd", "distance", 0.9144, ("yds", "yard", "yards"))
+# Energy (base: kcal)
+register_unit("kcal", "energy", 1.0, ("cal", "cals", "calorie", "calories", "kcals", "kilocalorie", "kilocalories"))
+register_unit("kj", "energy", 1 / 4.184, ("kilojoule", "kilojoules"))
+
+CANONICAL_UNITS: Dict[ActivityType, str] = {
+    ActivityType.WALKING:  "km",
+    ActivityType.RUNNING:  "km",
+    ActivityType.CYCLING:  "km",
+    ActivityType.SWIMMING: "m",
+    ActivityType.CALORIES: "kcal",
+}
+
+
+def normalize_unit(unit: str) -> str:
+    """``" Kilometres. "`` -> ``"kilometres"``."""
+    return re.sub(r"\s+", " ", unit.strip().lower()).rstrip(".")
+
+
+def lookup(unit: str) -> Unit:
+    try:
+        return UNITS[normalize_unit(unit)]
+    except KeyError:
+        raise UnitError(f"Unknown unit: {unit!r}")
+
+
+def convert(value: float, from_unit: str, to_unit: str) -> float:
+    source, target = lookup(from_unit), lookup(to_unit)
+    if source.dimension != target.dimension:
+        raise UnitError(f"Cannot convert from {from_unit} to {to_unit}")
+    return value * source.factor / target.factor
+
+
+def to_canonical(value: float, unit: str, activity: ActivityType) -> float:
+    """``value`` in ``unit`` expressed in the activity's canonical unit."""
+    return convert(value, unit, CANONICAL_UNITS[activity])
+
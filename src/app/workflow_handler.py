@@ -2,11 +2,11 @@
 
 from slack_bolt.async_app import AsyncApp # type: ignore
 from .config import settings
-from .tasks import process_submission
+from . import ingest
+from .channels import channel_resolver
 from .utils.logging import setup_logger
 from .metrics import task_total, task_duration
 import time
-from celery.exceptions import TimeoutError # type: ignore
 
 logger = setup_logger(__name__, level=settings.log_level)
 
@@ -32,44 +32,22 @@ def register_workflow_listener(app: AsyncApp):
                 logger.warning("Missing required message fields")
                 return
                 
+            if not (await channel_resolver.resolve(channel)).is_challenge_channel:
+                return
+                
             logger.info(f"New submission from {user} in {channel}")
 
-            # Send acknowledgment
-            await say(text="⏳ Processing...", thread_ts=ts)
-            
-            # Submit task to Celery
-            task = process_submission.delay({
+            # Hand off; the owning replica acknowledges, enqueues and replies
+            accepted = await ingest.submit({
                 "user": user,
                 "text": message.get("text", ""),
                 "files": message.get("files", []),
                 "channel": channel,
                 "ts": ts
             })
-            logger.info(f"Submitted task {task.id} to Celery")
             
-            try:
-                # Wait for task result with timeout
-                res = task.get(timeout=30)
-                await say(text=res["message"], thread_ts=ts)
-                
-                task_total.labels(task_name='workflow_message', status='success').inc()
-                task_duration.labels(task_name='workflow_message').observe(time.time() - start_time)
-                
-            except TimeoutError:
-                logger.error(f"Task {task.id} timed out after 30 seconds")
-                await say(
-                    text="⚠️ Processing is taking longer than expected. We'll notify you when it's done.",
-                    thread_ts=ts
-                )
-                task_total.labels(task_name='workflow_message', status='timeout').inc()
-                
-            except Exception as e:
-                logger.error(f"Error processing task {task.id}: {e}")
-                await say(
-                    text=f"❌ Error processing submission: {str(e)}",
-                    thread_ts=ts
-                )
-                task_total.labels(task_name='workflow_message', status='error').inc()
+            task_total.labels(task_name='workflow_message', status='success' if accepted else 'duplicate').inc()
+            task_duration.labels(task_name='workflow_message').observe(time.time() - start_time)
                 
         except Exception as e:
             logger.error(f"Error handling workflow message: {e}")
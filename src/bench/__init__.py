@@ -0,0 +1,3 @@
+"""
+Benchmarks for FitBot's extraction pipeline.
+"""
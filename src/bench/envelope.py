@@ -0,0 +1,112 @@
+"""
+Task payload size and serialization CPU benchmark.
+
+Compares what a queued ``process_submission`` argument costs as the full
+Slack event in JSON (as it was published before envelopes) with the slim
+envelope in JSON and in the ``fitbot`` msgpack serializer, for submissions
+with 0 to N screenshots. Sizes are of the serialized argument; the broker
+adds the same Celery headers to each.
+
+    python -m bench.envelope
+    python -m bench.envelope --files 3 --repeat 20000 --output envelope.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+from app.envelope import dumps, loads, pack, task_args
+
+
+def slack_file(i: int) -> dict:
+    """A screenshot as Slack describes it in a message event."""
+    base = f"https://files.slack.com/files-pri/T0ABCDEF-F0{i:07d}"
+    thumbs = {}
+    for size in (64, 80, 160, 360, 480, 720, 800, 960, 1024):
+        thumbs[f"thumb_{size}"] = f"{base}/screenshot_{i}_{size}.png"
+        thumbs[f"thumb_{size}_w"] = size
+        thumbs[f"thumb_{size}_h"] = size * 2
+    return {
+        "id": f"F0{i:07d}", "created": 1747558800, "timestamp": 1747558800,
+        "name": f"screenshot_{i}.png", "title": f"Screenshot {i}", "mimetype": "image/png",
+        "filetype": "png", "pretty_type": "PNG", "user": "U0123ABCD", "user_team": "T0ABCDEF",
+        "editable": False, "size": 482133, "mode": "hosted", "is_external": False,
+        "external_type": "", "is_public": False, "public_url_shared": False,
+        "display_as_bot": False, "username": "", "url_private": f"{base}/screenshot_{i}.png",
+        "url_private_download": f"{base}/download/screenshot_{i}.png",
+        "media_display_type": "unknown", "original_w": 1170, "original_h": 2532,
+        "thumb_tiny": "AwAwABbS" * 40,
+        "permalink": f"https://example.slack.com/files/U0123ABCD/F0{i:07d}/screenshot_{i}.png",
+        "permalink_public": f"https://slack-files.com/T0ABCDEF-F0{i:07d}-0a1b2c3d4e",
+        "is_starred": False, "has_rich_preview": False, "file_access": "visible",
+        **thumbs,
+    }
+
+
+def slack_event(files: int) -> dict:
+    return {
+        "user": "U0123ABCD",
+        "text": "Morning run: 7.42 km in 38:10" if not files else "",
+        "files": [slack_file(i) for i in range(files)],
+        "channel": "C08SM8NESGJ",
+        "ts": "1747558800.123456",
+        "received_at": 1747558800.2,
+        "deadline": 1747558825.2,
+        "trace": {"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"},
+        "task_id": "0f8fad5b-d9cb-469f-a165-70867728950e",
+    }
+
+
+def measure(encode, decode, obj, repeat: int) -> dict:
+    data = encode(obj)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode(obj)
+    encoded = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(repeat):
+        decode(data)
+    decoded = time.perf_counter() - started
+    return {
+        "bytes": len(data),
+        "encode_us": round(encoded / repeat * 1e6, 2),
+        "decode_us": round(decoded / repeat * 1e6, 2),
+    }
+
+
+def run(files: int, repeat: int) -> dict:
+    event = slack_event(files)
+    slim = task_args(pack(event))
+    to_json = lambda obj: json.dumps(obj).encode()
+    return {
+        "files": files,
+        "event_json": measure(to_json, json.loads, event, repeat),
+        "envelope_json": measure(to_json, json.loads, slim, repeat),
+        "envelope_fitbot": measure(dumps, loads, slim, repeat),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark task payload size and serialization CPU")
+    parser.add_argument("--files", type=int, default=2, help="Benchmark submissions with 0..N screenshots")
+    parser.add_argument("--repeat", type=int, default=10000, help="Encodes/decodes per measurement")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    rows = [run(n, args.repeat) for n in range(args.files + 1)]
+    print(f"{'files':>5}  {'format':<16} {'bytes':>7} {'encode us':>10} {'decode us':>10}")
+    for row in rows:
+        for name in ("event_json", "envelope_json", "envelope_fitbot"):
+            m = row[name]
+            print(f"{row['files']:>5}  {name:<16} {m['bytes']:>7} {m['encode_us']:>10} {m['decode_us']:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"run_at": datetime.utcnow().isoformat(), "repeat": args.repeat, "results": rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Extraction accuracy and latency benchmark.
+
+Runs each extraction strategy over a labelled corpus and writes a JSON
+report with per-field accuracy, latency percentiles and throughput.
+
+    python -m bench.extraction --strategy regex --strategy ocr
+    python -m bench.extraction --corpus v1 --synthesize --output results.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+FIELDS = ("value", "unit", "date", "discipline")
+
+# Units the pipeline treats as interchangeable when scoring
+UNIT_ALIASES = {
+    "kilometers": "km", "kilometres": "km",
+    "meters": "m", "metres": "m",
+    "kcal": "calories", "kilocalories": "calories", "cal": "calories",
+}
+
+
+def load_corpus(version: str) -> dict:
+    with open(os.path.join(CORPUS_DIR, version, "manifest.json")) as f:
+        corpus = json.load(f)
+    corpus["root"] = os.path.join(CORPUS_DIR, version)
+    return corpus
+
+
+def synthesize_images(corpus: dict):
+    """Render ``render_text`` for image items whose screenshot is missing."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.load_default()
+    for item in corpus["items"]:
+        if item["kind"] != "image":
+            continue
+        path = os.path.join(corpus["root"], item["image"])
+        if os.path.exists(path):
+            continue
+        lines = item["render_text"].split("\n")
+        image = Image.new("RGB", (640, 60 + 40 * len(lines)), "white")
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(lines):
+            draw.text((30, 30 + 40 * i), line, fill="black", font=font)
+        # Upscale so the default bitmap font is legible to tesseract
+        image = image.resize((image.width * 2, image.height * 2))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image.save(path)
+        print(f"Synthesized {path}")
+
+
+def has_image(corpus: dict, item: dict) -> bool:
+    return os.path.exists(os.path.join(corpus["root"], item["image"]))
+
+
+def missing_images(corpus: dict) -> List[str]:
+    """Ids of screenshot items whose image has not been captured or synthesized."""
+    return [item["id"] for item in corpus["items"] if item["kind"] == "image" and not has_image(corpus, item)]
+
+
+def read_image(corpus: dict, item: dict) -> bytes:
+    with open(os.path.join(corpus["root"], item["image"]), "rb") as f:
+        return f.read()
+
+
+def strategy_regex(corpus: dict, item: dict) -> Optional[dict]:
+    """utils.parsing.parse_metric on the text (or OCR text for screenshots)."""
+    from app.utils.parsing import parse_metric
+
+    text = item.get("text") or _ocr_text(corpus, item)
+    value, unit = parse_metric(text)
+    return {"value": value, "unit": unit}
+
+
+def strategy_ocr(corpus: dict, item: dict) -> Optional[dict]:
+    """VisionService.analyze, which only recovers a number."""
+    if item["kind"] != "image":
+        return None
+    from app.tasks import vision_service
+
+    value = vision_service.analyze(read_image(corpus, item))
+    return {"value": value} if value is not None else {}
+
+
+def strategy_llm(corpus: dict, item: dict) -> Optional[dict]:
+    """OllamaClient.extract_metrics on the text (or OCR text for screenshots)."""
+    from app.tasks import ollama_client
+
+    text = item.get("text") or _ocr_text(corpus, item)
+    return ollama_client.extract_metrics(text) or {}
+
+
+def _ocr_text(corpus: dict, item: dict) -> str:
+    from app.tasks import vision_service
+
+    return vision_service.extract_text(read_image(corpus, item))
+
+
+STRATEGIES: Dict[str, Callable[[dict, dict], Optional[dict]]] = {
+    "regex": strategy_regex,
+    "ocr": strategy_ocr,
+    "llm": strategy_llm,
+}
+
+
+def score_field(field: str, expected, predicted) -> bool:
+    if predicted is None:
+        return False
+    if field == "value":
+        try:
+            return abs(float(predicted) - float(expected)) <= abs(float(expected)) * 0.01
+        except (TypeError, ValueError):
+            return False
+    if field == "unit":
+        normalize = lambda u: UNIT_ALIASES.get(str(u).strip().lower(), str(u).strip().lower())
+        return normalize(predicted) == normalize(expected)
+    return str(predicted).strip().lower() == str(expected).strip().lower()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_strategy(name: str, corpus: dict) -> dict:
+    """Run one strategy over the corpus and summarise it."""
+    fn = STRATEGIES[name]
+    records, latencies = [], []
+    field_hits = {f: 0 for f in FIELDS}
+    field_total = {f: 0 for f in FIELDS}
+
+    skipped = set(missing_images(corpus))
+    started = time.perf_counter()
+    for item in corpus["items"]:
+        if item["id"] in skipped:
+            continue  # counted separately rather than as an extraction error
+        t0 = time.perf_counter()
+        error = None
+        try:
+            predicted = fn(corpus, item)
+        except Exception as e:
+            predicted, error = {}, str(e)
+        elapsed = time.perf_counter() - t0
+        if predicted is None:
+            continue  # strategy does not apply to this kind of item
+
+        latencies.append(elapsed)
+        # Only the fields a strategy returns are scored, plus value which every strategy targets
+        scored = [f for f in FIELDS if f in predicted or f == "value"]
+        fields = {f: score_field(f, item["expected"][f], predicted.get(f)) for f in scored}
+        for f, ok in fields.items():
+            field_total[f] += 1
+            field_hits[f] += ok
+        records.append({
+            "id": item["id"],
+            "kind": item["kind"],
+            "latency_s": round(elapsed, 4),
+            "correct": all(fields.values()),
+            "fields": fields,
+            "predicted": {k: predicted.get(k) for k in FIELDS if k in predicted},
+            "error": error,
+        })
+    wall = time.perf_counter() - started
+
+    return {
+        "strategy": name,
+        "items": len(records),
+        "accuracy": sum(r["correct"] for r in records) / len(records) if records else 0.0,
+        "field_accuracy": {f: field_hits[f] / field_total[f] for f in FIELDS if field_total[f]},
+        "latency_s": {
+            "mean": statistics.mean(latencies) if latencies else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies, default=0.0),
+        },
+        "throughput_items_per_s": len(records) / wall if wall else 0.0,
+        "skipped": sorted(skipped),
+        "records": records,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark extraction strategies against a labelled corpus")
+    parser.add_argument("--corpus", default="v1", help="Corpus version under bench/corpus")
+    parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES), help="Repeatable; defaults to all")
+    parser.add_argument("--synthesize", action="store_true", help="Render missing screenshots from their labels")
+    parser.add_argument("--output", help="Where to write the JSON report (default: stdout summary only)")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if args.synthesize:
+        synthesize_images(corpus)
+    missing = missing_images(corpus)
+    if missing:
+        print(f"Skipping {len(missing)} screenshot(s) with no image (try --synthesize): {', '.join(missing)}")
+
+    from app.config import settings
+
+    report = {
+        "corpus": corpus["version"],
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "settings": {
+            "ollama_url": settings.ollama_url,
+            "ollama_num_predict": settings.ollama_num_predict,
+            "ollama_stream": settings.ollama_stream,
+        },
+        "results": [run_strategy(name, corpus) for name in (args.strategy or sorted(STRATEGIES))],
+    }
+
+    for r in report["results"]:
+        print(
+            f"{r['strategy']:>6}: {r['items']:3d} items  accuracy {r['accuracy']:.1%}  "
+            f"p50 {r['latency_s']['p50'] * 1000:.0f} ms  p95 {r['latency_s']['p95'] * 1000:.0f} ms  "
+            f"{r['throughput_items_per_s']:.1f} items/s"
+            + (f"  ({len(r['skipped'])} skipped)" if r["skipped"] else "")
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
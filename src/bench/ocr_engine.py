@@ -0,0 +1,146 @@
+"""
+OCR engine latency and CPU benchmark.
+
+Runs every screenshot of a corpus through each OCR engine (after the same
+preprocessing VisionService applies) and reports per-image wall latency and
+CPU time. CPU includes child processes, so the ``tesseract`` binary that
+pytesseract forks is counted.
+
+    python -m bench.ocr_engine --synthesize
+    python -m bench.ocr_engine --engine pytesseract --engine tesserocr --repeat 5 --output ocr.json
+"""
+
+import argparse
+import io
+import json
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+from bench.extraction import has_image, load_corpus, percentile, read_image, synthesize_images
+
+ENGINES = ("pytesseract", "tesserocr")
+
+
+def cpu_seconds() -> float:
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def load_images(corpus: dict) -> List[tuple]:
+    """``(id, preprocessed image)`` for every screenshot in the corpus."""
+    from PIL import Image
+    from app.utils.ocr import VisionService
+    from app.utils.ocr_engine import PytesseractEngine
+
+    # Preprocessing is shared by both engines, so it stays outside the timings
+    vision = VisionService(engine=PytesseractEngine())
+    return [
+        (item["id"], vision.preprocess_image(Image.open(io.BytesIO(read_image(corpus, item)))))
+        for item in corpus["items"] if item["kind"] == "image" and has_image(corpus, item)
+    ]
+
+
+def make_engine(name: str):
+    from app.utils.ocr_engine import PytesseractEngine, TesserocrEngine
+
+    if name == "pytesseract":
+        return PytesseractEngine()
+    return TesserocrEngine(size=1)
+
+
+def run_engine(name: str, images: List[tuple], repeat: int) -> dict:
+    engine = make_engine(name)
+    # Warm-up: the resident engine loads its language data on first use
+    started = time.perf_counter()
+    engine.image_to_text(images[0][1])
+    warmup = time.perf_counter() - started
+
+    latencies, texts = [], {}
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    for _ in range(repeat):
+        for item_id, image in images:
+            t0 = time.perf_counter()
+            texts[item_id] = engine.image_to_text(image)
+            latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+
+    calls = len(latencies)
+    return {
+        "engine": name,
+        "calls": calls,
+        "warmup_s": round(warmup, 4),
+        "latency_s": {
+            "mean": statistics.mean(latencies),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies),
+        },
+        "cpu_s_per_image": cpu / calls,
+        "throughput_images_per_s": calls / wall if wall else 0.0,
+        "texts": texts,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare OCR engines on a corpus' screenshots")
+    parser.add_argument("--corpus", default="v1", help="Corpus version under bench/corpus")
+    parser.add_argument("--engine", action="append", choices=ENGINES, help="Repeatable; defaults to all")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the screenshots per engine")
+    parser.add_argument("--synthesize", action="store_true", help="Render missing screenshots from their labels")
+    parser.add_argument("--output", help="Where to write the JSON report (default: stdout summary only)")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if args.synthesize:
+        synthesize_images(corpus)
+    images = load_images(corpus)
+    if not images:
+        print("No screenshots in corpus; try --synthesize")
+        return 1
+
+    results = []
+    for name in args.engine or ENGINES:
+        try:
+            results.append(run_engine(name, images, args.repeat))
+        except Exception as e:
+            print(f"{name:>11}: unavailable ({e})")
+
+    # Same text from both engines means the speed-up costs no accuracy
+    if len(results) == 2:
+        a, b = results[0]["texts"], results[1]["texts"]
+        agreement = sum(a[k].strip() == b[k].strip() for k in a) / len(a)
+    else:
+        agreement = None
+
+    for r in results:
+        print(
+            f"{r['engine']:>11}: {r['calls']:3d} calls  p50 {r['latency_s']['p50'] * 1000:.0f} ms  "
+            f"p95 {r['latency_s']['p95'] * 1000:.0f} ms  CPU {r['cpu_s_per_image'] * 1000:.0f} ms/image  "
+            f"warm-up {r['warmup_s'] * 1000:.0f} ms"
+        )
+    if agreement is not None:
+        print(f"Identical text on {agreement:.0%} of screenshots")
+
+    if args.output:
+        report = {
+            "corpus": corpus["version"],
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "text_agreement": agreement,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The app is imported as `app` from src/, as in the containers (PYTHONPATH=/app/src)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# Required by Settings at import time
+for name in ("SLACK_BOT_TOKEN", "SLACK_APP_TOKEN", "SLACK_SIGNING_SECRET", "WORKFLOW_BOT_ID"):
+    os.environ.setdefault(name, "test")
@@ -0,0 +1,33 @@
+import importlib
+
+import pytest
+
+
+def load_settings(monkeypatch, **env):
+    """A fresh Settings instance built the way a process starts: from the environment."""
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    import app.config
+    return importlib.reload(app.config).settings
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("", []),
+    ("U123", ["U123"]),
+    ("U123,U456", ["U123", "U456"]),
+    (" U123 , ,U456 ", ["U123", "U456"]),
+])
+def test_admin_users_from_comma_separated_env(monkeypatch, value, expected):
+    settings = load_settings(monkeypatch, ADMIN_USERS=value)
+    assert settings.admin_user_ids == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("llama2", ["llama2"]),
+    ("phi3,llama3:8b", ["phi3", "llama3:8b"]),
+    ("phi3, llama3:8b ,", ["phi3", "llama3:8b"]),
+    ("", ["llama2"]),
+])
+def test_ollama_models_from_comma_separated_env(monkeypatch, value, expected):
+    settings = load_settings(monkeypatch, OLLAMA_MODELS=value)
+    assert settings.ollama_model_tiers == expected